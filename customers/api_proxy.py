@@ -1,21 +1,30 @@
+import httpx
 import requests
 import json
-from datetime import datetime
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from salona_business_django import upstream, utc
 
 class APIProxyView(View):
     """
     Proxy view to forward requests to the external API while handling cookies properly
+
+    The view is async: under ASGI a proxied call waits on the event loop
+    instead of holding a worker thread for the whole upstream round trip.
     """
     
     @method_decorator(csrf_exempt)
     def dispatch(self, request, *args, **kwargs):
-        return super().dispatch(request, *args, **kwargs)
+        response = super().dispatch(request, *args, **kwargs)
+        if not isinstance(request, ASGIRequest):
+            # Under WSGI this request gets an event loop, and pooled client, of its own
+            return upstream.closing_async_client(response)
+        return response
     
     def get_api_url(self, path):
         """Construct the full API URL"""
@@ -28,82 +37,10 @@ class APIProxyView(View):
             path = f"api/{path}"
         return f"{api_base}/{path}"
     
-    @staticmethod
-    def ensure_utc_params(data):
-        """
-        Recursively convert all time-related parameters to UTC format.
-        Looks for common time field names and converts them to ISO 8601 UTC format.
-
-        Args:
-            data: Dictionary or list containing request parameters
-
-        Returns:
-            Data with time parameters converted to UTC
-        """
-        if not data or not isinstance(data, (dict, list)):
-            return data
-
-        # Common time field patterns
-        time_field_patterns = [
-            'time', 'date', 'datetime', 'start', 'end', 'begin', 'from', 'to',
-            'created', 'updated', 'scheduled', 'appointment', 'booking',
-            'started_at', 'ended_at', 'created_at', 'updated_at', 'start_at', 'end_at'
-        ]
-
-        def is_time_field(field_name):
-            """Check if field name matches time patterns"""
-            field_lower = field_name.lower()
-            return any(pattern in field_lower for pattern in time_field_patterns)
-
-        def is_iso_datetime(value_str):
-            """Check if string is ISO 8601 datetime format"""
-            if not isinstance(value_str, str):
-                return False
-            try:
-                # Try to parse ISO format
-                datetime.fromisoformat(value_str.replace('Z', '+00:00'))
-                return True
-            except (ValueError, AttributeError):
-                return False
-
-        def convert_value(value):
-            """Convert a single value if it's a time string"""
-            if isinstance(value, str) and is_iso_datetime(value):
-                # Already in ISO format, return as is (backend expects UTC)
-                return value
-            return value
-
-        def process_dict(obj):
-            """Recursively process dictionary"""
-            result = {}
-            for key, value in obj.items():
-                if value is None:
-                    result[key] = value
-                elif isinstance(value, dict):
-                    result[key] = process_dict(value)
-                elif isinstance(value, list):
-                    result[key] = [process_dict(item) if isinstance(item, dict) else
-                                   (process_list(item) if isinstance(item, list) else convert_value(item))
-                                   for item in value]
-                elif is_time_field(key) and isinstance(value, str):
-                    result[key] = convert_value(value)
-                else:
-                    result[key] = value
-            return result
-
-        def process_list(lst):
-            """Recursively process list"""
-            return [process_dict(item) if isinstance(item, dict) else
-                   (process_list(item) if isinstance(item, list) else item)
-                   for item in lst]
+    # Convert datetime parameters to UTC (see salona_business_django/utc.py)
+    ensure_utc_params = staticmethod(utc.ensure_utc)
 
-        if isinstance(data, dict):
-            return process_dict(data)
-        elif isinstance(data, list):
-            return process_list(data)
-        return data
-
-    def forward_request(self, request, path):
+    async def forward_request(self, request, path):
         """Forward the request to the external API"""
         api_url = self.get_api_url(path)
         
@@ -111,6 +48,8 @@ class APIProxyView(View):
         headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json',
+            # Streamed bodies are relayed still encoded, so only ask for encodings the client accepts
+            'Accept-Encoding': request.META.get('HTTP_ACCEPT_ENCODING') or 'identity',
         }
         
         # Get cookies from the incoming request
@@ -125,9 +64,8 @@ class APIProxyView(View):
         if request.method in ['POST', 'PUT', 'PATCH']:
             if request.content_type == 'application/json':
                 try:
-                    data = json.loads(request.body)
-                    # Convert datetime parameters to UTC
-                    data = self.ensure_utc_params(data)
+                    # Convert datetime parameters to UTC while decoding
+                    data = utc.loads(request.body)
                 except json.JSONDecodeError:
                     data = None
             else:
@@ -137,44 +75,39 @@ class APIProxyView(View):
 
         # Make the API request
         try:
-            response = requests.request(
+            response = await upstream.arequest(
                 method=request.method,
                 url=api_url,
                 headers=headers,
                 json=data if data else None,
                 cookies=cookies,
-                timeout=30
+                timeout='long',
+                stream=True
             )
             
-            # Create Django response
-            django_response = JsonResponse(
-                response.json() if response.content else {},
-                status=response.status_code,
-                safe=False
-            )
-
-            return django_response
+            # Relay the upstream body as-is, without parsing it
+            return await upstream.relay_response(request, response)
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             return JsonResponse({
                 'error': 'API request failed',
                 'message': str(e)
             }, status=500)
     
-    def get(self, request, path):
-        return self.forward_request(request, path)
+    async def get(self, request, path):
+        return await self.forward_request(request, path)
     
-    def post(self, request, path):
-        return self.forward_request(request, path)
+    async def post(self, request, path):
+        return await self.forward_request(request, path)
     
-    def put(self, request, path):
-        return self.forward_request(request, path)
+    async def put(self, request, path):
+        return await self.forward_request(request, path)
     
-    def patch(self, request, path):
-        return self.forward_request(request, path)
+    async def patch(self, request, path):
+        return await self.forward_request(request, path)
     
-    def delete(self, request, path):
-        return self.forward_request(request, path)
+    async def delete(self, request, path):
+        return await self.forward_request(request, path)
 
 
 @csrf_exempt
@@ -201,7 +134,7 @@ def logout_proxy(request):
             cookies = {'access_token': access_token}
             
             try:
-                requests.put(api_url, headers=headers, cookies=cookies, timeout=10)
+                upstream.put(api_url, headers=headers, cookies=cookies)
             except requests.exceptions.RequestException:
                 pass  # Continue with local logout even if API call fails
         
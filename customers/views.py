@@ -2,7 +2,7 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from django.conf import settings
 from datetime import datetime
-import requests
+from salona_business_django import catalog
 import json
 import logging
 from .api_proxy import APIProxyView
@@ -10,115 +10,38 @@ from .api_proxy import APIProxyView
 logger = logging.getLogger(__name__)
 
 
-def get_api_url(endpoint):
-    """Helper function to construct API URL"""
-    base_url = getattr(settings, 'API_BASE_URL', 'https://api.salona.me/api')
-    # Remove trailing /api if present and add it back
-    base_url = base_url.rstrip('/api').rstrip('/')
-    return f"{base_url}/api/v1/{endpoint.lstrip('/')}"
-
-
 def fetch_services(company_id):
-    """Fetch services for a company from API"""
-    try:
-        api_url = get_api_url(f"services/companies/{company_id}/services")
-        response = requests.get(api_url, timeout=10)
-        
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch services: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching services: {e}")
-    return []
+    """Fetch services for a company, from the catalog cache"""
+    return catalog.get(company_id, 'services') or []
 
 
 def fetch_professionals(company_id):
-    """Fetch professionals (staff) for a company from API"""
-    try:
-        api_url = get_api_url(f"services/companies/{company_id}/users")
-        response = requests.get(api_url, timeout=10)
-        
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch professionals: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching professionals: {e}")
-    return []
+    """Fetch professionals (staff) for a company, from the catalog cache"""
+    return catalog.get(company_id, 'professionals') or []
 
 
 def fetch_company_details(company_id):
-    """Fetch company details from API"""
-    try:
-        api_url = get_api_url(f"companies/{company_id}")
-        response = requests.get(api_url, timeout=10)
-
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch company details: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching company details: {e}")
-    return None
+    """Fetch company details, from the catalog cache"""
+    return catalog.get(company_id, 'company')
 
 def fetch_company_address(company_id):
-    """Fetch company address from API"""
-    try:
-        api_url = get_api_url(f"companies/{company_id}/address")
-        response = requests.get(api_url, timeout=10)
-
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch company address: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching company address: {e}")
-    return None
+    """Fetch company address, from the catalog cache"""
+    return catalog.get(company_id, 'address')
 
 
 def get_professional_name(company_id, professional_id):
-    """Get professional name by ID"""
+    """Get professional name by ID, from the catalog's professional index"""
     if professional_id == 'any':
         return "Any Professional"
-    
-    professionals = fetch_professionals(company_id)
-    for item in professionals:
-        if item.get('user') and item['user'].get('id') == professional_id:
-            first_name = item['user'].get('first_name', '')
-            last_name = item['user'].get('last_name', '')
-            return f"{first_name} {last_name}".strip() or "Professional"
-    
-    return "Professional"
+
+    professional = catalog.get_professional(company_id, professional_id)
+    return professional['name'] if professional else "Professional"
 
 
 def get_services_details(company_id, service_ids):
-    """Get details for selected services"""
-    services = []
-    total_price = 0
-    
-    all_services = fetch_services(company_id)
-    
-    for category in all_services:
-        for service in category.get('services', []):
-            if service['id'] in service_ids:
-                price = (service.get('discount_price') or service.get('price') or 0) / 100
-                services.append({
-                    'id': service['id'],
-                    'name': service['name'],
-                    'price': price,
-                    'duration': service.get('duration', 60)
-                })
-                total_price += float(price)
-    
+    """Get details for selected services, from the catalog's service index"""
+    services = catalog.get_services(company_id, service_ids)
+    total_price = sum(float(service['price']) for service in services)
     return services, total_price
 
 
@@ -147,6 +70,10 @@ def booking(request, company_id):
             # Store selected services in session
             request.session['selected_services'] = selected_services
 
+            # Load what the review page needs while the customer picks a professional and time
+            if company:
+                catalog.warm(company_id, ('services', 'professionals'))
+
             # Move to step 2
             return render(request, 'customers/booking_step2.html', {
                 'company_id': company_id,
@@ -0,0 +1,177 @@
+"""
+Cached monthly availability for the public booking calendar
+Availability is the most expensive query the booking flow makes, and the
+calendar asks for it again on every month and staff switch. Answers are kept
+in the Django cache per company, staff member ("any" for the whole company),
+selected service set and month, for BOOKING_AVAILABILITY_TTL. After a month
+is served, the month after it is fetched in the background, on a small pool
+of BOOKING_AVAILABILITY_PREFETCH_WORKERS threads, so paging the calendar
+forward is answered from the cache too.
+
+Public bookings made through the booking flow, and booking, time-off and
+service writes through the API proxy, invalidate the company's availability
+(see is_availability_write). Bookings made elsewhere are picked up once the
+short TTL runs out.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from salona_business_django import upstream
+from salona_business_django.catalog import get_api_url
+
+logger = logging.getLogger(__name__)
+
+# Writes through the API proxy that change availability
+AVAILABILITY_WRITE_PREFIXES = ('api/v1/bookings', 'api/v1/users/time-offs', 'api/v1/services', 'api/v1/companies/services')
+
+# Longest a background prefetch may hold its lock
+_PREFETCH_LOCK_TTL = 30
+
+_prefetch_executor = None
+# Month keys queued or being loaded by this process's prefetch pool
+_prefetching = set()
+_prefetch_lock = threading.Lock()
+
+
+def _generation_key(company_id):
+    return f"availability:gen:{company_id}"
+
+
+def _month_key(company_id, staff_id, service_ids, month):
+    """Cache key of one month, under the company's current generation"""
+    generation = cache.get(_generation_key(company_id), 0)
+    services = hashlib.sha256(','.join(sorted(service_ids)).encode()).hexdigest()[:16]
+    return f"availability:{company_id}:{generation}:{staff_id}:{services}:{month.isoformat()}"
+
+
+def month_start(value):
+    """Parse a 'YYYY-MM-DD' (or 'YYYY-MM') string into the first day of its month"""
+    year, month = value.split('-')[:2]
+    return date(int(year), int(month), 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def fetch(company_id, staff_id, service_ids, month):
+    """
+    Fetch one month of availability from the API, bypassing the cache
+
+    Returns:
+        The 'data' of the API answer, or None when the API could not answer
+    """
+    if staff_id == 'any':
+        endpoint = f"companies/{company_id}/availabilities"
+    else:
+        endpoint = f"companies/{company_id}/users/{staff_id}/availability"
+    params = {'date_from': month.isoformat(), 'availability_type': 'monthly', 'service_ids': list(service_ids)}
+
+    try:
+        response = upstream.get(get_api_url(endpoint), params=params)
+
+        if response.ok:
+            data = response.json()
+            if data.get('success'):
+                return data.get('data') or []
+        logger.error(f"Failed to fetch availability: {response.status_code}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Error fetching availability: {e}")
+    return None
+
+
+def load(company_id, staff_id, service_ids, month):
+    """Fetch a month and store it, unless availability changed while fetching"""
+    key = _month_key(company_id, staff_id, service_ids, month)
+    data = fetch(company_id, staff_id, service_ids, month)
+    # A write in the meantime moved the generation on, so this key is never read again
+    if data is not None:
+        cache.set(key, data, settings.BOOKING_AVAILABILITY_TTL)
+    return data
+
+
+def _get_prefetch_executor():
+    """Return the process-wide pool that prefetches months"""
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        with _prefetch_lock:
+            if _prefetch_executor is None:
+                _prefetch_executor = ThreadPoolExecutor(
+                    max_workers=settings.BOOKING_AVAILABILITY_PREFETCH_WORKERS,
+                    thread_name_prefix='availability-prefetch'
+                )
+    return _prefetch_executor
+
+
+def _prefetch(company_id, staff_id, service_ids, month, key):
+    try:
+        load(company_id, staff_id, service_ids, month)
+    finally:
+        cache.delete(f"{key}:prefetch")
+        with _prefetch_lock:
+            _prefetching.discard(key)
+
+
+def prefetch(company_id, staff_id, service_ids, month):
+    """
+    Load a month in the background unless it is cached or being loaded already
+
+    Prefetches are skipped while BOOKING_AVAILABILITY_PREFETCH_QUEUE months
+    are queued in this process; the month is then fetched when asked for.
+    """
+    key = _month_key(company_id, staff_id, service_ids, month)
+    if cache.get(key) is not None:
+        return
+    with _prefetch_lock:
+        if key in _prefetching or len(_prefetching) >= settings.BOOKING_AVAILABILITY_PREFETCH_QUEUE:
+            return
+        _prefetching.add(key)
+    # Other processes may be loading the same month
+    if not cache.add(f"{key}:prefetch", 1, _PREFETCH_LOCK_TTL):
+        with _prefetch_lock:
+            _prefetching.discard(key)
+        return
+    _get_prefetch_executor().submit(_prefetch, company_id, staff_id, service_ids, month, key)
+
+
+def get_month(company_id, staff_id, service_ids, month):
+    """
+    Return one month of availability, from the cache when possible, and
+    prefetch the month after it
+
+    Args:
+        company_id: Company ID
+        staff_id: Staff user ID, or 'any' for every professional of the company
+        service_ids: Selected service IDs
+        month: First day of the month
+
+    Returns:
+        The API's availability data, or None when the API could not answer
+    """
+    service_ids = sorted(set(service_ids))
+    data = cache.get(_month_key(company_id, staff_id, service_ids, month))
+    if data is None:
+        data = load(company_id, staff_id, service_ids, month)
+    if data is not None:
+        prefetch(company_id, staff_id, service_ids, next_month(month))
+    return data
+
+
+def invalidate(company_id):
+    """Drop every cached month of a company"""
+    if company_id:
+        # A new generation makes all older month keys unreachable; they expire on their own
+        cache.set(_generation_key(company_id), time.time_ns(), None)
+
+
+def is_availability_write(path):
+    """Whether a successful write to this API path changes availability"""
+    return any(path == prefix or path.startswith(prefix + '/') for prefix in AVAILABILITY_WRITE_PREFIXES)
@@ -1,22 +1,67 @@
 """
 Custom middleware for enhanced static asset caching
+
+Both middlewares run in sync and async mode, so under ASGI the async API
+proxy views are not handed to a thread for the whole upstream call.
 """
 import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.utils.cache import add_never_cache_headers, patch_cache_control
 from django.http import HttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise static file serving that also runs in async mode
+
+    WhiteNoiseMiddleware is sync-only. Finding a static file is a lookup in
+    the files WhiteNoise indexed at startup, so it is safe on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
 
 
 class StaticFilesCacheMiddleware:
     """
     Middleware to add proper cache headers for static files and other assets
     """
-    
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
-        
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
         # Only process successful responses
         if response.status_code != 200:
             return response
@@ -27,10 +72,12 @@ class StaticFilesCacheMiddleware:
         if path.startswith('/static/'):
             self._add_static_cache_headers(response, path)
         
-        # Handle API responses - no caching for dynamic content
-        elif path.startswith('/api/'):
-            add_never_cache_headers(response)
-            response['Pragma'] = 'no-cache'
+        # Handle API responses (including the /users/api/ proxies) - no caching for
+        # dynamic content, unless the view already chose its own policy
+        elif path.startswith('/api/') or '/api/' in path:
+            if not response.has_header('Cache-Control'):
+                add_never_cache_headers(response)
+                response['Pragma'] = 'no-cache'
             
         # Handle HTML pages - short cache with validation
         elif path.endswith(('.html', '/')) or '.' not in path.split('/')[-1]:
@@ -0,0 +1,375 @@
+"""
+Cached company catalog for the public booking flow
+The booking pages are anonymous and take most of the traffic, yet every step
+needs the same company details, address, services and professionals. Each
+part is kept per company in the Django cache:
+
+- younger than BOOKING_CATALOG_FRESH_SECONDS it is served as is;
+- older, up to BOOKING_CATALOG_TTL, it is still served while it is refetched
+  in the background, on a small pool of BOOKING_CATALOG_REFRESH_WORKERS
+  threads (stale-while-revalidate);
+- past that, or after invalidate(), it is fetched again inline.
+
+Parts with an index builder (INDEXES) store the index next to the data, built
+once per load, so lookups such as the selected services of a booking need
+neither a refetch nor a walk of the whole tree.
+
+Writes through the API proxy that change a part invalidate it (see
+get_write_parts), so a customer sees edits right away instead of after the TTL.
+
+Booking URLs name the company by slug. resolve_slug answers from a
+per-process dictionary in front of the Django cache, and remembers unknown
+slugs too (BOOKING_SLUG_MISS_TTL), so bots probing random /book/<slug>/ URLs
+cost one upstream lookup per slug instead of one per request. Parts of
+unknown company ids are remembered for as long.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from salona_business_django import upstream
+
+logger = logging.getLogger(__name__)
+
+# API endpoint of each catalog part
+PARTS = {
+    'company': 'companies/{company_id}',
+    'address': 'companies/{company_id}/address',
+    'services': 'services/companies/{company_id}/services',
+    'professionals': 'services/companies/{company_id}/users',
+}
+
+# Writes through the API proxy that change each part: (exact paths, path prefixes)
+WRITES = {
+    'company': (('api/v1/companies',), ('api/v1/companies/phones', 'api/v1/companies/emails')),
+    'address': ((), ('api/v1/companies/address',)),
+    'services': ((), ('api/v1/services', 'api/v1/companies/services')),
+    'professionals': ((), (
+        'api/v1/companies/users', 'api/v1/companies/members', 'api/v1/companies/invitations', 'api/v1/users/me',
+    )),
+}
+
+# Bump when the stored entries or indexes change shape, so old entries are never read
+CATALOG_VERSION = 1
+
+# Longest a background refresh may hold its lock
+_REFRESH_LOCK_TTL = 30
+
+_refresh_executor = None
+# Parts queued or being refetched by this process's refresh pool
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+# Most slugs remembered by one process; scans past that start it over
+_LOCAL_SLUG_LIMIT = 10000
+
+# {slug: (company or None, expires_at)} of this process
+_local_slugs = {}
+_local_slugs_lock = threading.Lock()
+
+
+def _part_key(company_id, part):
+    return f"catalog:v{CATALOG_VERSION}:{company_id}:{part}"
+
+
+def _refresh_key(company_id, part):
+    return f"catalog:refresh:{company_id}:{part}"
+
+
+def _changed_key(company_id):
+    return f"catalog:changed:{company_id}"
+
+
+def _slug_key(slug):
+    return f"catalog:slug:{slug}"
+
+
+def _company_slug_key(company_id):
+    return f"catalog:company_slug:{company_id}"
+
+
+def get_api_url(endpoint):
+    """Construct the API URL of an endpoint under /api/v1"""
+    base_url = getattr(settings, 'API_BASE_URL', 'https://api.salona.me/api')
+    # Remove trailing /api if present and add it back
+    base_url = base_url.rstrip('/api').rstrip('/')
+    return f"{base_url}/api/v1/{endpoint.lstrip('/')}"
+
+
+def fetch(company_id, part):
+    """
+    Fetch one catalog part from the API, bypassing the cache
+
+    Returns:
+        Tuple of (ok, data): ok is False when the API could not answer;
+        data is None for an unknown company
+    """
+    try:
+        response = upstream.get(get_api_url(PARTS[part].format(company_id=company_id)))
+
+        if response.status_code == 404:
+            return True, None
+        if response.ok:
+            data = response.json()
+            return True, data.get('data') if data.get('success') else None
+        logger.error(f"Failed to fetch company {part}: {response.status_code}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Error fetching company {part}: {e}")
+    return False, None
+
+
+def build_service_index(categories):
+    """
+    Index a service tree by service id
+
+    Returns:
+        Dictionary mapping the service id, as a string, to its id, name,
+        effective price (the discount price if any, in currency units) and duration
+    """
+    index = {}
+    for category in categories or []:
+        for service in category.get('services', []):
+            index[str(service['id'])] = {
+                'id': service['id'],
+                'name': service['name'],
+                'price': (service.get('discount_price') or service.get('price') or 0) / 100,
+                'duration': service.get('duration', 60),
+            }
+    return index
+
+
+def build_professional_index(professionals):
+    """
+    Index the company's professionals by user id
+
+    Returns:
+        Dictionary mapping the user id, as a string, to their display name and avatar URL (or None)
+    """
+    index = {}
+    for item in professionals or []:
+        user = item.get('user')
+        if user and user.get('id') is not None:
+            name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
+            index[str(user['id'])] = {
+                'name': name or 'Professional',
+                'avatar': user.get('profile_photo_url'),
+            }
+    return index
+
+
+# Index builders of the parts that have one
+INDEXES = {
+    'services': build_service_index,
+    'professionals': build_professional_index,
+}
+
+
+def _build_entry(part, data):
+    entry = {'data': data, 'fetched_at': time.time()}
+    if part in INDEXES:
+        entry['index'] = INDEXES[part](data)
+    return entry
+
+
+def load(company_id, part):
+    """
+    Fetch a part and store it, unless the part changed while fetching
+
+    Returns:
+        The part's entry, or None when the API could not answer
+    """
+    started = time.time()
+    ok, data = fetch(company_id, part)
+    if not ok:
+        return None
+    entry = _build_entry(part, data)
+    if (cache.get(_changed_key(company_id)) or 0) < started:
+        ttl = settings.BOOKING_CATALOG_TTL if data is not None else settings.BOOKING_SLUG_MISS_TTL
+        cache.set(_part_key(company_id, part), entry, ttl)
+    return entry
+
+
+def _get_refresh_executor():
+    """Return the process-wide pool that refetches stale parts"""
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=settings.BOOKING_CATALOG_REFRESH_WORKERS,
+                    thread_name_prefix='catalog-refresh'
+                )
+    return _refresh_executor
+
+
+def _refresh(company_id, part):
+    try:
+        load(company_id, part)
+    finally:
+        cache.delete(_refresh_key(company_id, part))
+        with _refresh_lock:
+            _refreshing.discard((company_id, part))
+
+
+def _start_refresh(company_id, part):
+    """
+    Refetch a part in the background unless it is being refetched already
+
+    Refreshes are skipped while BOOKING_CATALOG_REFRESH_QUEUE parts are
+    queued in this process; the stale copy is then served until a later hit
+    finds room, or the part expires and is fetched inline.
+    """
+    with _refresh_lock:
+        if (company_id, part) in _refreshing or len(_refreshing) >= settings.BOOKING_CATALOG_REFRESH_QUEUE:
+            return
+        _refreshing.add((company_id, part))
+    # Other processes may be refetching the same part
+    if not cache.add(_refresh_key(company_id, part), 1, _REFRESH_LOCK_TTL):
+        with _refresh_lock:
+            _refreshing.discard((company_id, part))
+        return
+    _get_refresh_executor().submit(_refresh, company_id, part)
+
+
+def warm(company_id, parts):
+    """Load the given parts in the background unless they are cached already"""
+    cached = cache.get_many([_part_key(company_id, part) for part in parts])
+    for part in parts:
+        if _part_key(company_id, part) not in cached:
+            _start_refresh(company_id, part)
+
+
+def get_entry(company_id, part):
+    """
+    Return the entry of a catalog part of a company, from the cache when possible
+
+    Args:
+        company_id: Company ID
+        part: Key of PARTS
+
+    Returns:
+        Dictionary with the part's data, fetch time and index, if it has one;
+        None when the part is not cached and the API could not answer
+    """
+    entry = cache.get(_part_key(company_id, part))
+    if entry is None:
+        return load(company_id, part)
+
+    # One process refetches a stale part in the background; everyone keeps the stale copy meanwhile.
+    # Unknown companies are only looked up again once their entry expires
+    if entry['data'] is not None and time.time() - entry['fetched_at'] >= settings.BOOKING_CATALOG_FRESH_SECONDS:
+        _start_refresh(company_id, part)
+    return entry
+
+
+def get(company_id, part):
+    """Return the data of a catalog part of a company, or None (see get_entry)"""
+    entry = get_entry(company_id, part)
+    return entry['data'] if entry else None
+
+
+def get_index(company_id, part):
+    """Return the index of a catalog part of a company, or None (see get_entry)"""
+    entry = get_entry(company_id, part)
+    return entry['index'] if entry else None
+
+
+def get_services(company_id, service_ids):
+    """
+    Return the id, name, effective price and duration of the selected services
+
+    Unknown ids are skipped; each service appears once, in selection order.
+    """
+    index = get_index(company_id, 'services') or {}
+    return [dict(index[service_id]) for service_id in dict.fromkeys(map(str, service_ids)) if service_id in index]
+
+
+def get_professional(company_id, professional_id):
+    """Return the display name and avatar URL of a company's professional, or None"""
+    return (get_index(company_id, 'professionals') or {}).get(str(professional_id))
+
+
+def _remember_slug(slug, company):
+    expires_at = time.time() + settings.BOOKING_SLUG_LOCAL_SECONDS
+    with _local_slugs_lock:
+        if len(_local_slugs) >= _LOCAL_SLUG_LIMIT:
+            _local_slugs.clear()
+        _local_slugs[slug] = (company, expires_at)
+
+
+def fetch_slug(slug):
+    """
+    Look a company up by slug in the API, bypassing the cache
+
+    Returns:
+        Tuple of (ok, company): ok is False when the API could not answer;
+        company is None for an unknown slug
+    """
+    try:
+        response = upstream.get(get_api_url(f"companies/slug/{slug}"))
+
+        if response.status_code == 404:
+            return True, None
+        if response.ok:
+            data = response.json()
+            return True, (data.get('data') or None) if data.get('success') else None
+        logger.error(f"Failed to fetch company details: {response.status_code}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Error fetching company details: {e}")
+    return False, None
+
+
+def resolve_slug(slug):
+    """
+    Return the company details of a booking slug
+
+    Returns:
+        The company's details, or None for an unknown slug or when the API could not answer
+    """
+    local = _local_slugs.get(slug)
+    if local is not None and local[1] > time.time():
+        return local[0]
+
+    entry = cache.get(_slug_key(slug))
+    if entry is None:
+        ok, company = fetch_slug(slug)
+        if not ok:
+            return None
+        entry = {'company': company}
+        ttl = settings.BOOKING_CATALOG_TTL if company else settings.BOOKING_SLUG_MISS_TTL
+        cache.set(_slug_key(slug), entry, ttl)
+        if company and company.get('id'):
+            # Let invalidate() find the slug again, and spare the booking steps a company fetch
+            cache.set(_company_slug_key(company['id']), slug, settings.BOOKING_CATALOG_TTL)
+            cache.add(_part_key(company['id'], 'company'), _build_entry('company', company), settings.BOOKING_CATALOG_TTL)
+
+    _remember_slug(slug, entry['company'])
+    return entry['company']
+
+
+def invalidate(company_id, parts=None):
+    """Drop cached parts (all by default) of a company; refreshes already running will not store theirs"""
+    if not company_id:
+        return
+    cache.set(_changed_key(company_id), time.time(), settings.BOOKING_CATALOG_TTL)
+    keys = [_part_key(company_id, part) for part in (parts or PARTS)]
+    if 'company' in (parts or PARTS):
+        # The slug may have changed; other processes let go of it within BOOKING_SLUG_LOCAL_SECONDS
+        slug = cache.get(_company_slug_key(company_id))
+        if slug:
+            keys.append(_slug_key(slug))
+            _local_slugs.pop(slug, None)
+    cache.delete_many(keys)
+
+
+def get_write_parts(path):
+    """Return the catalog parts changed by a successful write to this API path"""
+    return [
+        part for part, (paths, prefixes) in WRITES.items()
+        if path in paths or any(path == prefix or path.startswith(prefix + '/') for prefix in prefixes)
+    ]
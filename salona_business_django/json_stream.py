@@ -0,0 +1,109 @@
+"""
+Incremental parsing of large JSON API responses
+The bookings API answers with one document, {"data": [...]}, that can hold a
+year of bookings. iter_array_items yields the array's items one at a time
+while the body is still arriving, so only the item being parsed and one
+network chunk are held in memory instead of the whole decoded list.
+"""
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+# Consumed text is dropped from the buffer once this much has accumulated
+_TRIM_AFTER = 64 * 1024
+
+
+class _Buffer:
+    """Decoded text received so far, with a read position"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read one more chunk; returns False at the end of the body"""
+        if self.eof:
+            return False
+        if self.pos > _TRIM_AFTER:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.text += self.decoder.decode(b'', final=True)
+            return False
+        self.text += self.decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the body"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Malformed JSON: expected one of {characters!r}, got {character!r}")
+        self.pos += 1
+        return character
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may still be growing
+            if end < len(self.text) or not self.fill():
+                self.pos = end
+                return value
+
+
+def iter_array_items(chunks, key):
+    """
+    Yield the items of the array under a top-level key of a JSON object
+
+    Args:
+        chunks: Iterable of bytes (or str) chunks of the JSON document
+        key: Top-level key holding the array
+
+    Yields:
+        Each array item, decoded; nothing if the key is missing or not an array
+
+    Raises:
+        ValueError: The document is not valid JSON
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        return
+
+    while True:
+        name = buffer.value()
+        buffer.expect(':')
+        if name == key and buffer.peek() == '[':
+            buffer.expect('[')
+            if buffer.peek() == ']':
+                return
+            while True:
+                yield buffer.value()
+                if buffer.expect(',]') == ']':
+                    return
+        buffer.value()
+        if buffer.expect(',}') == '}':
+            return
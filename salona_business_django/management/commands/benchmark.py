@@ -0,0 +1,322 @@
+"""
+Management command to micro-benchmark hot code paths on synthetic payloads
+
+Each target times the current implementation against the one it replaced
+(kept below as baseline_*) on the same generated bookings.
+"""
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+
+from salona_business_django import utc
+from users import rollups
+from users.reports import ReportsManager
+
+
+def build_booking_payload(size):
+    """A bulk booking update of `size` bookings, shaped like the calendar sends them"""
+    start = datetime(2025, 3, 1, 9, 0, tzinfo=timezone(timedelta(hours=2)))
+    bookings = []
+    for index in range(size):
+        booking_start = start + timedelta(minutes=30 * index)
+        bookings.append({
+            'id': f'booking-{index}',
+            'status': 'confirmed',
+            'start_time': booking_start.isoformat(),
+            'end_time': (booking_start + timedelta(minutes=45)).isoformat(),
+            'notes': 'Prefers the window seat',
+            'customer': {
+                'id': f'customer-{index % 500}',
+                'first_name': 'Alex',
+                'last_name': 'Doe',
+                'email': 'alex@example.com',
+                'phone': '+3725550000',
+            },
+            'services': [
+                {
+                    'category_service_id': f'service-{index % 20}',
+                    'user_id': f'user-{index % 8}',
+                    'duration': 45,
+                    'price': 3500,
+                    'tags': ['hair', 'color'],
+                },
+            ],
+            'created_at': '2025-02-01T10:00:00Z',
+        })
+    return {'bookings': bookings}
+
+
+def build_bookings_response(size, days=365):
+    """`size` bookings spread over the last `days` days, shaped like /api/v1/bookings data"""
+    today = datetime.now(timezone.utc).replace(hour=9, minute=0, second=0, microsecond=0)
+    statuses = ('completed', 'completed', 'completed', 'confirmed', 'cancelled', 'no_show')
+    bookings = []
+    for index in range(size):
+        start_at = today - timedelta(days=index % days, minutes=30 * (index % 16))
+        bookings.append({
+            'id': index,
+            'status': statuses[index % len(statuses)],
+            'total_price': 3500 + 500 * (index % 7),
+            'start_at': start_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'end_at': (start_at + timedelta(minutes=45)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'customer': {'id': f'customer-{index % 20000}'},
+            'booking_services': [
+                {
+                    'price': 35 + 5 * (index % 7),
+                    'assigned_staff': {
+                        'id': f'user-{index % 8}',
+                        'first_name': 'Staff',
+                        'last_name': str(index % 8),
+                    },
+                    'category_service': {'id': f'service-{index % 20}', 'name': f'Service {index % 20}'},
+                },
+            ],
+        })
+    return bookings
+
+
+def baseline_ensure_utc(data):
+    """APIProxyView.ensure_utc_params before utc.py: every key and string re-checked on each call"""
+    if not data or not isinstance(data, (dict, list)):
+        return data
+
+    time_field_patterns = [
+        'time', 'date', 'datetime', 'start', 'end', 'begin', 'from', 'to',
+        'created', 'updated', 'scheduled', 'appointment', 'booking',
+        'started_at', 'ended_at', 'created_at', 'updated_at', 'start_at', 'end_at'
+    ]
+
+    def is_time_field(field_name):
+        field_lower = field_name.lower()
+        return any(pattern in field_lower for pattern in time_field_patterns)
+
+    def is_iso_datetime(value_str):
+        if not isinstance(value_str, str):
+            return False
+        try:
+            datetime.fromisoformat(value_str.replace('Z', '+00:00'))
+            return True
+        except (ValueError, AttributeError):
+            return False
+
+    def convert_value(value):
+        if isinstance(value, str) and is_iso_datetime(value):
+            return value
+        return value
+
+    def process_dict(obj):
+        result = {}
+        for key, value in obj.items():
+            if value is None:
+                result[key] = value
+            elif isinstance(value, dict):
+                result[key] = process_dict(value)
+            elif isinstance(value, list):
+                result[key] = [process_dict(item) if isinstance(item, dict) else
+                               (process_list(item) if isinstance(item, list) else convert_value(item))
+                               for item in value]
+            elif is_time_field(key) and isinstance(value, str):
+                result[key] = convert_value(value)
+            else:
+                result[key] = value
+        return result
+
+    def process_list(lst):
+        return [process_dict(item) if isinstance(item, dict) else
+                (process_list(item) if isinstance(item, list) else item)
+                for item in lst]
+
+    if isinstance(data, dict):
+        return process_dict(data)
+    return process_list(data)
+
+
+def baseline_bookings_report(current_bookings, previous_bookings):
+    """The bookings report loop from before the day rollups: one pass per report over its own fetch"""
+    report = {
+        'total_bookings': 0,
+        'completed_bookings': 0,
+        'cancelled_bookings': 0,
+        'pending_bookings': 0,
+        'total_revenue': 0.0,
+        'average_booking_value': 0.0,
+        'bookings_by_day': {},
+        'revenue_by_day': {},
+        'bookings_by_staff': {},
+        'bookings_by_service': {},
+        'status_breakdown': {'completed': 0, 'pending': 0, 'cancelled': 0, 'confirmed': 0, 'no_show': 0},
+        'comparison': {'bookings_change': 0, 'revenue_change': 0},
+    }
+
+    for booking in current_bookings:
+        report['total_bookings'] += 1
+        booking['total_price'] = float(booking.get('total_price', 0) or 0) / 100
+        status = booking.get('status', 'pending').lower()
+        if status in report['status_breakdown']:
+            report['status_breakdown'][status] += 1
+
+        if status == 'completed':
+            report['completed_bookings'] += 1
+        elif status == 'cancelled':
+            report['cancelled_bookings'] += 1
+        else:
+            report['pending_bookings'] += 1
+
+        if status == 'completed':
+            price = float(booking.get('total_price', 0) or 0)
+            report['total_revenue'] += price
+
+        booking_date = booking.get('start_at', '')[:10]
+        if booking_date:
+            report['bookings_by_day'][booking_date] = report['bookings_by_day'].get(booking_date, 0) + 1
+            if status == 'completed':
+                price = float(booking.get('total_price', 0) or 0)
+                report['revenue_by_day'][booking_date] = report['revenue_by_day'].get(booking_date, 0) + price
+
+        services = booking.get('booking_services', [])
+        for service in services:
+            staff_id = service.get('assigned_staff', {}).get('id', 'Unassigned')
+            first_name = service.get('assigned_staff', {}).get('first_name', None)
+            last_name = service.get('assigned_staff', {}).get('last_name', None)
+            staff_name = (f"{first_name} {last_name}".strip()) if first_name or last_name else 'Unassigned'
+            if staff_id not in report['bookings_by_staff']:
+                report['bookings_by_staff'][staff_id] = {'name': staff_name, 'count': 0, 'revenue': 0.0}
+            report['bookings_by_staff'][staff_id]['count'] += 1
+            if status == 'completed':
+                price = float(booking.get('total_price', 0) or 0)
+                report['bookings_by_staff'][staff_id]['revenue'] += price
+
+        for service in services:
+            service_name = service.get('category_service', {}).get('name', 'Unknown')
+            if service_name not in report['bookings_by_service']:
+                report['bookings_by_service'][service_name] = {'count': 0, 'revenue': 0.0}
+            report['bookings_by_service'][service_name]['count'] += 1
+            if status == 'completed':
+                service_price = float(service.get('price', 0) or 0)
+                report['bookings_by_service'][service_name]['revenue'] += service_price
+
+    if report['completed_bookings'] > 0:
+        report['average_booking_value'] = report['total_revenue'] / report['completed_bookings']
+
+    if previous_bookings:
+        prev_total = len(previous_bookings)
+        prev_revenue = sum(
+            float(b.get('total_price', 0) or 0)
+            for b in previous_bookings
+            if b.get('status', '').lower() == 'completed'
+        )
+        if prev_total > 0:
+            report['comparison']['bookings_change'] = (report['total_bookings'] - prev_total) / prev_total * 100
+        if prev_revenue > 0:
+            report['comparison']['revenue_change'] = (report['total_revenue'] - prev_revenue) / prev_revenue * 100
+
+    return report
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark hot code paths on synthetic payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'target',
+            choices=['utc', 'reports'],
+            help='Code path to benchmark',
+        )
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=5000,
+            help='Number of bookings in the synthetic payload',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs; the best one is reported',
+        )
+
+    def handle(self, *args, **options):
+        getattr(self, f"benchmark_{options['target']}")(options['size'], options['repeat'])
+
+    def report(self, name, size, timings):
+        best = min(timings)
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {size} bookings in {best * 1000:.1f} ms '
+            f'({best / size * 1e6:.2f} us per booking, best of {len(timings)})'
+        ))
+        return best
+
+    def compare(self, baseline, best):
+        self.stdout.write(f'speedup over the baseline: {baseline / best:.2f}x')
+
+    @staticmethod
+    def time_runs(repeat, prepare, run):
+        """Best-of timings of run(prepare()), preparing outside the timed part"""
+        timings = []
+        for _ in range(repeat):
+            data = prepare()
+            started = time.perf_counter()
+            run(data)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def benchmark_utc(self, size, repeat):
+        """Time decoding and normalizing a bulk booking update, as the API proxy does"""
+        body = json.dumps(build_booking_payload(size)).encode()
+
+        baseline = self.time_runs(repeat, lambda: body, lambda data: baseline_ensure_utc(json.loads(data)))
+        timings = self.time_runs(repeat, lambda: body, utc.loads)
+
+        sample = utc.loads(body)['bookings'][0]
+        self.stdout.write(f"start_time normalized to {sample['start_time']}")
+        baseline_best = self.report('baseline ensure_utc_params', size, baseline)
+        self.compare(baseline_best, self.report('utc.loads', size, timings))
+
+    def benchmark_reports(self, size, repeat):
+        """Time the week, month and year bookings reports over two years of bookings"""
+        bookings = build_bookings_response(size, days=730)
+        now = datetime.now()
+        periods = {period: ReportsManager.get_period_range(period) for period in ('week', 'month', 'year')}
+
+        def fetches():
+            # The API filtered each report's current and previous period; copies, as the old loop edits prices
+            return [
+                (
+                    [dict(b) for b in bookings if start.strftime('%Y-%m-%d') <= b['start_at'][:10] <= now.strftime('%Y-%m-%d')],
+                    [dict(b) for b in bookings if previous.strftime('%Y-%m-%d') <= b['start_at'][:10] <= start.strftime('%Y-%m-%d')],
+                )
+                for previous, start, _ in periods.values()
+            ]
+
+        def reports(day_rollups):
+            manager = ReportsManager('benchmark')
+            manager._day_rollups = day_rollups
+            for period in periods:
+                manager.generate_bookings_report(period)
+
+        today = now.date()
+        first_day = periods['year'][0].date()
+
+        def cold(_):
+            # Nothing stored yet: both years are rolled up
+            reports(rollups.rollup_bookings(bookings, first_day, today, today))
+
+        # Later dashboards load the final days and only roll up the open ones, which the API returns alone
+        first_open = rollups.final_before(today)
+        stored = {
+            day: rollup for day, rollup in rollups.rollup_bookings(bookings, first_day, today, today).items()
+            if rollup['final']
+        }
+        open_bookings = [b for b in bookings if b['start_at'][:10] >= first_open.strftime('%Y-%m-%d')]
+
+        def warm(_):
+            reports({**stored, **rollups.rollup_bookings(open_bookings, first_open, today, today)})
+
+        baseline = self.time_runs(
+            repeat, fetches, lambda data: [baseline_bookings_report(current, previous) for current, previous in data]
+        )
+        baseline_best = self.report('baseline per-report loops', size, baseline)
+        self.compare(baseline_best, self.report('day rollups, none stored', size, self.time_runs(repeat, lambda: None, cold)))
+        self.compare(baseline_best, self.report('day rollups, final days stored', size, self.time_runs(repeat, lambda: None, warm)))
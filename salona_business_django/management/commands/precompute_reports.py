@@ -0,0 +1,49 @@
+"""
+Management command to precompute dashboard reports of companies
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users import report_cache
+
+
+class Command(BaseCommand):
+    help = 'Precompute week, month and year dashboard reports of companies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            action='append',
+            required=True,
+            help='Precompute this company (repeat for several)',
+        )
+        parser.add_argument(
+            '--access-token',
+            default=settings.REPORTS_SERVICE_ACCESS_TOKEN,
+            help='Credential the bookings API answers for the companies with '
+                 '(defaults to REPORTS_SERVICE_ACCESS_TOKEN); never stored',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running, precomputing every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        if not options['access_token']:
+            raise CommandError('Give --access-token or set REPORTS_SERVICE_ACCESS_TOKEN')
+
+        while True:
+            self.precompute(options['company'], options['access_token'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def precompute(self, companies, access_token):
+        for company in companies:
+            stored = report_cache.precompute(company, access_token)
+            style = self.style.SUCCESS if stored == len(report_cache.PERIODS) else self.style.WARNING
+            self.stdout.write(style(f'Company {company}: {stored}/{len(report_cache.PERIODS)} reports precomputed'))
@@ -38,6 +38,113 @@ SERVICE_URL = os.getenv('SERVICE_URL', '127.0.0.1:8000')
 ENDPOINT_URL = os.getenv('ENDPOINT_URL', '127.0.0.1:8000')
 API_BASE_URL = os.getenv('API_BASE_URL', 'http://127.0.0.1:8000/api')
 
+# Upstream API client (see salona_business_django/upstream.py)
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '5'))
+UPSTREAM_TIMEOUTS = {
+    'default': float(os.getenv('UPSTREAM_READ_TIMEOUT', '10')),
+    'reports': float(os.getenv('UPSTREAM_REPORTS_TIMEOUT', '15')),
+    'long': float(os.getenv('UPSTREAM_LONG_TIMEOUT', '30')),
+}
+# Keep-alive connections kept per host by each worker thread
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '10'))
+# Per-host overrides, e.g. "https://api.salona.me=20,https://maps.example.com=2"
+UPSTREAM_HOST_POOL_SIZES = {
+    origin.strip(): int(size)
+    for origin, size in (
+        item.rsplit('=', 1) for item in os.getenv('UPSTREAM_HOST_POOL_SIZES', '').split(',') if '=' in item
+    )
+}
+# Upper bound on concurrent connections held by each ASGI worker's async client
+UPSTREAM_ASYNC_MAX_CONNECTIONS = int(os.getenv('UPSTREAM_ASYNC_MAX_CONNECTIONS', '1000'))
+# Threads shared by all requests for fanning out independent page fetches
+UPSTREAM_FANOUT_WORKERS = int(os.getenv('UPSTREAM_FANOUT_WORKERS', '16'))
+# Coalesce identical concurrent GETs into one upstream call, per process and
+# optionally across workers through the shared (Redis) cache
+UPSTREAM_SINGLE_FLIGHT = os.getenv('UPSTREAM_SINGLE_FLIGHT', 'True').lower() == 'true'
+UPSTREAM_SINGLE_FLIGHT_SHARED = os.getenv('UPSTREAM_SINGLE_FLIGHT_SHARED', 'False').lower() == 'true'
+# Longest a coalesced caller waits for another call's result before making its own
+UPSTREAM_SINGLE_FLIGHT_WAIT = float(os.getenv('UPSTREAM_SINGLE_FLIGHT_WAIT', '5'))
+UPSTREAM_SINGLE_FLIGHT_MAX_BYTES = int(os.getenv('UPSTREAM_SINGLE_FLIGHT_MAX_BYTES', str(1024 * 1024)))  # 1 MB
+# Log each process's coalescing counters at INFO this often, in seconds (0 turns it off)
+UPSTREAM_SINGLE_FLIGHT_LOG_INTERVAL = int(os.getenv('UPSTREAM_SINGLE_FLIGHT_LOG_INTERVAL', '60'))
+
+
+# Access token refresh shared between workers (see users/auth.py)
+# Longest one worker may hold the refresh lock while others wait for its result
+TOKEN_REFRESH_LOCK_TIMEOUT = float(os.getenv('TOKEN_REFRESH_LOCK_TIMEOUT', '10'))
+# How long a new token pair stays available to requests still sending the old refresh token
+TOKEN_REFRESH_RESULT_TTL = int(os.getenv('TOKEN_REFRESH_RESULT_TTL', '60'))
+# How long the current user's /users/me data is reused (never past the access token's expiry)
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '60'))
+# How long the caller's company is remembered per access token (never past its expiry), for proxy invalidations
+TOKEN_COMPANY_CACHE_TTL = int(os.getenv('TOKEN_COMPANY_CACHE_TTL', str(24 * 3600)))  # 1 day
+
+# Local access token verification: expired tokens are refreshed up front and company and role
+# come from the token; leave the key empty to always ask /users/me
+# The secret for HS* algorithms, or the PEM public key for RS*/ES* (needs the cryptography package)
+JWT_VERIFICATION_KEY = os.getenv('JWT_VERIFICATION_KEY', '').replace('\\n', '\n')
+JWT_ALGORITHMS = os.getenv('JWT_ALGORITHMS', 'HS256').split(',')
+JWT_AUDIENCE = os.getenv('JWT_AUDIENCE') or None
+JWT_ISSUER = os.getenv('JWT_ISSUER') or None
+# user_data field -> token claim; tokens missing any of these fall back to /users/me
+JWT_IDENTITY_CLAIMS = {
+    'id': 'sub',
+    'company_id': 'company_id',
+    'role': 'role',
+    'role_status': 'status',
+}
+
+# Longest date range the bookings API serves in one call (0 = no cap); reports
+# split longer ranges into windows streamed one after another
+REPORTS_MAX_FETCH_DAYS = int(os.getenv('REPORTS_MAX_FETCH_DAYS', '0')) or None
+
+# Per-day booking rollups behind the dashboard reports (see users/rollups.py)
+# Days this many days old or older are final and never refetched
+REPORTS_ROLLUP_FINAL_AFTER_DAYS = int(os.getenv('REPORTS_ROLLUP_FINAL_AFTER_DAYS', '3'))
+REPORTS_ROLLUP_TTL = int(os.getenv('REPORTS_ROLLUP_TTL', str(90 * 24 * 3600)))  # 90 days
+# Staff utilization in reports: working hours per work day (Monday = 0)
+REPORTS_STAFF_HOURS_PER_DAY = float(os.getenv('REPORTS_STAFF_HOURS_PER_DAY', '8'))
+REPORTS_STAFF_WORK_DAYS = tuple(int(day) for day in os.getenv('REPORTS_STAFF_WORK_DAYS', '0,1,2,3,4,5').split(','))
+# Days of history behind customer lifetime value and retention cohorts
+REPORTS_CUSTOMER_HISTORY_DAYS = int(os.getenv('REPORTS_CUSTOMER_HISTORY_DAYS', '365'))
+# Precomputed week/month/year dashboard reports (see users/report_cache.py)
+REPORTS_PRECOMPUTE_TTL = int(os.getenv('REPORTS_PRECOMPUTE_TTL', '900'))
+# Age after which a dashboard visit refreshes the bundle in the background, and threads doing it
+REPORTS_REFRESH_AFTER = int(os.getenv('REPORTS_REFRESH_AFTER', '300'))
+REPORTS_REFRESH_WORKERS = int(os.getenv('REPORTS_REFRESH_WORKERS', '2'))
+# Credential the precompute_reports command uses when given no --access-token
+REPORTS_SERVICE_ACCESS_TOKEN = os.getenv('REPORTS_SERVICE_ACCESS_TOKEN', '')
+
+# Public booking catalog: company details, address, services and professionals (see salona_business_django/catalog.py)
+# Parts younger than this are served without refetching; older ones are refreshed in the background
+BOOKING_CATALOG_FRESH_SECONDS = int(os.getenv('BOOKING_CATALOG_FRESH_SECONDS', '120'))
+# Longest a part is kept, and served stale, before it has to be fetched inline again
+BOOKING_CATALOG_TTL = int(os.getenv('BOOKING_CATALOG_TTL', '3600'))
+# Threads refetching stale parts, and most parts queued for them per process
+BOOKING_CATALOG_REFRESH_WORKERS = int(os.getenv('BOOKING_CATALOG_REFRESH_WORKERS', '4'))
+BOOKING_CATALOG_REFRESH_QUEUE = int(os.getenv('BOOKING_CATALOG_REFRESH_QUEUE', '100'))
+# Unknown booking slugs and company ids are remembered this long, and slugs kept in process memory at most this long
+BOOKING_SLUG_MISS_TTL = int(os.getenv('BOOKING_SLUG_MISS_TTL', '600'))
+BOOKING_SLUG_LOCAL_SECONDS = int(os.getenv('BOOKING_SLUG_LOCAL_SECONDS', '60'))
+# Monthly availability of the booking calendar (see salona_business_django/availability.py)
+BOOKING_AVAILABILITY_TTL = int(os.getenv('BOOKING_AVAILABILITY_TTL', '120'))
+# Threads prefetching the following month, and most months queued for them per process
+BOOKING_AVAILABILITY_PREFETCH_WORKERS = int(os.getenv('BOOKING_AVAILABILITY_PREFETCH_WORKERS', '4'))
+BOOKING_AVAILABILITY_PREFETCH_QUEUE = int(os.getenv('BOOKING_AVAILABILITY_PREFETCH_QUEUE', '100'))
+
+# Multipart uploads forwarded by the API proxy
+API_PROXY_MAX_UPLOAD_SIZE = int(os.getenv('API_PROXY_MAX_UPLOAD_SIZE', str(10 * 1024 * 1024)))  # 10 MB
+API_PROXY_UPLOAD_CHUNK_SIZE = int(os.getenv('API_PROXY_UPLOAD_CHUNK_SIZE', str(64 * 1024)))  # 64 KB
+
+# Most subrequests accepted by the API proxy's batch endpoint (/users/api/_batch)
+API_BATCH_MAX_REQUESTS = int(os.getenv('API_BATCH_MAX_REQUESTS', '20'))
+
+# Per-user cache of idempotent GETs proxied by the API proxy (see users/proxy_cache.py)
+API_PROXY_GET_CACHE_TTL = int(os.getenv('API_PROXY_GET_CACHE_TTL', '300'))
+# Entries younger than this are served without revalidating upstream
+API_PROXY_GET_CACHE_FRESH_SECONDS = float(os.getenv('API_PROXY_GET_CACHE_FRESH_SECONDS', '5'))
+API_PROXY_GET_CACHE_MAX_BYTES = int(os.getenv('API_PROXY_GET_CACHE_MAX_BYTES', str(512 * 1024)))  # 512 KB
+
 
 # Application definition
 
@@ -55,7 +162,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'salona_business_django.cache_middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise for static files, async-capable
     'salona_business_django.cache_middleware.StaticFilesCacheMiddleware',  # Custom caching middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Add locale middleware for language switching
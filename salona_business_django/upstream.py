@@ -0,0 +1,630 @@
+"""
+Pooled HTTP client for calls to the Salona API
+Every view, proxy and report goes through this module so upstream calls reuse
+keep-alive connections instead of paying a TCP+TLS handshake each time
+
+Identical concurrent GETs (same URL, query, headers and cookies) are
+coalesced into a single upstream call whose result every caller shares,
+within the process and, with UPSTREAM_SINGLE_FLIGHT_SHARED, across workers
+through the Django cache. Each process logs how many calls it coalesced
+every UPSTREAM_SINGLE_FLIGHT_LOG_INTERVAL seconds.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+_local = threading.local()
+_async_clients = weakref.WeakKeyDictionary()
+_executor = None
+_executor_lock = threading.Lock()
+
+_in_flight = {}
+_async_in_flight = weakref.WeakKeyDictionary()
+_in_flight_lock = threading.Lock()
+_single_flight_stats = Counter()
+_single_flight_logged_at = time.monotonic()
+
+logger = logging.getLogger(__name__)
+
+
+def get_timeout(profile='default'):
+    """
+    Resolve a named timeout profile from settings
+
+    Args:
+        profile: Key in settings.UPSTREAM_TIMEOUTS ('default', 'long', 'reports', ...)
+
+    Returns:
+        Tuple of (connect timeout, read timeout) in seconds
+    """
+    timeouts = getattr(settings, 'UPSTREAM_TIMEOUTS', {})
+    read_timeout = timeouts.get(profile, timeouts.get('default', 10))
+    return getattr(settings, 'UPSTREAM_CONNECT_TIMEOUT', 5), read_timeout
+
+
+def _host_pool_sizes():
+    """Return {origin: pool size} for hosts with their own connection pool"""
+    host_pool_sizes = {_api_origin(): getattr(settings, 'UPSTREAM_POOL_SIZE', 10)}
+    host_pool_sizes.update(getattr(settings, 'UPSTREAM_HOST_POOL_SIZES', {}))
+    return host_pool_sizes
+
+
+def _make_adapter(pool_size):
+    """Create a transport adapter holding up to pool_size keep-alive connections"""
+    return HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+
+
+def _api_origin():
+    """Return scheme://host[:port] of the configured API"""
+    parts = urlsplit(getattr(settings, 'API_BASE_URL', 'https://api.salona.me'))
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def build_session():
+    """
+    Build a requests session with per-host connection pools
+
+    The session never stores cookies: it is shared by every user served by
+    this thread, so auth cookies must only travel with the request they
+    were passed to.
+    """
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    default_size = getattr(settings, 'UPSTREAM_POOL_SIZE', 10)
+    session.mount('http://', _make_adapter(default_size))
+    session.mount('https://', _make_adapter(default_size))
+
+    for origin, pool_size in _host_pool_sizes().items():
+        session.mount(origin, _make_adapter(pool_size))
+
+    return session
+
+
+def get_session():
+    """Return the keep-alive session owned by the current thread"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = build_session()
+    return session
+
+
+def get_single_flight_stats():
+    """
+    Return this process's single-flight counters
+
+    'leaders' counts coalescable GETs that went upstream, 'coalesced' the
+    ones answered by an identical call in flight in this process and
+    'coalesced_shared' those answered by a call made in another worker.
+    """
+    with _in_flight_lock:
+        return _single_flight_snapshot()
+
+
+def _single_flight_snapshot():
+    return {name: _single_flight_stats[name] for name in ('leaders', 'coalesced', 'coalesced_shared')}
+
+
+def _record(name):
+    """
+    Count a single-flight outcome; call holding _in_flight_lock
+
+    Returns:
+        The counters when they are due to be logged, otherwise None
+    """
+    global _single_flight_logged_at
+    _single_flight_stats[name] += 1
+    interval = getattr(settings, 'UPSTREAM_SINGLE_FLIGHT_LOG_INTERVAL', 60)
+    now = time.monotonic()
+    if not interval or now - _single_flight_logged_at < interval:
+        return None
+    _single_flight_logged_at = now
+    return _single_flight_snapshot()
+
+
+def _log_stats(stats):
+    if stats is None:
+        return
+    coalesced = stats['coalesced'] + stats['coalesced_shared']
+    total = stats['leaders'] + coalesced
+    logger.info(
+        f"Single-flight: {coalesced}/{total} upstream GETs coalesced "
+        f"({stats['coalesced']} in this process, {stats['coalesced_shared']} across workers), "
+        f"{stats['leaders']} made"
+    )
+
+
+def _count(name):
+    with _in_flight_lock:
+        stats = _record(name)
+    _log_stats(stats)
+
+
+def _single_flight_key(namespace, method, url, headers):
+    """Cache key identifying identical GETs, or None if the call must not be coalesced"""
+    if method != 'GET' or not getattr(settings, 'UPSTREAM_SINGLE_FLIGHT', True):
+        return None
+    # Cookies and Authorization travel in the headers, so the key includes the caller's identity
+    identity = '\n'.join(f"{name.lower()}:{value}" for name, value in sorted(headers.items()))
+    digest = hashlib.sha256(f"{url}\n{identity}".encode()).hexdigest()
+    return f"upstream:single_flight:{namespace}:{digest}"
+
+
+def _shared_single_flight():
+    return getattr(settings, 'UPSTREAM_SINGLE_FLIGHT_SHARED', False)
+
+
+def _shared_wait():
+    return getattr(settings, 'UPSTREAM_SINGLE_FLIGHT_WAIT', 5)
+
+
+def _max_shared_bytes():
+    return getattr(settings, 'UPSTREAM_SINGLE_FLIGHT_MAX_BYTES', 1024 * 1024)
+
+
+def _snapshot(status_code, headers, body):
+    """Picklable (status, headers, body) form of a response shared between workers"""
+    return status_code, list(headers), body
+
+
+def _decoded_headers(headers):
+    """Drop the headers describing the wire encoding of a body that was already decoded"""
+    return [
+        (name, value) for name, value in headers
+        if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')
+    ]
+
+
+def _wait_for_shared_result(key, token):
+    """Poll for the result of another worker's call until it lands or the wait runs out"""
+    deadline = time.monotonic() + _shared_wait()
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        snapshot = cache.get(f"{key}:{token}")
+        if snapshot is not None:
+            return snapshot
+        if cache.get(f"{key}:lock") != token:
+            break  # The other worker gave up without a shareable result
+    return None
+
+
+def _response_from_snapshot(snapshot, url):
+    status_code, headers, body = snapshot
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = body
+    return response
+
+
+def _shared_call(key, call, url):
+    """Run call() unless another worker is already making it, then share its result"""
+    token = uuid.uuid4().hex
+    if not cache.add(f"{key}:lock", token, _shared_wait()):
+        other = cache.get(f"{key}:lock")
+        snapshot = _wait_for_shared_result(key, other) if other else None
+        if snapshot is not None:
+            _count('coalesced_shared')
+            return _response_from_snapshot(snapshot, url)
+        return call()
+
+    try:
+        response = call()
+        if len(response.content) <= _max_shared_bytes():
+            snapshot = _snapshot(response.status_code, _decoded_headers(response.headers.items()), response.content)
+            cache.set(f"{key}:{token}", snapshot, _shared_wait())
+        return response
+    finally:
+        cache.delete(f"{key}:lock")
+
+
+def _coalesce(key, call):
+    """Run call() once for all threads asking for the same key at the same time"""
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = _in_flight[key] = Future()
+        stats = _record('leaders' if is_leader else 'coalesced')
+    _log_stats(stats)
+
+    if not is_leader:
+        return future.result()
+
+    try:
+        result = call()
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+def request(method, url, timeout='default', **kwargs):
+    """
+    Send a request to the upstream API over the pooled session
+
+    Identical concurrent GETs share one call and one Response object, so
+    callers must treat the returned response as read-only.
+
+    Args:
+        method: HTTP method
+        url: Absolute URL
+        timeout: Timeout profile name from settings.UPSTREAM_TIMEOUTS, or an explicit value
+        **kwargs: Passed through to requests.Session.request
+
+    Returns:
+        requests.Response
+    """
+    if isinstance(timeout, str):
+        timeout = get_timeout(timeout)
+
+    def call():
+        return get_session().request(method, url, timeout=timeout, **kwargs)
+
+    key = None
+    if not kwargs.get('stream'):
+        params = kwargs.get('params')
+        if params:
+            params = sorted(params.items()) if isinstance(params, dict) else params
+        full_url = f"{url}?{urlencode(params, doseq=True)}" if params else url
+        headers = dict(kwargs.get('headers') or {})
+        cookies = kwargs.get('cookies')
+        if cookies:
+            headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in sorted(dict(cookies).items()))
+        key = _single_flight_key('sync', method, full_url, headers)
+
+    if key is None:
+        return call()
+    if _shared_single_flight():
+        return _coalesce(key, lambda: _shared_call(key, call, url))
+    return _coalesce(key, call)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request('PATCH', url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request('DELETE', url, **kwargs)
+
+
+def _make_async_transport(keepalive_size):
+    """Create an async transport keeping up to keepalive_size idle connections"""
+    return httpx.AsyncHTTPTransport(limits=httpx.Limits(
+        max_connections=getattr(settings, 'UPSTREAM_ASYNC_MAX_CONNECTIONS', 1000),
+        max_keepalive_connections=keepalive_size
+    ))
+
+
+def build_async_client():
+    """
+    Build an httpx client with per-host connection pools
+
+    Like build_session, the client is shared between users and never stores
+    cookies; pass them per request to arequest.
+    """
+    return httpx.AsyncClient(
+        transport=_make_async_transport(getattr(settings, 'UPSTREAM_POOL_SIZE', 10)),
+        mounts={
+            origin: _make_async_transport(pool_size)
+            for origin, pool_size in _host_pool_sizes().items()
+        },
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        follow_redirects=True
+    )
+
+
+def get_async_client():
+    """
+    Return the async client bound to the running event loop
+
+    Under ASGI there is one long-lived loop per worker, so this is one pooled
+    client per worker. Clients cannot be shared across loops, hence the lookup.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = build_async_client()
+    return client
+
+
+async def closing_async_client(awaitable):
+    """
+    Await an async view, then close the async client of its event loop
+
+    Under WSGI, Django runs each async view on an event loop of its own; the
+    loop's client would otherwise be left open, with its connections, when
+    the loop goes away.
+    """
+    try:
+        return await awaitable
+    finally:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class _TeeStream(httpx.AsyncByteStream):
+    """
+    Upstream body stream that also hands the complete body to waiting callers
+
+    on_complete receives the raw body once it has been read to the end, or
+    None if it was abandoned or grew past UPSTREAM_SINGLE_FLIGHT_MAX_BYTES.
+    """
+
+    def __init__(self, stream, on_complete):
+        self.stream = stream
+        self.on_complete = on_complete
+        self.completed = False
+
+    async def _complete(self, body):
+        if not self.completed:
+            self.completed = True
+            await self.on_complete(body)
+
+    async def __aiter__(self):
+        chunks, size = [], 0
+        async for chunk in self.stream:
+            if chunks is not None:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > _max_shared_bytes():
+                    # Too large to hold for others; they will make their own call
+                    chunks = None
+                    await self._complete(None)
+            yield chunk
+        await self._complete(b''.join(chunks) if chunks is not None else None)
+
+    async def aclose(self):
+        await self.stream.aclose()
+        await self._complete(None)
+
+
+async def _await_shared_result(key, token):
+    """Async counterpart of _wait_for_shared_result"""
+    deadline = time.monotonic() + _shared_wait()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        snapshot = await cache.aget(f"{key}:{token}")
+        if snapshot is not None:
+            return snapshot
+        if await cache.aget(f"{key}:lock") != token:
+            break
+    return None
+
+
+def _replay(snapshot, upstream_request):
+    """Rebuild a fully read httpx.Response from a shared snapshot"""
+    status_code, headers, body = snapshot
+    return httpx.Response(status_code, headers=headers, content=body, request=upstream_request)
+
+
+async def _send_coalesced(client, upstream_request, key, stream):
+    """Send upstream_request, or share the result of the identical call already in flight"""
+    loop = asyncio.get_running_loop()
+    in_flight = _async_in_flight.setdefault(loop, {})
+
+    waiting = in_flight.get(key)
+    if waiting is not None:
+        try:
+            snapshot = await asyncio.wait_for(asyncio.shield(waiting), _shared_wait())
+        except asyncio.TimeoutError:
+            # The leader's caller never finished reading its response; stop waiting on it
+            if in_flight.get(key) is waiting:
+                del in_flight[key]
+            snapshot = None
+        if snapshot is not None:
+            _count('coalesced')
+            return _replay(snapshot, upstream_request)
+        return await client.send(upstream_request, stream=stream)
+
+    result = in_flight[key] = loop.create_future()
+    _count('leaders')
+    shared_token = None
+
+    if _shared_single_flight():
+        shared_token = uuid.uuid4().hex
+        if not await cache.aadd(f"{key}:lock", shared_token, _shared_wait()):
+            shared_token = None
+            other = await cache.aget(f"{key}:lock")
+            snapshot = await _await_shared_result(key, other) if other else None
+            if snapshot is not None:
+                _count('coalesced_shared')
+                in_flight.pop(key, None)
+                result.set_result(snapshot)
+                return _replay(snapshot, upstream_request)
+
+    response = None
+
+    async def on_complete(body, decoded=False):
+        if in_flight.get(key) is result:
+            del in_flight[key]
+        snapshot = None
+        if body is not None:
+            headers = response.headers.multi_items()
+            snapshot = _snapshot(response.status_code, _decoded_headers(headers) if decoded else headers, body)
+        if not result.done():
+            result.set_result(snapshot)
+        if shared_token:
+            if snapshot is not None:
+                await cache.aset(f"{key}:{shared_token}", snapshot, _shared_wait())
+            await cache.adelete(f"{key}:lock")
+
+    try:
+        response = await client.send(upstream_request, stream=True)
+    except BaseException:
+        await on_complete(None)
+        raise
+
+    if response.is_stream_consumed:
+        # Some transports hand back bodies that are already read and decoded
+        await on_complete(response.content, decoded=True)
+        return response
+
+    response.stream = _TeeStream(response.stream, on_complete)
+    if not stream:
+        await response.aread()
+    return response
+
+
+async def arequest(method, url, timeout='default', cookies=None, headers=None, stream=False, **kwargs):
+    """
+    Async counterpart of request(), sent over the event loop's pooled client
+
+    Identical concurrent GETs share one call: the first caller gets the live
+    response and the others a fully read copy of it.
+
+    Args:
+        method: HTTP method
+        url: Absolute URL
+        timeout: Timeout profile name from settings.UPSTREAM_TIMEOUTS, or an explicit value
+        cookies: Optional dict of cookies for this request only
+        headers: Optional dict of request headers
+        stream: Return as soon as headers arrive; the caller must read or
+            aclose() the response to release its connection
+        **kwargs: Passed through to httpx.AsyncClient.build_request
+
+    Returns:
+        httpx.Response
+    """
+    if isinstance(timeout, str):
+        connect_timeout, read_timeout = get_timeout(timeout)
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+    headers = dict(headers or {})
+    if cookies:
+        headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in cookies.items() if value)
+
+    client = get_async_client()
+    upstream_request = client.build_request(method, url, headers=headers, timeout=timeout, **kwargs)
+
+    key = _single_flight_key('async', method, str(upstream_request.url), dict(upstream_request.headers))
+    if key is None:
+        return await client.send(upstream_request, stream=stream)
+    return await _send_coalesced(client, upstream_request, key, stream)
+
+
+async def iter_body(response):
+    """Yield an upstream body as received, releasing the connection when done"""
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+async def relay_response(request, response):
+    """
+    Relay an upstream response to the client without parsing it
+
+    Under ASGI an unread body (see arequest's stream flag) is streamed chunk
+    by chunk, keeping the upstream status, Content-Type and Content-Encoding.
+    Bodies that were already read, and responses served under WSGI, are
+    relayed as bytes.
+
+    Args:
+        request: Incoming Django request
+        response: httpx.Response from arequest
+
+    Returns:
+        Django response
+    """
+    content_type = response.headers.get('content-type', 'application/json')
+
+    if response.status_code == 204 or response.headers.get('content-length') == '0':
+        await response.aclose()
+        return JsonResponse({}, status=response.status_code)
+
+    if isinstance(request, ASGIRequest) and not response.is_stream_consumed:
+        django_response = StreamingHttpResponse(
+            iter_body(response),
+            status=response.status_code,
+            content_type=content_type
+        )
+        if 'content-encoding' in response.headers:
+            django_response['Content-Encoding'] = response.headers['content-encoding']
+        return django_response
+
+    body = await response.aread()
+    return HttpResponse(body, status=response.status_code, content_type=content_type)
+
+
+def _get_executor():
+    """Return the process-wide pool used to fan out independent upstream calls"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'UPSTREAM_FANOUT_WORKERS', 16),
+                    thread_name_prefix='upstream-fanout'
+                )
+    return _executor
+
+
+def _run_in_pool(call):
+    """Run a fanned-out call, marking the thread so nested fan-outs run inline"""
+    _local.in_fan_out = True
+    try:
+        return call()
+    finally:
+        _local.in_fan_out = False
+
+
+def fan_out(calls):
+    """
+    Run independent zero-argument callables concurrently
+
+    Nested fan-outs (a fanned-out call fanning out again) run sequentially
+    in the calling pool thread so the shared pool can never deadlock on itself.
+
+    Args:
+        calls: Dictionary mapping a result name to a callable
+
+    Returns:
+        Dictionary mapping each name to its callable's result. An exception
+        raised by any callable is re-raised here, as if called sequentially.
+    """
+    if len(calls) < 2 or getattr(_local, 'in_fan_out', False):
+        return {name: call() for name, call in calls.items()}
+
+    executor = _get_executor()
+    futures = {name: executor.submit(_run_in_pool, call) for name, call in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
@@ -37,4 +37,6 @@ urlpatterns = [
     path('customers/', include('customers.urls')),
     path('book/<str:company_slug>/', views.booking, name='booking_appointment'),
     path('book/<str:company_slug>/confirmation/', views.booking_confirmation, name='booking_confirmation'),
+    path('api/availability/<str:company_id>/', views.booking_availability, name='booking_availability'),
+    path('api/bookings/<str:company_id>/', views.create_booking, name='booking_create'),
 ]
@@ -0,0 +1,138 @@
+"""
+UTC normalization of datetimes in payloads sent to the Salona API
+The API stores and expects UTC. Offset-aware ISO 8601 datetimes found under
+time-related keys are converted to UTC ('...Z'); naive values, plain dates
+and values already in UTC are left untouched.
+
+Key classifications are compiled once and cached per key and per object
+shape, so large payloads made of many same-shaped objects (bulk bookings)
+classify each key once and only parse values that look like offset-aware
+datetimes. JSON bodies are best normalized while they are decoded (loads):
+each object is handed over as soon as it is built and only its time keys
+are visited, so subtrees without time keys are never walked. ensure_utc
+normalizes data that is already decoded, and has to walk all of it.
+"""
+import json
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Common time field patterns
+TIME_FIELD_PATTERNS = (
+    'time', 'date', 'datetime', 'start', 'end', 'begin', 'from', 'to',
+    'created', 'updated', 'scheduled', 'appointment', 'booking',
+    'started_at', 'ended_at', 'created_at', 'updated_at', 'start_at', 'end_at',
+)
+
+_TIME_FIELD = re.compile('|'.join(re.escape(pattern) for pattern in TIME_FIELD_PATTERNS))
+
+# Only offset-aware datetimes need converting; anything else is skipped without parsing
+_OFFSET_DATETIME = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:[+-]\d{2}:?\d{2}|Z)')
+_UTC_SUFFIXES = ('Z', '+00:00', '-00:00', '+0000', '-0000')
+
+
+@lru_cache(maxsize=4096)
+def is_time_field(key):
+    """Check if field name matches time patterns"""
+    return isinstance(key, str) and _TIME_FIELD.search(key.lower()) is not None
+
+
+@lru_cache(maxsize=1024)
+def _time_keys(keys):
+    """Compiled plan for one object shape: the keys whose values may hold times"""
+    return frozenset(key for key in keys if is_time_field(key))
+
+
+def to_utc(value):
+    """
+    Convert an offset-aware ISO 8601 datetime string to UTC
+
+    Returns:
+        The UTC datetime as ISO 8601 with a 'Z' suffix, or the value itself
+        when it is not an offset-aware datetime or is already in UTC
+    """
+    if not isinstance(value, str) or value.endswith(_UTC_SUFFIXES) or not _OFFSET_DATETIME.fullmatch(value):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    return parsed.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _normalize_time_values(items):
+    """Convert the strings of a list (and its nested lists) held by a time key"""
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            items[index] = to_utc(item)
+        elif isinstance(item, list):
+            _normalize_time_values(item)
+
+
+def _normalize_object(obj):
+    """
+    json object_hook: convert the times of one object's own time keys
+
+    Nested objects were handed to the hook, and converted, when they were
+    decoded, so nothing below this object is visited again.
+    """
+    for key in _time_keys(tuple(obj)):
+        value = obj[key]
+        if isinstance(value, str):
+            obj[key] = to_utc(value)
+        elif isinstance(value, list):
+            _normalize_time_values(value)
+    return obj
+
+
+def loads(body):
+    """
+    Decode a JSON request body, converting its time-related values to UTC
+
+    Same result as ensure_utc(json.loads(body)), without walking the decoded
+    payload a second time.
+
+    Raises:
+        json.JSONDecodeError: The body is not valid JSON
+    """
+    return json.loads(body, object_hook=_normalize_object)
+
+
+def _normalize_list(items, time_valued):
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            _normalize_dict(item)
+        elif isinstance(item, list):
+            _normalize_list(item, time_valued)
+        elif time_valued and isinstance(item, str):
+            items[index] = to_utc(item)
+
+
+def _normalize_dict(obj):
+    time_keys = _time_keys(tuple(obj))
+    for key, value in obj.items():
+        if isinstance(value, str):
+            if key in time_keys:
+                obj[key] = to_utc(value)
+        elif isinstance(value, dict):
+            _normalize_dict(value)
+        elif isinstance(value, list):
+            # Scalar lists only hold times under time keys, e.g. "dates": [...]
+            _normalize_list(value, key in time_keys)
+
+
+def ensure_utc(data):
+    """
+    Convert time-related values in a request payload to UTC, in place
+
+    Args:
+        data: Dictionary or list decoded from JSON, a form or a query string
+
+    Returns:
+        The same data, with offset-aware datetimes under time keys in UTC
+    """
+    if isinstance(data, dict):
+        _normalize_dict(data)
+    elif isinstance(data, list):
+        _normalize_list(data, False)
+    return data
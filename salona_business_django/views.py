@@ -4,24 +4,20 @@ Views for the main Salona application
 from django.shortcuts import render
 from django.views import View
 from django.utils.translation import gettext_lazy as _
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 import requests
 import logging
 import json
+import re
 from datetime import datetime
 from django.conf import settings
+from salona_business_django import availability, catalog, upstream
 
 logger = logging.getLogger(__name__)
 
 
-def get_api_url(endpoint):
-    """Helper function to construct API URL"""
-    base_url = getattr(settings, 'API_BASE_URL', 'https://api.salona.me/api')
-    # Remove trailing /api if present and add it back
-    base_url = base_url.rstrip('/api').rstrip('/')
-    return f"{base_url}/api/v1/{endpoint.lstrip('/')}"
-
-
 def home(request):
     """Home page view for Salona business management system"""
     context = {
@@ -63,57 +59,18 @@ def home(request):
 
 
 def fetch_company_detail_by_slug(slug: str):
-    """Fetch company details by slug from the API"""
-    try:
-        api_url = get_api_url(f"companies/slug/{slug}")
-        response = requests.get(api_url, timeout=10)
-
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch company details: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching company details: {e}")
-    return None
+    """Fetch company details by slug, from the catalog's slug index"""
+    return catalog.resolve_slug(slug)
 
 
 def fetch_services(company_id):
-    """Fetch services for a company from API"""
-    try:
-        api_url = get_api_url(f"services/companies/{company_id}/services")
-        response = requests.get(api_url, timeout=10)
-
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch services: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching services: {e}")
-    return []
+    """Fetch services for a company, from the catalog cache"""
+    return catalog.get(company_id, 'services') or []
 
 def get_services_details(company_id, service_ids):
-    """Get details for selected services"""
-    services = []
-    total_price = 0
-
-    all_services = fetch_services(company_id)
-
-    for category in all_services:
-        for service in category.get('services', []):
-            if service['id'] in service_ids:
-                price = (service.get('discount_price') or service.get('price') or 0) / 100
-                services.append({
-                    'id': service['id'],
-                    'name': service['name'],
-                    'price': price,
-                    'duration': service.get('duration', 60)
-                })
-                total_price += float(price)
-
+    """Get details for selected services, from the catalog's service index"""
+    services = catalog.get_services(company_id, service_ids)
+    total_price = sum(float(service['price']) for service in services)
     return services, total_price
 
 
@@ -130,35 +87,17 @@ def format_time_12h(time_24h):
 
 
 def fetch_professionals(company_id):
-    """Fetch professionals (staff) for a company from API"""
-    try:
-        api_url = get_api_url(f"services/companies/{company_id}/users")
-        response = requests.get(api_url, timeout=10)
-
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch professionals: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching professionals: {e}")
-    return []
+    """Fetch professionals (staff) for a company, from the catalog cache"""
+    return catalog.get(company_id, 'professionals') or []
 
 
 def get_professional_name(company_id, professional_id):
-    """Get professional name by ID"""
+    """Get professional name by ID, from the catalog's professional index"""
     if professional_id == 'any':
         return "Any Professional"
 
-    professionals = fetch_professionals(company_id)
-    for item in professionals:
-        if item.get('user') and item['user'].get('id') == professional_id:
-            first_name = item['user'].get('first_name', '')
-            last_name = item['user'].get('last_name', '')
-            return f"{first_name} {last_name}".strip() or "Professional"
-
-    return "Professional"
+    professional = catalog.get_professional(company_id, professional_id)
+    return professional['name'] if professional else "Professional"
 
 def booking(request, company_slug: str):
     company = fetch_company_detail_by_slug(company_slug)
@@ -175,6 +114,10 @@ def booking(request, company_slug: str):
             # Store selected services in session
             request.session['selected_services'] = selected_services
 
+            # Load what the review page needs while the customer picks a professional and time
+            if company:
+                catalog.warm(company_id, ('services', 'professionals'))
+
             # Move to step 2
             return render(request, 'customers/booking_step2.html', {
                 'company_slug': company_slug,
@@ -280,20 +223,8 @@ def booking(request, company_slug: str):
 
 
 def fetch_company_address(company_id):
-    """Fetch company address from API"""
-    try:
-        api_url = get_api_url(f"companies/{company_id}/address")
-        response = requests.get(api_url, timeout=10)
-
-        if response.ok:
-            data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
-        else:
-            logger.error(f"Failed to fetch company address: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching company address: {e}")
-    return None
+    """Fetch company address, from the catalog cache"""
+    return catalog.get(company_id, 'address')
 
 def booking_confirmation(request, company_slug: str):
     """
@@ -301,14 +232,14 @@ def booking_confirmation(request, company_slug: str):
     """
     # Fetch company details
     company = fetch_company_detail_by_slug(company_slug)
-    company_id = company.get('id', '0')
     if not company:
         return render(request, 'customers/booking_confirmation.html', {
-            'company_id': company.get('id', '0'),
+            'company_id': '0',
             'company_name': 'Salon',
             'error': 'Company not found'
         })
 
+    company_id = company.get('id', '0')
     company_name = company.get('name', 'Salon')
 
     # Get booking_id from query parameters
@@ -354,6 +285,94 @@ def booking_confirmation(request, company_slug: str):
     return render(request, 'customers/booking_confirmation.html', context)
 
 
+def get_known_company(company_id):
+    """
+    Check a company id from an anonymous request against the booking catalog
+
+    Returns:
+        Tuple of (company, error response): the company's details, or None
+        and the JsonResponse to answer with
+    """
+    # The id ends up in upstream URL paths and cache keys
+    if not re.fullmatch(r'[\w-]+', company_id):
+        return None, JsonResponse({'success': False, 'message': 'Invalid company'}, status=400)
+    entry = catalog.get_entry(company_id, 'company')
+    if entry is None:
+        return None, JsonResponse({'success': False, 'message': 'Company details are unavailable right now'}, status=502)
+    if not entry['data']:
+        return None, JsonResponse({'success': False, 'message': 'Unknown company'}, status=404)
+    return entry['data'], None
+
+
+def booking_availability(request, company_id):
+    """
+    Monthly availability for the booking calendar, served from the availability cache
+
+    Query parameters: date_from (any day of the month, YYYY-MM-DD), staff
+    ('any' by default) and service_ids (repeated). Answers like the API's
+    availability endpoints do. The company, staff and services must be in
+    the booking catalog, so anonymous callers cannot make up cache keys.
+    """
+    try:
+        month = availability.month_start(request.GET.get('date_from', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'date_from must be YYYY-MM-DD'}, status=400)
+
+    company, error = get_known_company(company_id)
+    if error:
+        return error
+
+    staff_id = request.GET.get('staff') or 'any'
+    if staff_id != 'any' and catalog.get_professional(company_id, staff_id) is None:
+        return JsonResponse({'success': False, 'message': 'Invalid staff'}, status=400)
+
+    service_ids = sorted({service_id for service_id in request.GET.getlist('service_ids') if service_id})
+    if len(catalog.get_services(company_id, service_ids)) != len(service_ids):
+        return JsonResponse({'success': False, 'message': 'Invalid services'}, status=400)
+
+    data = availability.get_month(company_id, staff_id, service_ids, month)
+    if data is None:
+        return JsonResponse({'success': False, 'message': 'Availability is unavailable right now'}, status=502)
+    return JsonResponse({'success': True, 'data': data})
+
+
+@csrf_exempt
+@require_POST
+def create_booking(request, company_id):
+    """
+    Create a public booking through the API and drop the company's cached availability
+
+    Takes and answers the same JSON as the API's POST /bookings, so the
+    booking calendar never offers a slot that was just taken.
+    """
+    company, error = get_known_company(company_id)
+    if error:
+        return error
+
+    try:
+        booking_data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON'}, status=400)
+    if not isinstance(booking_data, dict) or str(booking_data.get('company_id')) != str(company['id']):
+        return JsonResponse({'success': False, 'message': 'Invalid company'}, status=400)
+
+    try:
+        response = upstream.post(
+            catalog.get_api_url('bookings'),
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+            json=booking_data,
+            timeout='long'
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error creating booking: {e}")
+        return JsonResponse({'success': False, 'message': 'Booking service is unavailable right now'}, status=502)
+
+    if response.ok:
+        availability.invalidate(company['id'])
+    return HttpResponse(response.content, status=response.status_code,
+                        content_type=response.headers.get('Content-Type', 'application/json'))
+
+
 class VerifyEmailView(View):
     """Handle email verification"""
 
@@ -379,11 +398,11 @@ class VerifyEmailView(View):
                 'token': token
             }
 
-            response = requests.post(
+            response = upstream.post(
                 api_url,
                 headers=headers,
                 json=verification_data,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code == 200:
@@ -504,6 +504,19 @@ class APIClient {
         });
     }
 
+    /**
+     * Run several proxied API calls in one round trip
+     * Each request is {method, path, query, body} with path relative to /users/api/,
+     * e.g. {path: 'v1/companies/users'}. Resolves to [{status, body}, ...] in the same order.
+     */
+    async batch(requests) {
+        const response = await this.request('/users/api/_batch', {
+            method: 'POST',
+            body: JSON.stringify({ requests })
+        });
+        return response?.results || [];
+    }
+
     // Helper methods for common operations
     async refreshData() {
         try {
@@ -512,15 +525,15 @@ class APIClient {
             threeDaysAgo.setDate(threeDaysAgo.getDate() - 3);
             const startDate = threeDaysAgo.toISOString().split('T')[0]; // Format: YYYY-MM-DD
             
-            const [user, staff, notifications, timeOffs] = await Promise.all([
-                this.getCurrentUser(),
-                this.getStaff(),
-                this.getUnreadNotificationsCount(),
-                this.getTimeOffs({
-                    start_date: startDate,
-                    availability_type: 'weekly'
-                })
+            const results = await this.batch([
+                { path: 'v1/users/me' },
+                { path: 'v1/companies/users' },
+                { path: 'v1/notifications/unread-count' },
+                { path: 'v1/users/time-offs', query: { start_date: startDate, availability_type: 'weekly' } }
             ]);
+            const [user, staff, notifications, timeOffs] = results.map(
+                result => (result.status >= 200 && result.status < 300 ? result.body : null)
+            );
 
             return {
                 user: user?.data,
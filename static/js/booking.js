@@ -877,7 +877,6 @@ async function fetchMonthlyAvailability() {
     showCalendarLoading();
 
     try {
-        const apiUrl = window.API_BASE_URL;
         const staffId = bookingState.selectedStaff.id;
 
         // Get the first day of the current month
@@ -888,10 +887,10 @@ async function fetchMonthlyAvailability() {
         // Collect selected service IDs
         const serviceIds = Array.from(bookingState.selectedServices);
 
-        // Build query parameters
+        // Build query parameters; staff is 'any' for the company-wide availability
         const queryParams = new URLSearchParams({
             date_from: dateFrom,
-            availability_type: 'monthly'
+            staff: staffId
         });
 
         // Add service IDs to query parameters (multiple service_ids)
@@ -899,17 +898,10 @@ async function fetchMonthlyAvailability() {
             queryParams.append('service_ids', serviceId);
         });
 
-        let url, response, data;
+        let response, data;
 
-        // Call different endpoint based on staff selection
-        if (staffId === 'any') {
-            // Call company-level availabilities endpoint for "any" staff
-            url = `${apiUrl}/api/v1/companies/${bookingState.companyId}/availabilities?${queryParams.toString()}`;
-        } else {
-
-            // Call user-specific availability endpoint
-            url = `${apiUrl}/api/v1/companies/${bookingState.companyId}/users/${staffId}/availability?${queryParams.toString()}`;
-        }
+        // Served from the server-side availability cache, which also prefetches the next month
+        const url = `/api/availability/${bookingState.companyId}/?${queryParams.toString()}`;
 
         console.log('Fetching monthly availability from:', url);
         response = await fetch(url);
@@ -1372,8 +1364,8 @@ async function submitBooking() {
     bookButton.disabled = true;
 
     try {
-        const apiUrl = window.API_BASE_URL;
-        const response = await fetch(`${apiUrl}/api/v1/bookings`, {
+        // Booked through the server, which also drops the cached availability of the taken slot
+        const response = await fetch(`/api/bookings/${bookingState.companyId}/`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
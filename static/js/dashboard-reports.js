@@ -360,12 +360,13 @@ function updateStaffPerformanceTable(data) {
     if (!tbody) return;
 
     const bookingsByStaff = data.bookings_by_staff || {};
+    const staffPerformance = data.staff_performance?.staff || {};
     const entries = Object.entries(bookingsByStaff);
 
     if (entries.length === 0) {
         tbody.innerHTML = `
             <tr>
-                <td colspan="4" class="text-center py-4 text-gray-500">
+                <td colspan="8" class="text-center py-4 text-gray-500">
                     No staff performance data available
                 </td>
             </tr>
@@ -378,12 +379,17 @@ function updateStaffPerformanceTable(data) {
 
     tbody.innerHTML = entries.map(([staffId, staffData]) => {
         const avgPerBooking = staffData.count > 0 ? staffData.revenue / staffData.count : 0;
+        const performance = staffPerformance[staffId];
         return `
             <tr>
                 <td class="font-medium">${staffData.name}</td>
                 <td>${staffData.count}</td>
                 <td>${formatCurrency(staffData.revenue)}</td>
                 <td>${formatCurrency(avgPerBooking)}</td>
+                <td>${performance ? performance.utilization.toFixed(1) + '%' : '-'}</td>
+                <td>${performance ? formatCurrency(performance.revenue_per_hour) : '-'}</td>
+                <td>${performance ? formatCurrency(performance.average_ticket) : '-'}</td>
+                <td>${performance ? performance.no_show_rate.toFixed(1) + '%' : '-'}</td>
             </tr>
         `;
     }).join('');
@@ -399,6 +405,18 @@ async function changePeriod(period) {
     });
     document.getElementById(`period-${period}`)?.classList.add('active');
 
+    // Every period's report comes with the page; switch to it without a request
+    const bundledReport = window.reportsBundle?.[period];
+    if (bundledReport) {
+        window.reportsData = bundledReport;
+        updateMetrics(bundledReport);
+        renderCharts(bundledReport);
+        updateStaffPerformanceTable(bundledReport);
+        generateInsights(bundledReport);
+        updateDateRangeDisplay(bundledReport);
+        return;
+    }
+
     // Show loading state
     showLoadingState();
 
@@ -418,6 +436,7 @@ async function changePeriod(period) {
         const result = await response.json();
 
         if (result.reports_data) {
+            window.reportsBundle = result.reports_bundle || {};
             window.reportsData = result.reports_data;
             updateMetrics(result.reports_data);
             renderCharts(result.reports_data);
@@ -1,107 +1,112 @@
+import asyncio
+import httpx
+from asgiref.sync import sync_to_async
 import requests
 import json
-from datetime import datetime
-from django.http import JsonResponse
+import logging
+import tempfile
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, JsonResponse, QueryDict
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.conf import settings
+from salona_business_django import availability, catalog, upstream, utc
+from users import auth, proxy_cache, report_cache
+from users.signals import bookings_changed
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    """Raised while streaming an upload that exceeds API_PROXY_MAX_UPLOAD_SIZE"""
+
+
+class StreamedUpload:
+    """
+    Incoming request body forwarded upstream in fixed-size chunks
+
+    Under ASGI, Django has already spooled the whole body to a temporary file
+    before the view runs, so that file is read, and read again if the request
+    is retried after a token refresh. Under WSGI the first pass reads the
+    request and spools what it sends, in memory up to
+    FILE_UPLOAD_MAX_MEMORY_SIZE and on disk beyond that, for the retry.
+    """
+
+    def __init__(self, request, max_size):
+        self.request = request
+        self.max_size = max_size
+        # ASGIRequest reads straight from the file the ASGI handler spooled the body to
+        self.body_file = None
+        if isinstance(request, ASGIRequest) and getattr(request._stream, 'seekable', lambda: False)():
+            self.body_file = request._stream
+        self.spool = None
+        if self.body_file is None:
+            self.spool = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        self.received = False
+
+    async def chunks(self):
+        chunk_size = settings.API_PROXY_UPLOAD_CHUNK_SIZE
+        if self.body_file is not None:
+            self.body_file.seek(0)
+            size = 0
+            while chunk := self.body_file.read(chunk_size):
+                size += len(chunk)
+                if size > self.max_size:
+                    raise UploadTooLarge()
+                yield chunk
+            return
+
+        if self.received:
+            self.spool.seek(0)
+            while chunk := self.spool.read(chunk_size):
+                yield chunk
+            return
+
+        size = 0
+        while chunk := self.request.read(chunk_size):
+            size += len(chunk)
+            if size > self.max_size:
+                raise UploadTooLarge()
+            self.spool.write(chunk)
+            yield chunk
+        self.received = True
+
 
 class APIProxyView(View):
     """
     Proxy view to forward requests to the external API while handling cookies properly
+
+    The view is async: under ASGI a proxied call waits on the event loop
+    instead of holding a worker thread for the whole upstream round trip.
     """
     
     @method_decorator(csrf_exempt)
     def dispatch(self, request, *args, **kwargs):
-        return super().dispatch(request, *args, **kwargs)
+        response = super().dispatch(request, *args, **kwargs)
+        if not isinstance(request, ASGIRequest):
+            # Under WSGI this request gets an event loop, and pooled client, of its own
+            return upstream.closing_async_client(response)
+        return response
     
-    def get_api_url(self, path):
-        """Construct the full API URL"""
-        api_base = getattr(settings, 'API_BASE_URL', 'https://api.salona.me')
+    def get_api_path(self, path):
+        """Normalize a proxied path to the form 'api/...'"""
         # Remove leading slash from path if present
         if path.startswith('/'):
             path = path[1:]
         # Ensure path starts with 'api/' if it doesn't already
         if not path.startswith('api/'):
             path = f"api/{path}"
-        return f"{api_base}/{path}"
-    
-    @staticmethod
-    def ensure_utc_params(data):
-        """
-        Recursively convert all time-related parameters to UTC format.
-        Looks for common time field names and converts them to ISO 8601 UTC format.
-
-        Args:
-            data: Dictionary or list containing request parameters
+        return path
 
-        Returns:
-            Data with time parameters converted to UTC
-        """
-        if not data or not isinstance(data, (dict, list)):
-            return data
-
-        # Common time field patterns
-        time_field_patterns = [
-            'time', 'date', 'datetime', 'start', 'end', 'begin', 'from', 'to',
-            'created', 'updated', 'scheduled', 'appointment', 'booking',
-            'started_at', 'ended_at', 'created_at', 'updated_at', 'start_at', 'end_at'
-        ]
-
-        def is_time_field(field_name):
-            """Check if field name matches time patterns"""
-            field_lower = field_name.lower()
-            return any(pattern in field_lower for pattern in time_field_patterns)
-
-        def is_iso_datetime(value_str):
-            """Check if string is ISO 8601 datetime format"""
-            if not isinstance(value_str, str):
-                return False
-            try:
-                # Try to parse ISO format
-                datetime.fromisoformat(value_str.replace('Z', '+00:00'))
-                return True
-            except (ValueError, AttributeError):
-                return False
-
-        def convert_value(value):
-            """Convert a single value if it's a time string"""
-            if isinstance(value, str) and is_iso_datetime(value):
-                # Already in ISO format, return as is (backend expects UTC)
-                return value
-            return value
-
-        def process_dict(obj):
-            """Recursively process dictionary"""
-            result = {}
-            for key, value in obj.items():
-                if value is None:
-                    result[key] = value
-                elif isinstance(value, dict):
-                    result[key] = process_dict(value)
-                elif isinstance(value, list):
-                    result[key] = [process_dict(item) if isinstance(item, dict) else
-                                   (process_list(item) if isinstance(item, list) else convert_value(item))
-                                   for item in value]
-                elif is_time_field(key) and isinstance(value, str):
-                    result[key] = convert_value(value)
-                else:
-                    result[key] = value
-            return result
-
-        def process_list(lst):
-            """Recursively process list"""
-            return [process_dict(item) if isinstance(item, dict) else
-                   (process_list(item) if isinstance(item, list) else item)
-                   for item in lst]
-
-        if isinstance(data, dict):
-            return process_dict(data)
-        elif isinstance(data, list):
-            return process_list(data)
-        return data
+    def get_api_url(self, path):
+        """Construct the full API URL"""
+        api_base = getattr(settings, 'API_BASE_URL', 'https://api.salona.me')
+        return f"{api_base}/{self.get_api_path(path)}"
+    
+    # Convert datetime parameters to UTC (see salona_business_django/utc.py)
+    ensure_utc_params = staticmethod(utc.ensure_utc)
 
     def get_tokens_from_request(self, request):
         """
@@ -121,7 +126,7 @@ class APIProxyView(View):
         request._refreshed_refresh_token = refresh_token
         request._token_was_refreshed = True
 
-    def refresh_access_token(self, request):
+    async def refresh_access_token(self, request):
         """
         Attempt to refresh the access token using the refresh token
         Returns tuple: (success: bool, new_access_token: str or None, new_refresh_token: str or None)
@@ -141,35 +146,11 @@ class APIProxyView(View):
         if not refresh_token:
             return False, None, None
 
-        try:
-            api_url = self.get_api_url('api/v1/users/auth/refresh-token')
-            cookies = {'refresh_token': refresh_token}
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-            }
-
-            response = requests.post(
-                api_url,
-                headers=headers,
-                cookies=cookies,
-                timeout=10
-            )
-
-            if response.status_code == 200:
-                # Extract tokens from response cookies, not from response body
-                new_access_token = response.cookies.get('access_token')
-                new_refresh_token = response.cookies.get('refresh_token')
-
-                if new_access_token:
-                    # Store refreshed tokens in request for reuse
-                    self.set_refreshed_tokens(request, new_access_token, new_refresh_token)
-                    return True, new_access_token, new_refresh_token
-
-            return False, None, None
-
-        except requests.exceptions.RequestException:
-            return False, None, None
+        success, new_access_token, new_refresh_token = await auth.arefresh_tokens(refresh_token)
+        if success:
+            # Store refreshed tokens in request for reuse
+            self.set_refreshed_tokens(request, new_access_token, new_refresh_token)
+        return success, new_access_token, new_refresh_token
 
     def clear_auth_cookies(self, response):
         """Clear all authentication cookies"""
@@ -193,24 +174,69 @@ class APIProxyView(View):
         )
         return response
 
-    def forward_request(self, request, path, retry_count=0):
+    @staticmethod
+    def invalidate_catalog(company_id, parts):
+        """Drop the changed parts of the writer's company from the public booking catalog"""
+        catalog.invalidate(company_id, parts)
+
+    @staticmethod
+    def invalidate_availability(company_id):
+        """Drop the cached booking calendar availability of the writer's company"""
+        availability.invalidate(company_id)
+
+    async def build_response(self, request, response, cache_state):
+        """
+        Turn the final upstream response into the client response
+
+        Cacheable GETs are answered from (and stored in) the per-user GET cache;
+        successful writes invalidate the cache groups they touch.
+
+        Args:
+            request: Incoming Django request
+            response: httpx.Response from arequest
+            cache_state: Dictionary with the scope, key, entry and invalidations of this request,
+                the writer's company and the booking, catalog and availability changes it makes, if any
+        """
+        cache_key, cache_entry = cache_state['key'], cache_state['entry']
+        if cache_key:
+            if response.status_code == 304 and cache_entry:
+                await response.aclose()
+                await proxy_cache.touch(cache_key, cache_entry)
+                return proxy_cache.respond(request, cache_entry)
+            if response.status_code == 200:
+                entry = proxy_cache.build_entry(response, await response.aread())
+                await proxy_cache.store(cache_key, entry)
+                return proxy_cache.respond(request, entry)
+
+        if response.is_success:
+            if cache_state['invalidates']:
+                await proxy_cache.invalidate(cache_state['scope'], cache_state['invalidates'])
+            if cache_state['identity_token']:
+                await auth.ainvalidate_identity(cache_state['identity_token'])
+            if cache_state['bookings_changed']:
+                await bookings_changed.asend(sender=self.__class__, **cache_state['bookings_changed'])
+            if cache_state['catalog_parts']:
+                await sync_to_async(self.invalidate_catalog)(cache_state['company_id'], cache_state['catalog_parts'])
+            if cache_state['availability_changed']:
+                await sync_to_async(self.invalidate_availability)(cache_state['company_id'])
+
+        return await upstream.relay_response(request, response)
+
+    async def forward_request(self, request, path, retry_count=0):
         """Forward the request to the external API"""
-        api_url = self.get_api_url(path)
+        api_path = self.get_api_path(path)
+        api_url = self.get_api_url(api_path)
 
         # Check for multipart BEFORE accessing request.body/POST/FILES
-        # Accessing body will prevent POST/FILES from being parsed!
+        # Multipart bodies are streamed upstream as-is and must never be parsed here
         content_type = request.META.get('CONTENT_TYPE', '')
         is_multipart = 'multipart/form-data' in content_type
 
-        # Only access POST/FILES after we know it's multipart
-        if is_multipart:
-            if request.POST:
-                for key in request.POST.keys():
-                    value = request.POST.get(key)
-
-        # Prepare headers - don't set Content-Type for multipart/form-data (file uploads)
+        # Prepare headers - multipart requests keep their own Content-Type (with boundary)
         headers = {
             'Accept': 'application/json',
+            # Streamed bodies are relayed still encoded, so only ask for encodings the client accepts
+            'Accept-Encoding': request.META.get('HTTP_ACCEPT_ENCODING') or 'identity',
         }
 
         # Only set Content-Type for JSON requests
@@ -219,66 +245,86 @@ class APIProxyView(View):
 
         # Get cookies from the incoming request (check for refreshed tokens first)
         access_token, refresh_token = self.get_tokens_from_request(request)
+
+        # With local token verification, refresh expired tokens up front instead of waiting for a 401
+        if retry_count == 0 and auth.is_access_token_expired(access_token):
+            success, new_access_token, new_refresh_token = await self.refresh_access_token(request)
+            if not success:
+                django_response = JsonResponse(
+                    {'success': False, 'detail': 'Authentication failed. Please log in again.'},
+                    status=401
+                )
+                return self.clear_auth_cookies(django_response)
+            access_token, refresh_token = new_access_token, new_refresh_token or refresh_token
+
         cookies = {}
         if access_token:
             cookies['access_token'] = access_token
         if refresh_token:
             cookies['refresh_token'] = refresh_token
 
+        # Serve idempotent reads from the caller's GET cache, or revalidate them upstream
+        cache_state = {
+            'scope': proxy_cache.get_scope(access_token),
+            'key': None,
+            'entry': None,
+            'invalidates': [],
+            # Profile, company and logout writes make the cached /users/me data stale
+            'identity_token': access_token if request.method != 'GET' and auth.changes_identity(api_path) else None,
+            # Booking writes make the company's precomputed reports stale
+            'bookings_changed': None,
+            # Service, staff and company writes make the public booking catalog stale
+            'catalog_parts': catalog.get_write_parts(api_path) if request.method != 'GET' else [],
+            # Company the write changes, resolved before any invalidation drops the caller's identity
+            'company_id': None,
+            # Booking, time-off and service writes make the booking calendar's availability stale
+            'availability_changed': request.method != 'GET' and availability.is_availability_write(api_path),
+        }
+        if cache_state['scope']:
+            if request.method == 'GET':
+                group = proxy_cache.get_read_group(api_path)
+                if group:
+                    cache_state['key'] = await proxy_cache.get_entry_key(cache_state['scope'], group, api_path, request.GET)
+                    cache_state['entry'] = await proxy_cache.lookup(cache_state['key'])
+            else:
+                cache_state['invalidates'] = proxy_cache.get_write_groups(api_path)
+
+        cache_entry = cache_state['entry']
+        if cache_entry:
+            if proxy_cache.is_fresh(cache_entry):
+                return proxy_cache.respond(request, cache_entry)
+            headers.update(proxy_cache.conditional_headers(cache_entry))
+
         # Get query parameters from the request
         params = request.GET.dict() if request.GET else None
 
         # Convert datetime parameters to UTC
         params = self.ensure_utc_params(params)
 
-        # Prepare request data and files
+        # Prepare request body
         data = None
-        files = None
         json_data = None
+        upload = None
 
         if request.method in ['POST', 'PUT', 'PATCH']:
             if is_multipart:
-                # Django only auto-parses multipart for POST, not PUT/PATCH
-                # We need to manually parse for PUT/PATCH
-                if request.method == 'POST':
-                    # For POST, Django auto-parses
-                    data = request.POST.dict() if request.POST else {}
-                    data = self.ensure_utc_params(data)
-
-                    if request.FILES:
-                        files = {}
-                        for key, file_obj in request.FILES.items():
-                            files[key] = (file_obj.name, file_obj.read(), file_obj.content_type)
-                    else:
-                        files = None
-                else:
-                    # For PUT/PATCH, manually parse multipart data
-                    from django.http.multipartparser import MultiPartParser
-
-                    try:
-                        parser = MultiPartParser(request.META, request, request.upload_handlers)
-                        post_data, files_data = parser.parse()
-
-                        # Convert QueryDict to regular dict
-                        data = dict(post_data.items()) if post_data else {}
-                        data = self.ensure_utc_params(data)
-
-                        # Convert uploaded files
-                        if files_data:
-                            files = {}
-                            for key, file_obj in files_data.items():
-                                files[key] = (file_obj.name, file_obj.read(), file_obj.content_type)
-                        else:
-                            files = None
-
-                    except Exception as e:
-                        data = {}
-                        files = None
+                # Stream the raw multipart body (boundary and all) instead of
+                # reading every uploaded file into memory
+                content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+                if content_length > settings.API_PROXY_MAX_UPLOAD_SIZE:
+                    return JsonResponse({
+                        'error': 'Upload too large',
+                        'max_size': settings.API_PROXY_MAX_UPLOAD_SIZE
+                    }, status=413)
+
+                upload = StreamedUpload(request, settings.API_PROXY_MAX_UPLOAD_SIZE)
+                headers['Content-Type'] = content_type
+                if content_length:
+                    headers['Content-Length'] = str(content_length)
             elif request.content_type == 'application/json':
                 try:
-                    json_data = json.loads(request.body)
-                    # Convert datetime parameters to UTC
-                    json_data = self.ensure_utc_params(json_data)
+                    # Convert datetime parameters to UTC while decoding
+                    json_data = utc.loads(request.body)
                 except json.JSONDecodeError:
                     json_data = None
             else:
@@ -286,22 +332,36 @@ class APIProxyView(View):
                 # Convert datetime parameters to UTC
                 data = self.ensure_utc_params(data)
 
+        if request.method != 'GET' and report_cache.is_booking_write(api_path):
+            cache_state['bookings_changed'] = {
+                'days': sorted(report_cache.get_booking_days(json_data or data)),
+                'booking_ids': report_cache.get_booking_ids(api_path),
+            }
+
+        if cache_state['bookings_changed'] or cache_state['catalog_parts'] or cache_state['availability_changed']:
+            cache_state['company_id'] = await auth.aget_company_id(access_token)
+            if cache_state['bookings_changed']:
+                cache_state['bookings_changed']['company_id'] = cache_state['company_id']
+
         # Make the API request
         try:
-            response = requests.request(
+            response = await upstream.arequest(
                 method=request.method,
                 url=api_url,
                 headers=headers,
                 json=json_data if json_data else None,
                 data=data if data and not json_data else None,
-                files=files,
+                content=upload.chunks() if upload else None,
                 params=params,
                 cookies=cookies,
-                timeout=30
+                timeout='long',
+                stream=True
             )
             
             # Check if access token has expired (401 with specific message)
             if response.status_code == 401 and retry_count == 0:
+                # Error bodies are small, buffer them to inspect the detail
+                await response.aread()
                 try:
                     response_data = response.json()
                     detail = response_data.get('detail', '')
@@ -309,7 +369,7 @@ class APIProxyView(View):
                     # Check if the error is due to expired access token
                     if 'Access token has expired' in detail or 'access token has expired' in detail.lower():
                         # Attempt to refresh the token (will reuse if already refreshed in this request)
-                        success, new_access_token, new_refresh_token = self.refresh_access_token(request)
+                        success, new_access_token, new_refresh_token = await self.refresh_access_token(request)
 
                         if success and new_access_token:
                             # Retry the request with new token (only once to prevent infinite loop)
@@ -317,24 +377,21 @@ class APIProxyView(View):
                             if new_refresh_token:
                                 cookies['refresh_token'] = new_refresh_token
 
-                            response = requests.request(
+                            response = await upstream.arequest(
                                 method=request.method,
                                 url=api_url,
                                 headers=headers,
                                 json=json_data if json_data else None,
                                 data=data if data and not json_data else None,
-                                files=files,
+                                content=upload.chunks() if upload else None,
                                 params=params,
                                 cookies=cookies,
-                                timeout=30
+                                timeout='long',
+                                stream=True
                             )
 
                             # Create response with updated cookies
-                            django_response = JsonResponse(
-                                response.json() if response.content else {},
-                                status=response.status_code,
-                                safe=False
-                            )
+                            django_response = await self.build_response(request, response, cache_state)
 
                             # Set the new tokens as HTTP-only cookies
                             django_response.set_cookie(
@@ -367,12 +424,13 @@ class APIProxyView(View):
                 except:
                     pass  # If parsing fails, continue with normal flow
 
+            # Login responses carry the tokens in their body, so buffer them
+            is_login = path == 'api/v1/users/auth/login' and response.status_code == 200
+            if is_login:
+                await response.aread()
+
             # Create Django response
-            django_response = JsonResponse(
-                response.json() if response.content else {},
-                status=response.status_code,
-                safe=False
-            )
+            django_response = await self.build_response(request, response, cache_state)
 
             # If token was refreshed during this request, set the new cookies
             if hasattr(request, '_token_was_refreshed') and response.status_code == 200:
@@ -395,7 +453,7 @@ class APIProxyView(View):
                     )
 
             # If this is a login request and successful, extract tokens from response
-            if path == 'api/v1/users/auth/login' and response.status_code == 200:
+            if is_login:
                 try:
                     response_data = response.json()
                     if response_data.get('data') and response_data['data'].get('access_token'):
@@ -423,26 +481,164 @@ class APIProxyView(View):
             
             return django_response
             
-        except requests.exceptions.RequestException as e:
+        except UploadTooLarge:
+            return JsonResponse({
+                'error': 'Upload too large',
+                'max_size': settings.API_PROXY_MAX_UPLOAD_SIZE
+            }, status=413)
+        except httpx.HTTPError as e:
             return JsonResponse({
                 'error': 'API request failed',
                 'message': str(e)
             }, status=500)
     
-    def get(self, request, path):
-        return self.forward_request(request, path)
+    async def get(self, request, path):
+        return await self.forward_request(request, path)
     
-    def post(self, request, path):
-        return self.forward_request(request, path)
+    async def post(self, request, path):
+        return await self.forward_request(request, path)
     
-    def put(self, request, path):
-        return self.forward_request(request, path)
+    async def put(self, request, path):
+        return await self.forward_request(request, path)
     
-    def patch(self, request, path):
-        return self.forward_request(request, path)
+    async def patch(self, request, path):
+        return await self.forward_request(request, path)
     
-    def delete(self, request, path):
-        return self.forward_request(request, path)
+    async def delete(self, request, path):
+        return await self.forward_request(request, path)
+
+
+class APIBatchView(APIProxyView):
+    """
+    Run several proxied API calls from one browser request
+
+    POST a JSON body {"requests": [{"method", "path", "query", "body"}, ...]}
+    where path is relative to /users/api/. The subrequests go upstream
+    concurrently with the caller's cookies and share a single token refresh.
+    The response lists {"status", "body"} for each subrequest, in order.
+    """
+
+    http_method_names = ['post']
+
+    BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.refresh_lock = asyncio.Lock()
+
+    async def refresh_access_token(self, request):
+        """Refresh once for the whole batch and hand the new tokens to the subrequest"""
+        async with self.refresh_lock:
+            success, new_access_token, new_refresh_token = await super().refresh_access_token(self.request)
+        if success:
+            self.set_refreshed_tokens(request, new_access_token, new_refresh_token)
+        return success, new_access_token, new_refresh_token
+
+    def build_subrequest(self, item):
+        """Build the request object forward_request sees for one batch item"""
+        subrequest = HttpRequest()
+        subrequest.method = item.get('method', 'GET').upper()
+        subrequest.COOKIES = self.request.COOKIES
+        subrequest.GET = QueryDict(mutable=True)
+        for key, value in (item.get('query') or {}).items():
+            subrequest.GET.setlist(key, [str(v) for v in value] if isinstance(value, list) else [str(value)])
+
+        body = json.dumps(item['body']).encode() if item.get('body') is not None else b''
+        subrequest._body = body
+        subrequest.content_type = 'application/json'
+        subrequest.META = {'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body))}
+        return subrequest
+
+    def get_item_error(self, item):
+        """Describe what is wrong with a batch item, or return None when it can be forwarded"""
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            return 'Each request needs a path'
+        if not isinstance(item.get('method', 'GET'), str):
+            return 'method must be a string'
+        query = item.get('query')
+        if query is not None:
+            if not isinstance(query, dict):
+                return 'query must be an object'
+            for value in query.values():
+                values = value if isinstance(value, list) else [value]
+                if any(isinstance(v, (dict, list)) for v in values):
+                    return 'query values must be strings, numbers or lists of them'
+        if not isinstance(item.get('body'), (dict, list, type(None))):
+            return 'body must be an object or a list'
+        return None
+
+    async def run_subrequest(self, item):
+        """Forward one batch item and describe its outcome"""
+        error = self.get_item_error(item)
+        if error:
+            return {'status': 400, 'body': {'error': error}}
+
+        path = item['path'].lstrip('/')
+        if path.startswith('users/api/'):
+            path = path[len('users/api/'):]
+        api_path = self.get_api_path(path)
+        method = item.get('method', 'GET').upper()
+        # Auth calls set cookies on their own response, which a batch cannot relay
+        if method not in self.BATCH_METHODS or api_path.startswith('api/v1/users/auth/'):
+            return {'status': 400, 'body': {'error': f'{method} {path} cannot be batched'}}
+
+        # One failing subrequest must not take its siblings' results with it
+        try:
+            response = await self.forward_request(self.build_subrequest(item), path)
+        except Exception:
+            logger.exception('Batch subrequest %s %s failed', method, path)
+            return {'status': 500, 'body': {'error': 'API request failed'}}
+        content = response.content
+        if 'json' in response.get('Content-Type', '') and content:
+            try:
+                body = json.loads(content)
+            except ValueError:
+                body = content.decode(errors='replace')
+        else:
+            body = content.decode(errors='replace')
+        return {'status': response.status_code, 'body': body}
+
+    async def post(self, request, path=None):
+        try:
+            payload = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+        items = payload.get('requests') if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            return JsonResponse({'error': 'Expected {"requests": [...]}'}, status=400)
+        if len(items) > settings.API_BATCH_MAX_REQUESTS:
+            return JsonResponse({
+                'error': 'Too many requests in batch',
+                'max_requests': settings.API_BATCH_MAX_REQUESTS
+            }, status=400)
+
+        results = await asyncio.gather(*(self.run_subrequest(item) for item in items))
+        django_response = JsonResponse({'results': results})
+
+        # Subrequests that refreshed the token did it on the batch request
+        if hasattr(request, '_token_was_refreshed'):
+            django_response.set_cookie(
+                'access_token',
+                request._refreshed_access_token,
+                httponly=True,
+                secure=not settings.DEBUG,
+                samesite='Strict',
+                max_age=3600 * 6  # 6 hours
+            )
+            if request._refreshed_refresh_token:
+                django_response.set_cookie(
+                    'refresh_token',
+                    request._refreshed_refresh_token,
+                    httponly=True,
+                    secure=not settings.DEBUG,
+                    samesite='Strict',
+                    max_age=3600 * 24  # 1 day
+                )
+        elif any(result['status'] == 401 for result in results) and hasattr(request, '_token_refresh_attempted'):
+            self.clear_auth_cookies(django_response)
+
+        return django_response
 
 
 @csrf_exempt
@@ -461,6 +657,7 @@ def logout_proxy(request):
     try:
         # Get tokens from HTTP-only cookies first, then fallback to session
         access_token = request.COOKIES.get('access_token') or request.session.get('access_token')
+        auth.invalidate_identity(access_token)
 
         # Call external API logout if token exists
         if access_token:
@@ -469,7 +666,7 @@ def logout_proxy(request):
             cookies = {'access_token': access_token}
             
             try:
-                requests.put(api_url, headers=headers, cookies=cookies, timeout=10)
+                upstream.put(api_url, headers=headers, cookies=cookies)
             except requests.exceptions.RequestException:
                 pass  # Continue with local logout even if API call fails
         
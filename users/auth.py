@@ -0,0 +1,314 @@
+"""
+Authentication state shared by every worker
+When an access token expires, each parallel browser request may land on a
+different worker. Only one of them calls /auth/refresh-token: it holds a
+short lock in the Django cache (Redis in production) and publishes the new
+token pair, keyed by a hash of the old refresh token, for the others to reuse.
+
+The normalized /users/me data of an access token is cached the same way for
+a short time, so page loads do not ask the API who the caller is every time,
+and the caller's company for as long as the token lives, so the proxy can
+tell which company a write changed.
+With JWT_VERIFICATION_KEY set, tokens are verified locally, so expired or
+forged ones never reach the API, and the caller's company and role are read
+from the token itself. The profile fields pages display still come from
+/users/me.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import time
+
+import httpx
+import jwt
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from salona_business_django import upstream
+
+# Published for refresh tokens the API rejected, so waiting workers stop retrying them
+REFRESH_FAILED = {}
+
+
+class InvalidAccessToken(Exception):
+    """The access token failed local verification"""
+
+
+class AccessTokenExpired(InvalidAccessToken):
+    """The access token is validly signed but past its expiry"""
+
+
+def get_refresh_url():
+    return f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/users/auth/refresh-token"
+
+
+def _refresh_key(refresh_token):
+    return f"auth:refresh:{hashlib.sha256(refresh_token.encode()).hexdigest()}"
+
+
+def _headers():
+    return {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+    }
+
+
+def _result(status_code, cookies):
+    """Token pair from a refresh response, REFRESH_FAILED if rejected, or None if inconclusive"""
+    if status_code == 200 and cookies.get('access_token'):
+        return {'access_token': cookies.get('access_token'), 'refresh_token': cookies.get('refresh_token')}
+    if 400 <= status_code < 500:
+        return REFRESH_FAILED
+    return None
+
+
+def _as_tuple(result):
+    if result:
+        return True, result['access_token'], result['refresh_token']
+    return False, None, None
+
+
+def refresh_tokens(refresh_token):
+    """
+    Exchange a refresh token for a new token pair, at most once across workers
+
+    Args:
+        refresh_token: The refresh token sent by the browser
+
+    Returns:
+        Tuple of (success, new access token, new refresh token)
+    """
+    key = _refresh_key(refresh_token)
+    deadline = time.monotonic() + settings.TOKEN_REFRESH_LOCK_TIMEOUT
+
+    while True:
+        result = cache.get(key)
+        if result is not None:
+            return _as_tuple(result)
+        if cache.add(f"{key}:lock", 1, settings.TOKEN_REFRESH_LOCK_TIMEOUT) or time.monotonic() > deadline:
+            break
+        # Another worker is refreshing this token; wait for its result
+        time.sleep(0.05)
+
+    try:
+        response = upstream.post(get_refresh_url(), headers=_headers(), cookies={'refresh_token': refresh_token})
+        result = _result(response.status_code, response.cookies)
+        if result is not None:
+            # Publish before releasing the lock so no waiter refreshes the rotated token again
+            cache.set(key, result, settings.TOKEN_REFRESH_RESULT_TTL)
+    except requests.exceptions.RequestException:
+        result = None
+    finally:
+        cache.delete(f"{key}:lock")
+
+    return _as_tuple(result)
+
+
+async def arefresh_tokens(refresh_token):
+    """Async counterpart of refresh_tokens"""
+    key = _refresh_key(refresh_token)
+    deadline = time.monotonic() + settings.TOKEN_REFRESH_LOCK_TIMEOUT
+
+    while True:
+        result = await cache.aget(key)
+        if result is not None:
+            return _as_tuple(result)
+        if await cache.aadd(f"{key}:lock", 1, settings.TOKEN_REFRESH_LOCK_TIMEOUT) or time.monotonic() > deadline:
+            break
+        await asyncio.sleep(0.05)
+
+    try:
+        response = await upstream.arequest(
+            'POST', get_refresh_url(), headers=_headers(), cookies={'refresh_token': refresh_token}
+        )
+        result = _result(response.status_code, response.cookies)
+        if result is not None:
+            await cache.aset(key, result, settings.TOKEN_REFRESH_RESULT_TTL)
+    except httpx.HTTPError:
+        result = None
+    finally:
+        await cache.adelete(f"{key}:lock")
+
+    return _as_tuple(result)
+
+
+# Writes through the API proxy that change what /users/me returns for the caller
+IDENTITY_WRITE_PREFIXES = ('api/v1/users/me', 'api/v1/users/auth/logout', 'api/v1/companies/invitations')
+IDENTITY_WRITE_PATHS = ('api/v1/companies',)
+
+
+def _identity_key(access_token):
+    return f"auth:identity:{hashlib.sha256(access_token.encode()).hexdigest()}"
+
+
+def _company_key(access_token):
+    return f"auth:company:{hashlib.sha256(access_token.encode()).hexdigest()}"
+
+
+def verify_identity(access_token):
+    """
+    Read the caller's identity from a locally verified access token
+
+    Args:
+        access_token: The access token sent by the browser
+
+    Returns:
+        The JWT_IDENTITY_CLAIMS fields of GeneralView.get_current_user's user
+        data (no profile fields), or None when no JWT_VERIFICATION_KEY is
+        configured or the token lacks any of the claims
+
+    Raises:
+        AccessTokenExpired: The token has expired and must be refreshed
+        InvalidAccessToken: The token is malformed or not signed with the key
+    """
+    key = settings.JWT_VERIFICATION_KEY
+    if not key or not access_token:
+        return None
+
+    try:
+        claims = jwt.decode(
+            access_token,
+            key,
+            algorithms=settings.JWT_ALGORITHMS,
+            audience=settings.JWT_AUDIENCE,
+            issuer=settings.JWT_ISSUER,
+            options={'require': ['exp'], 'verify_aud': bool(settings.JWT_AUDIENCE)}
+        )
+    except jwt.ExpiredSignatureError as e:
+        raise AccessTokenExpired() from e
+    except jwt.InvalidTokenError as e:
+        raise InvalidAccessToken() from e
+
+    if any(claim not in claims for claim in settings.JWT_IDENTITY_CLAIMS.values()):
+        return None
+
+    user_data = {field: claims[claim] for field, claim in settings.JWT_IDENTITY_CLAIMS.items()}
+    # Same normalization as for /users/me: inactive members act without a company
+    if user_data.get('role_status') != 'active':
+        user_data['company_id'] = None
+    return user_data
+
+
+def is_access_token_expired(access_token):
+    """Whether local verification is configured and says the token has expired"""
+    try:
+        verify_identity(access_token)
+    except AccessTokenExpired:
+        return True
+    except InvalidAccessToken:
+        pass
+    return False
+
+
+def get_token_expiry(access_token):
+    """Return the exp claim of a JWT access token, or None if it has none or cannot be read"""
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+def get_users_me_url():
+    return f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/users/me"
+
+
+def normalize_identity(data):
+    """Turn the 'data' of a /users/me answer into the user data the views use"""
+    if not data.get('company_id'):
+        result = data
+    else:
+        result = data.get('user', {})
+    result['role_status'] = data.get('status', 'inactive')
+    if result['role_status'] != 'active':
+        result['company_id'] = None
+    else:
+        result['role'] = data.get('role', 'owner')
+        result['company_id'] = data.get('company_id', None)
+    return result
+
+
+def get_cached_identity(access_token):
+    """Return the normalized user data cached for this access token, or None"""
+    if not access_token:
+        return None
+    return cache.get(_identity_key(access_token))
+
+
+def _token_ttl(access_token, ttl):
+    """Shorten a cache TTL so it never runs past the token's expiry"""
+    expiry = get_token_expiry(access_token)
+    if expiry is not None:
+        ttl = min(ttl, int(expiry - time.time()))
+    return ttl
+
+
+def cache_identity(access_token, user_data):
+    """
+    Cache normalized user data for IDENTITY_CACHE_TTL, and the caller's
+    company for the token's whole lifetime, but never past the token's expiry
+    """
+    if not access_token:
+        return
+    ttl = _token_ttl(access_token, settings.IDENTITY_CACHE_TTL)
+    if ttl > 0:
+        cache.set(_identity_key(access_token), user_data, ttl)
+    company_ttl = _token_ttl(access_token, settings.TOKEN_COMPANY_CACHE_TTL)
+    if company_ttl > 0:
+        cache.set(_company_key(access_token), {'company_id': user_data.get('company_id')}, company_ttl)
+
+
+def invalidate_identity(access_token):
+    if access_token:
+        cache.delete_many([_identity_key(access_token), _company_key(access_token)])
+
+
+async def ainvalidate_identity(access_token):
+    if access_token:
+        await cache.adelete_many([_identity_key(access_token), _company_key(access_token)])
+
+
+async def aget_company_id(access_token):
+    """
+    Return the company of the caller
+
+    Read from the verified token, the cached /users/me data or the company
+    cached for the token's lifetime, and only as a last resort from /users/me.
+    Writes through the API proxy resolve it before they invalidate anything,
+    as identity writes drop the cached data this relies on.
+    """
+    if not access_token:
+        return None
+    try:
+        user_data = verify_identity(access_token)
+    except InvalidAccessToken:
+        return None
+    if user_data is None:
+        user_data = await cache.aget(_identity_key(access_token))
+    if user_data is None:
+        user_data = await cache.aget(_company_key(access_token))
+    if user_data is None:
+        try:
+            response = await upstream.arequest(
+                'GET', get_users_me_url(), headers=_headers(), cookies={'access_token': access_token}
+            )
+            data = response.json() if response.status_code == 200 else {}
+        except (httpx.HTTPError, ValueError):
+            data = {}
+        if not isinstance(data.get('data'), dict):
+            return None
+        user_data = normalize_identity(data['data'])
+        await sync_to_async(cache_identity)(access_token, user_data)
+    return user_data.get('company_id')
+
+
+def changes_identity(path):
+    """Whether a successful write to this API path changes the caller's /users/me data"""
+    return path in IDENTITY_WRITE_PATHS or any(
+        path == prefix or path.startswith(prefix + '/') for prefix in IDENTITY_WRITE_PREFIXES
+    )
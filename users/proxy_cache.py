@@ -0,0 +1,138 @@
+"""
+Conditional-GET cache for idempotent reads proxied by APIProxyView
+Entries are scoped to the caller's access token, revalidated upstream with
+the stored ETag/Last-Modified and answered with 304 when the browser already
+has the current body. Writes under a group's prefixes invalidate the group.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+# Cached read prefixes per resource group, and the write prefixes that invalidate them
+CACHE_GROUPS = {
+    'services': {
+        'reads': ['api/v1/companies/services', 'api/v1/services/companies/categories'],
+        'writes': ['api/v1/services', 'api/v1/companies/services'],
+    },
+    'staff': {
+        'reads': ['api/v1/companies/users'],
+        'writes': ['api/v1/companies/users', 'api/v1/companies/members', 'api/v1/companies/invitations'],
+    },
+    'membership_plans': {
+        'reads': ['api/v1/memberships/plans'],
+        'writes': [],
+    },
+}
+
+# Browser cache-busting parameters that never change the upstream answer
+IGNORED_QUERY_PARAMS = {'_t'}
+
+
+def _matches(path, prefixes):
+    return any(path == prefix or path.startswith(prefix + '/') for prefix in prefixes)
+
+
+def get_read_group(path):
+    """Return the cache group serving GETs of this API path, or None"""
+    for group, prefixes in CACHE_GROUPS.items():
+        if _matches(path, prefixes['reads']):
+            return group
+    return None
+
+
+def get_write_groups(path):
+    """Return the cache groups invalidated by a write to this API path"""
+    return [group for group, prefixes in CACHE_GROUPS.items() if _matches(path, prefixes['writes'])]
+
+
+def get_scope(access_token):
+    """Cache scope of one caller: a hash of their access token"""
+    if not access_token:
+        return None
+    return hashlib.sha256(access_token.encode()).hexdigest()[:32]
+
+
+def _generation_key(scope, group):
+    return f"proxy_get:gen:{scope}:{group}"
+
+
+async def get_entry_key(scope, group, path, query):
+    """
+    Build the cache key of a GET, including the group's current generation
+
+    Args:
+        scope: Caller scope from get_scope
+        group: Cache group from get_read_group
+        path: Normalized API path
+        query: Incoming query dictionary
+    """
+    generation = await cache.aget(_generation_key(scope, group), 0)
+    params = sorted((k, v) for k, v in query.items() if k not in IGNORED_QUERY_PARAMS)
+    digest = hashlib.sha256(f"{path}?{urlencode(params)}".encode()).hexdigest()
+    return f"proxy_get:{scope}:{group}:{generation}:{digest}"
+
+
+async def invalidate(scope, groups):
+    """Drop every cached GET of the given groups for this scope"""
+    for group in groups:
+        # A new generation makes all older entry keys unreachable; they expire on their own
+        await cache.aset(_generation_key(scope, group), time.time_ns(), settings.API_PROXY_GET_CACHE_TTL)
+
+
+def is_fresh(entry):
+    """Whether an entry may be served without revalidating upstream"""
+    return time.time() - entry['stored_at'] < settings.API_PROXY_GET_CACHE_FRESH_SECONDS
+
+
+def conditional_headers(entry):
+    """Upstream revalidation headers for a stored entry"""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def build_entry(response, body):
+    """Create a cache entry from a buffered upstream 200 response"""
+    return {
+        'body': body,
+        'content_type': response.headers.get('content-type', 'application/json'),
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+        'browser_etag': quote_etag(hashlib.md5(body).hexdigest()),
+        'stored_at': time.time(),
+    }
+
+
+async def lookup(key):
+    return await cache.aget(key)
+
+
+async def store(key, entry):
+    if len(entry['body']) <= settings.API_PROXY_GET_CACHE_MAX_BYTES:
+        await cache.aset(key, entry, settings.API_PROXY_GET_CACHE_TTL)
+
+
+async def touch(key, entry):
+    """Record a successful upstream revalidation (304) of an entry"""
+    entry['stored_at'] = time.time()
+    await cache.aset(key, entry, settings.API_PROXY_GET_CACHE_TTL)
+
+
+def respond(request, entry, status=200):
+    """Serve an entry, answering 304 when the browser already holds it"""
+    if entry['browser_etag'] in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['body'], status=status, content_type=entry['content_type'])
+    response['ETag'] = entry['browser_etag']
+    # Browsers may keep the body but must revalidate it with us every time
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,166 @@
+"""
+Precomputed dashboard reports
+Week, month and year reports are computed ahead of time, as one bundle per
+company, and kept in the Django cache for DashboardView, which only computes
+the bundle itself on a miss.
+The bookings API only answers on a member's behalf, and members' tokens are
+never stored, so reports are refreshed on the request path: a dashboard
+visit that finds a bundle older than REPORTS_REFRESH_AFTER is served it and
+refreshes it in the background with the visitor's token, on a small pool of
+REPORTS_REFRESH_WORKERS threads, once per company however many visits ask.
+Booking writes through the API proxy (the bookings_changed signal) drop a
+company's reports, so the next visit computes fresh ones. The
+precompute_reports command precomputes with a credential given to it.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import receiver
+
+from users import rollups
+from users.reports import ReportsManager
+from users.signals import bookings_changed
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('year', 'month', 'week')
+
+# Writes through the API proxy that create, move or change the status of bookings
+BOOKING_WRITE_PREFIXES = ('api/v1/bookings',)
+BOOKING_TIME_KEYS = ('start_at', 'start_time')
+
+# Longest a background refresh may hold its company's lock
+_REFRESH_LOCK_TTL = 300
+
+_refresh_executor = None
+_refresh_executor_lock = threading.Lock()
+
+
+def _bundle_key(company_id):
+    return f"reports:bundle:{company_id}"
+
+
+def _changed_key(company_id):
+    return f"reports:changed:{company_id}"
+
+
+def _refreshing_key(company_id):
+    return f"reports:refreshing:{company_id}"
+
+
+def get_bundle(company_id):
+    """
+    Return the precomputed report bundle ({period: report}) of a company
+
+    Returns:
+        Tuple (bundle or None, whether it is older than REPORTS_REFRESH_AFTER)
+    """
+    entry = cache.get(_bundle_key(company_id))
+    if entry is None:
+        return None, False
+    return entry['bundle'], time.time() - entry['computed_at'] > settings.REPORTS_REFRESH_AFTER
+
+
+def store_bundle(company_id, bundle):
+    if bundle is not None:
+        entry = {'bundle': bundle, 'computed_at': time.time()}
+        cache.set(_bundle_key(company_id), entry, settings.REPORTS_PRECOMPUTE_TTL)
+
+
+def drop_reports(company_id):
+    """Drop a company's reports; precomputes already running will not store theirs"""
+    cache.set(_changed_key(company_id), time.time(), settings.REPORTS_PRECOMPUTE_TTL)
+    cache.delete(_bundle_key(company_id))
+
+
+def precompute(company_id, access_token):
+    """
+    Compute and store the report bundle of one company
+
+    Returns:
+        Number of reports stored
+    """
+    started = time.time()
+    bundle = ReportsManager(access_token, company_id=company_id).generate_report_bundle()
+    # Bookings changed while computing: the next visit computes fresh reports instead
+    if bundle is None or (cache.get(_changed_key(company_id)) or 0) > started:
+        return 0
+    store_bundle(company_id, bundle)
+    return len(bundle)
+
+
+def _get_refresh_executor():
+    """Return the process-wide pool that refreshes reports"""
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_executor_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=settings.REPORTS_REFRESH_WORKERS,
+                    thread_name_prefix='reports-refresh'
+                )
+    return _refresh_executor
+
+
+def _refresh(company_id, access_token):
+    try:
+        precompute(company_id, access_token)
+    except Exception as e:
+        logger.error(f"Error precomputing reports of company {company_id}: {str(e)}")
+    finally:
+        cache.delete(_refreshing_key(company_id))
+
+
+def schedule_refresh(company_id, access_token):
+    """
+    Refresh a company's reports in the background with the token of the
+    request asking for them, unless a refresh of the company is running
+
+    The token is only held by the queued job, never stored.
+    """
+    # Other processes may be refreshing the same company
+    if cache.add(_refreshing_key(company_id), 1, _REFRESH_LOCK_TTL):
+        _get_refresh_executor().submit(_refresh, company_id, access_token)
+
+
+def is_booking_write(path):
+    """Whether a successful write to this API path changes bookings"""
+    return any(path == prefix or path.startswith(prefix + '/') for prefix in BOOKING_WRITE_PREFIXES)
+
+
+def get_booking_ids(path):
+    """Return the booking id named by the path of a booking write, if any"""
+    rest = path[len(BOOKING_WRITE_PREFIXES[0]):].strip('/')
+    return [rest.split('/')[0]] if rest else []
+
+
+def get_booking_days(payload):
+    """Return the 'YYYY-MM-DD' days named by the booking times of a write payload"""
+    days = set()
+    if isinstance(payload, dict):
+        for key, value in payload.items():
+            if key in BOOKING_TIME_KEYS and isinstance(value, str) and len(value) >= 10:
+                days.add(value[:10])
+            else:
+                days.update(get_booking_days(value))
+    elif isinstance(payload, list):
+        for item in payload:
+            days.update(get_booking_days(item))
+    return days
+
+
+@receiver(bookings_changed)
+def drop_after_booking_change(sender, company_id, days, booking_ids=(), **kwargs):
+    """
+    Drop the reports of the writer's company, and the rollups of the days
+    the write named or the changed bookings were on
+    """
+    if not company_id:
+        return
+
+    rollups.invalidate(company_id, set(days) | rollups.find_booking_days(company_id, booking_ids))
+    drop_reports(company_id)
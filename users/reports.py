@@ -3,18 +3,44 @@ Reports and Analytics Module
 Handles data aggregation and report generation for the dashboard
 """
 import requests
+import time
 from datetime import datetime, timedelta
+from functools import partial
 from django.conf import settings
+from salona_business_django import json_stream, upstream
+from users import rollups
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bookings responses are parsed as they arrive, in chunks of this size
+BOOKINGS_CHUNK_SIZE = 64 * 1024
+
+
+class BookingsUnavailable(Exception):
+    """The bookings API did not return a date range's bookings"""
+
+
+def _clock_hours(value):
+    """Hours since midnight of a 'HH:MM[:SS]' time (or an ISO datetime's time), or None"""
+    try:
+        hours, minutes = str(value).split('T')[-1][:5].split(':')
+        return int(hours) + int(minutes) / 60
+    except (TypeError, ValueError):
+        return None
+
 
 class ReportsManager:
     """Manages report generation and data aggregation"""
 
-    def __init__(self, access_token):
+    def __init__(self, access_token, company_id=None):
         self.access_token = access_token
+        # Day rollups are only stored when the company is known
+        self.company_id = company_id
+        # Day rollups and time-offs already fetched by this manager, shared by all its reports
+        self._day_rollups = {}
+        self._time_offs = None
+        self._staff_schedules = None
         self.api_base = getattr(settings, 'API_BASE_URL', 'https://api.salona.me')
 
     def get_header(self):
@@ -28,12 +54,15 @@ class ReportsManager:
         """
         Fetch bookings from the API for a given date range
 
+        The response is streamed: bookings are parsed one at a time while the
+        body arrives, so a year of bookings is never held in memory at once.
+
         Args:
             start_date: Start date string (YYYY-MM-DD)
             end_date: Optional end date string (YYYY-MM-DD)
 
         Returns:
-            List of bookings or None if error
+            Iterator over the bookings or None if error
         """
         try:
             query_params = {
@@ -45,23 +74,228 @@ class ReportsManager:
             api_url = f"{self.api_base}/api/v1/bookings"
             cookies = {'access_token': self.access_token}
 
-            response = requests.get(
+            response = upstream.get(
                 api_url,
                 params=query_params,
                 headers=self.get_header(),
                 cookies=cookies,
-                timeout=15
+                timeout='reports',
+                stream=True
             )
 
             if response.status_code == 200:
-                data = response.json()
-                return data.get('data', [])
+                return self.iter_response_bookings(response)
+            response.close()
             return None
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching bookings: {str(e)}")
             return None
 
+    @staticmethod
+    def iter_response_bookings(response):
+        """Yield the bookings of a streamed response, releasing the connection when done"""
+        try:
+            yield from json_stream.iter_array_items(response.iter_content(BOOKINGS_CHUNK_SIZE), 'data')
+        finally:
+            response.close()
+
+    def iter_bookings_range(self, start_date, end_date):
+        """
+        Yield the bookings of a date range as they are received
+
+        Ranges longer than settings.REPORTS_MAX_FETCH_DAYS (when the API caps
+        range size) are split into windows that are fetched one after another,
+        so memory stays flat however long the range is.
+
+        Args:
+            start_date: First day of the range (date or datetime)
+            end_date: Last day of the range (date or datetime)
+
+        Raises:
+            BookingsUnavailable: A window could not be fetched
+            requests.exceptions.RequestException: The connection failed mid-response
+            ValueError: A response was not valid JSON
+        """
+        max_days = getattr(settings, 'REPORTS_MAX_FETCH_DAYS', None)
+        # A booking spanning a window boundary is returned by both windows. Only the ids of
+        # the bookings on the last two days of a window are kept, to drop them from the next
+        boundary_ids = set()
+        window_start = start_date
+        while True:
+            window_end = end_date
+            if max_days:
+                window_end = min(end_date, window_start + timedelta(days=max_days - 1))
+            is_last_window = window_end >= end_date
+            boundary_day = (window_end - timedelta(days=1)).strftime('%Y-%m-%d')
+
+            bookings = self.fetch_bookings(window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d'))
+            if bookings is None:
+                raise BookingsUnavailable(f"{window_start:%Y-%m-%d}..{window_end:%Y-%m-%d}")
+            previous_ids, boundary_ids = boundary_ids, set()
+            for booking in bookings:
+                booking_id = booking.get('id')
+                if booking_id is not None:
+                    if booking_id in previous_ids:
+                        continue
+                    day = (booking.get('end_at') or booking.get('start_at') or '')[:10]
+                    if not is_last_window and (not day or day >= boundary_day):
+                        boundary_ids.add(booking_id)
+                yield booking
+
+            if is_last_window:
+                break
+            window_start = window_end + timedelta(days=1)
+
+    def get_day_rollups(self, start_date, end_date):
+        """
+        Get per-day booking rollups for a date range
+
+        Final days come from the rollup store; the remaining ones are fetched
+        in a single range and stored for the next report.
+
+        Args:
+            start_date: First day of the range (date)
+            end_date: Last day of the range (date)
+
+        Returns:
+            Dictionary mapping 'YYYY-MM-DD' to the day's rollup, or None if the fetch failed
+        """
+        days = [day.strftime('%Y-%m-%d') for day in rollups.each_day(start_date, end_date)]
+        if all(day in self._day_rollups for day in days):
+            return {day: self._day_rollups[day] for day in days}
+
+        stored = rollups.load(self.company_id, start_date, end_date) if self.company_id else {}
+        stale_days = [
+            day for day in rollups.each_day(start_date, end_date)
+            if not stored.get(day.strftime('%Y-%m-%d'), {}).get('final')
+        ]
+        if not stale_days:
+            self._day_rollups.update(stored)
+            return stored
+
+        fetched_at = time.time()
+        try:
+            fresh = rollups.rollup_bookings(
+                self.iter_bookings_range(stale_days[0], stale_days[-1]),
+                stale_days[0], stale_days[-1], datetime.now().date()
+            )
+        except (BookingsUnavailable, requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error fetching bookings: {str(e)}")
+            return None
+
+        if self.company_id:
+            rollups.save(self.company_id, fresh, fetched_at)
+        day_rollups = {**stored, **fresh}
+        self._day_rollups.update(day_rollups)
+        return day_rollups
+
+    def fetch_time_offs(self, start_date, end_date):
+        """
+        Fetch the company's time-offs overlapping a date range
+
+        Args:
+            start_date: Start date string (YYYY-MM-DD)
+            end_date: End date string (YYYY-MM-DD)
+
+        Returns:
+            List of time-offs or None if error
+        """
+        try:
+            response = upstream.get(
+                f"{self.api_base}/api/v1/users/time-offs",
+                params={'start_date': start_date, 'end_date': end_date},
+                headers=self.get_header(),
+                cookies={'access_token': self.access_token},
+                timeout='reports'
+            )
+
+            if response.status_code == 200:
+                return response.json().get('data') or []
+            return None
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching time-offs: {str(e)}")
+            return None
+
+    def get_time_offs(self, start_date, end_date):
+        """
+        Get the time-offs overlapping a date range, reusing an earlier fetch of a wider range
+
+        Args:
+            start_date: First day of the range (date)
+            end_date: Last day of the range (date)
+
+        Returns:
+            List of time-offs or None if error
+        """
+        if self._time_offs is not None:
+            fetched_start, fetched_end, time_offs = self._time_offs
+            if fetched_start <= start_date and end_date <= fetched_end:
+                return time_offs
+
+        time_offs = self.fetch_time_offs(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        if time_offs is not None:
+            self._time_offs = (start_date, end_date, time_offs)
+        return time_offs
+
+    def fetch_staff_schedules(self):
+        """
+        Fetch the weekly working hours of the company's staff
+
+        Returns:
+            Dictionary mapping staff id to {weekday: (start hour, end hour)}
+            of the days they work, for the staff that set their availability,
+            or None if error
+        """
+        try:
+            response = upstream.get(
+                f"{self.api_base}/api/v1/companies/users",
+                headers=self.get_header(),
+                cookies={'access_token': self.access_token},
+                timeout='reports'
+            )
+            if response.status_code != 200:
+                return None
+            members = response.json().get('data') or []
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error fetching staff schedules: {str(e)}")
+            return None
+
+        schedules = {}
+        for member in members:
+            user = member.get('user') or {}
+            if user.get('id') is None or not user.get('availabilities'):
+                continue
+            schedule = schedules[user['id']] = {}
+            for availability in user['availabilities']:
+                start, end = _clock_hours(availability.get('start_time')), _clock_hours(availability.get('end_time'))
+                if availability.get('is_available') and start is not None and end is not None and end > start:
+                    schedule[availability.get('day_of_week')] = (start, end)
+        return schedules
+
+    def get_staff_schedules(self):
+        """Get the staff's weekly working hours, fetched once per manager (see fetch_staff_schedules)"""
+        if self._staff_schedules is None:
+            self._staff_schedules = self.fetch_staff_schedules()
+        return self._staff_schedules
+
+    @staticmethod
+    def get_period_range(period):
+        """
+        Get the date range of a report period
+
+        Args:
+            period: 'week', 'month', 'year', or 'custom'
+
+        Returns:
+            Tuple of (previous period start, period start, today) datetimes
+        """
+        today = datetime.now()
+        days = {'week': 7, 'month': 30, 'year': 365}.get(period, 7)  # Default to week
+        start_date = today - timedelta(days=days)
+        return start_date - timedelta(days=days), start_date, today
+
     def generate_bookings_report(self, period='week'):
         """
         Generate comprehensive bookings report
@@ -72,35 +306,13 @@ class ReportsManager:
         Returns:
             Dictionary containing report data
         """
-        today = datetime.now()
+        previous_start, start_date, today = self.get_period_range(period)
+
+        # The previous period ends where the current one starts, so both are
+        # summed from one set of day rollups
+        day_rollups = self.get_day_rollups(previous_start.date(), today.date())
 
-        # Calculate date range based on period
-        if period == 'week':
-            start_date = today - timedelta(days=7)
-            previous_start = start_date - timedelta(days=7)
-        elif period == 'month':
-            start_date = today - timedelta(days=30)
-            previous_start = start_date - timedelta(days=30)
-        elif period == 'year':
-            start_date = today - timedelta(days=365)
-            previous_start = start_date - timedelta(days=365)
-        else:  # Default to week
-            start_date = today - timedelta(days=7)
-            previous_start = start_date - timedelta(days=7)
-
-        # Fetch current period bookings
-        current_bookings = self.fetch_bookings(
-            start_date.strftime('%Y-%m-%d'),
-            today.strftime('%Y-%m-%d')
-        )
-
-        # Fetch previous period bookings for comparison
-        previous_bookings = self.fetch_bookings(
-            previous_start.strftime('%Y-%m-%d'),
-            start_date.strftime('%Y-%m-%d')
-        )
-
-        if current_bookings is None:
+        if day_rollups is None:
             return None
 
         # Calculate metrics
@@ -131,104 +343,317 @@ class ReportsManager:
             }
         }
 
-        # Process current period bookings
-        for booking in current_bookings:
-            report['total_bookings'] += 1
-            booking['total_price'] = float(booking.get('total_price', 0) or 0) / 100  # Convert cents to dollars
-            # Count by status
-            status = booking.get('status', 'pending').lower()
-            if status in report['status_breakdown']:
-                report['status_breakdown'][status] += 1
-
-            if status == 'completed':
-                report['completed_bookings'] += 1
-            elif status == 'cancelled':
-                report['cancelled_bookings'] += 1
-            else:
-                report['pending_bookings'] += 1
-
-            # Calculate revenue (only for completed bookings)
-            if status == 'completed':
-                price = float(booking.get('total_price', 0) or 0)
-                report['total_revenue'] += price
-
-            # Group by day
-            booking_date = booking.get('start_at', '')[:10]  # Extract date part
-            if booking_date:
-                report['bookings_by_day'][booking_date] = report['bookings_by_day'].get(booking_date, 0) + 1
+        # Sum the current period's day rollups; earlier days form the previous period
+        boundary_date = start_date.strftime('%Y-%m-%d')
+        prev_total = 0
+        prev_revenue = 0.0
+        for day, rollup in sorted(day_rollups.items()):
+            if day < boundary_date:
+                prev_total += rollup['total']
+                prev_revenue += rollup['revenue']
+                continue
+            if not rollup['total']:
+                continue
+
+            report['total_bookings'] += rollup['total']
+            for status, count in rollup['statuses'].items():
+                # Count by status
+                if status in report['status_breakdown']:
+                    report['status_breakdown'][status] += count
+
                 if status == 'completed':
-                    price = float(booking.get('total_price', 0) or 0)
-                    report['revenue_by_day'][booking_date] = report['revenue_by_day'].get(booking_date, 0) + price
+                    report['completed_bookings'] += count
+                elif status == 'cancelled':
+                    report['cancelled_bookings'] += count
+                else:
+                    report['pending_bookings'] += count
+
+            # Revenue (only for completed bookings) and grouping by day
+            report['total_revenue'] += rollup['revenue']
+            report['bookings_by_day'][day] = rollup['total']
+            if rollup['statuses'].get('completed'):
+                report['revenue_by_day'][day] = rollup['revenue']
 
             # Group by staff
-            services = booking.get('booking_services', [])
-            for service in services:
-                staff_id = service.get('assigned_staff', {}).get('id', 'Unassigned')
-                first_name = service.get('assigned_staff', {}).get('first_name', None)
-                last_name = service.get('assigned_staff', {}).get('last_name', None)
-                staff_name = (f"{first_name} {last_name}".strip()) if first_name or last_name else 'Unassigned'
-                if staff_id not in report['bookings_by_staff']:
-                    report['bookings_by_staff'][staff_id] = {
-                        'name': staff_name,
-                        'count': 0,
-                        'revenue': 0.0
-                    }
-                report['bookings_by_staff'][staff_id]['count'] += 1
-                if status == 'completed':
-                    price = float(booking.get('total_price', 0) or 0)
-                    report['bookings_by_staff'][staff_id]['revenue'] += price
+            for staff_id, staff in rollup['staff'].items():
+                staff_report = report['bookings_by_staff'].setdefault(
+                    staff_id, {'name': staff['name'], 'count': 0, 'revenue': 0.0}
+                )
+                staff_report['count'] += staff['count']
+                staff_report['revenue'] += staff['revenue']
 
             # Group by service
-            for service in services:
-                service_name = service.get('category_service', {}).get('name', 'Unknown')
-                if service_name not in report['bookings_by_service']:
-                    report['bookings_by_service'][service_name] = {
-                        'count': 0,
-                        'revenue': 0.0
-                    }
-                report['bookings_by_service'][service_name]['count'] += 1
-                if status == 'completed':
-                    service_price = float(service.get('price', 0) or 0)
-                    report['bookings_by_service'][service_name]['revenue'] += service_price
+            for service_name, service in rollup['services'].items():
+                service_report = report['bookings_by_service'].setdefault(service_name, {'count': 0, 'revenue': 0.0})
+                service_report['count'] += service['count']
+                service_report['revenue'] += service['revenue']
 
         # Calculate averages
         if report['completed_bookings'] > 0:
             report['average_booking_value'] = report['total_revenue'] / report['completed_bookings']
 
         # Calculate comparison with previous period
-        if previous_bookings:
-            prev_total = len(previous_bookings)
-            prev_revenue = sum(
-                float(b.get('total_price', 0) or 0)
-                for b in previous_bookings
-                if b.get('status', '').lower() == 'completed'
+        if prev_total > 0:
+            report['comparison']['bookings_change'] = (
+                (report['total_bookings'] - prev_total) / prev_total * 100
             )
 
-            if prev_total > 0:
-                report['comparison']['bookings_change'] = (
-                    (report['total_bookings'] - prev_total) / prev_total * 100
-                )
-
-            if prev_revenue > 0:
-                report['comparison']['revenue_change'] = (
-                    (report['total_revenue'] - prev_revenue) / prev_revenue * 100
-                )
+        if prev_revenue > 0:
+            report['comparison']['revenue_change'] = (
+                (report['total_revenue'] - prev_revenue) / prev_revenue * 100
+            )
 
         return report
 
-    def generate_customer_report(self):
+    @staticmethod
+    def month_index(month):
+        """Months since year 0 of a 'YYYY-MM' month, for month arithmetic"""
+        return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+    def generate_customer_report(self, period='week'):
         """
         Generate customer analytics report
         Returns customer statistics and trends
+
+        A visit is a completed booking. Lifetime value and monthly retention
+        cohorts cover settings.REPORTS_CUSTOMER_HISTORY_DAYS of history (or
+        the whole report range, if longer); a customer's cohort is the month
+        of their first visit within it. Built from the shared day rollups in
+        one chronological pass with one accumulator per customer.
+
+        Args:
+            period: 'week', 'month', 'year', or 'custom'
+
+        Returns:
+            Dictionary containing report data, or None if bookings are unavailable
+        """
+        previous_start, start_date, today = self.get_period_range(period)
+        history_start = min(previous_start, today - timedelta(days=settings.REPORTS_CUSTOMER_HISTORY_DAYS))
+        day_rollups = self.get_day_rollups(history_start.date(), today.date())
+
+        if day_rollups is None:
+            return None
+
+        boundary_date = start_date.strftime('%Y-%m-%d')
+        customers = {}
+        for day, rollup in sorted(day_rollups.items()):
+            in_period = day >= boundary_date
+            for customer_id, (visits, spend) in rollup['customers'].items():
+                customer = customers.get(customer_id)
+                if customer is None:
+                    customer = customers[customer_id] = {
+                        'first_visit': day, 'visits': 0, 'spend': 0.0, 'period_visits': 0, 'months': set(),
+                    }
+                customer['visits'] += visits
+                customer['spend'] += spend
+                customer['months'].add(day[:7])
+                if in_period:
+                    customer['period_visits'] += visits
+
+        period_customers = [customer for customer in customers.values() if customer['period_visits']]
+        new_customers = sum(1 for customer in period_customers if customer['first_visit'] >= boundary_date)
+        repeat_customers = sum(1 for customer in period_customers if customer['period_visits'] > 1)
+
+        # Monthly cohorts: share of each first-visit month's customers still visiting N months later
+        last_month = self.month_index(today.strftime('%Y-%m'))
+        cohort_activity = {}
+        for customer in customers.values():
+            cohort = customer['first_visit'][:7]
+            activity = cohort_activity.setdefault(cohort, [0] * (last_month - self.month_index(cohort) + 1))
+            for month in customer['months']:
+                activity[self.month_index(month) - self.month_index(cohort)] += 1
+
+        report = {
+            'period': period,
+            'start_date': boundary_date,
+            'end_date': today.strftime('%Y-%m-%d'),
+            'total_customers': len(period_customers),
+            'new_customers': new_customers,
+            'returning_customers': len(period_customers) - new_customers,
+            'repeat_visit_rate': 0.0,
+            'average_visits': 0.0,
+            'customer_lifetime_value': 0.0,
+            'cohorts': {
+                cohort: {
+                    'customers': activity[0],
+                    'retention': [active / activity[0] * 100 for active in activity],
+                }
+                for cohort, activity in sorted(cohort_activity.items())
+            },
+        }
+
+        if period_customers:
+            report['repeat_visit_rate'] = repeat_customers / len(period_customers) * 100
+            report['average_visits'] = sum(customer['period_visits'] for customer in period_customers) / len(period_customers)
+        if customers:
+            report['customer_lifetime_value'] = sum(customer['spend'] for customer in customers.values()) / len(customers)
+
+        return report
+
+    @staticmethod
+    def get_working_hours(schedule, day):
         """
-        # This will be implemented when we have customer endpoint data
-        pass
+        A staff member's working hours on a day, as (start hour, end hour), or None
 
-    def generate_staff_performance_report(self):
+        Staff without a weekly schedule (schedule is None) work
+        settings.REPORTS_STAFF_HOURS_PER_DAY hours, at no set time of day,
+        on settings.REPORTS_STAFF_WORK_DAYS.
+        """
+        if schedule is not None:
+            return schedule.get(day.weekday())
+        if day.weekday() not in settings.REPORTS_STAFF_WORK_DAYS:
+            return None
+        return 0, settings.REPORTS_STAFF_HOURS_PER_DAY
+
+    @classmethod
+    def get_time_off_hours(cls, time_off, start_date, end_date, schedule=None):
+        """
+        Working hours a time-off takes out of a date range
+
+        Only the hours the staff member works count (see get_working_hours);
+        without a schedule, time off on a work day counts up to a day's hours.
+
+        Args:
+            time_off: Time-off from the API, with start_date and end_date
+            start_date: First day of the range (date)
+            end_date: Last day of the range (date)
+            schedule: The staff member's weekly schedule (see fetch_staff_schedules), or None
+        """
+        try:
+            time_off_start = datetime.fromisoformat(time_off['start_date']).replace(tzinfo=None)
+            time_off_end = datetime.fromisoformat(time_off['end_date']).replace(tzinfo=None)
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+        if len(time_off['end_date']) == 10:
+            # A plain end date includes that whole day
+            time_off_end += timedelta(days=1)
+
+        hours = 0.0
+        first_day = max(start_date, time_off_start.date())
+        last_day = min(end_date, time_off_end.date())
+        for day in rollups.each_day(first_day, last_day):
+            working_hours = cls.get_working_hours(schedule, day)
+            if working_hours is None:
+                continue
+            day_start = datetime.combine(day, datetime.min.time())
+            if schedule is None:
+                overlap = min(time_off_end, day_start + timedelta(days=1)) - max(time_off_start, day_start)
+                hours += min(max(overlap.total_seconds() / 3600, 0), settings.REPORTS_STAFF_HOURS_PER_DAY)
+                continue
+            work_start, work_end = (day_start + timedelta(hours=hour) for hour in working_hours)
+            overlap = min(time_off_end, work_end) - max(time_off_start, work_start)
+            hours += max(overlap.total_seconds() / 3600, 0)
+        return hours
+
+    def generate_staff_performance_report(self, period='week'):
         """
         Generate staff performance report
         Returns staff-level metrics and KPIs
+
+        Built from the same day rollups as generate_bookings_report, so both
+        reports of one manager share a single bookings fetch; only the
+        period's time-offs are fetched in addition, concurrently.
+
+        Args:
+            period: 'week', 'month', 'year', or 'custom'
+
+        Returns:
+            Dictionary containing report data, or None if bookings or time-offs are unavailable
+        """
+        previous_start, start_date, today = self.get_period_range(period)
+        first_day, last_day = start_date.date(), today.date()
+
+        results = upstream.fan_out({
+            'day_rollups': partial(self.get_day_rollups, previous_start.date(), last_day),
+            'time_offs': partial(self.get_time_offs, first_day, last_day),
+            'schedules': self.get_staff_schedules,
+        })
+        if results['day_rollups'] is None or results['time_offs'] is None:
+            return None
+        # Without schedules every member gets the default working hours
+        schedules = results['schedules'] or {}
+
+        staff_report = {}
+        boundary_date = first_day.strftime('%Y-%m-%d')
+        for day, rollup in results['day_rollups'].items():
+            if day < boundary_date:
+                continue
+            for staff_id, staff in rollup['staff'].items():
+                totals = staff_report.setdefault(staff_id, {
+                    'name': staff['name'], 'bookings': 0, 'completed': 0, 'no_shows': 0, 'revenue': 0.0, 'minutes': 0.0,
+                })
+                totals['bookings'] += staff['count']
+                totals['completed'] += staff['completed']
+                totals['no_shows'] += staff['no_show']
+                totals['revenue'] += staff['revenue']
+                totals['minutes'] += staff['minutes']
+
+        # Working hours of the period, from each member's weekly schedule, less their time off
+        time_off_hours = {}
+        for time_off in results['time_offs']:
+            staff_id = (time_off.get('user') or {}).get('id')
+            if staff_id is not None:
+                time_off_hours[staff_id] = time_off_hours.get(staff_id, 0.0) + self.get_time_off_hours(
+                    time_off, first_day, last_day, schedules.get(staff_id)
+                )
+
+        for staff_id, totals in staff_report.items():
+            booked_hours = totals.pop('minutes') / 60
+            working_hours = (self.get_working_hours(schedules.get(staff_id), day) for day in rollups.each_day(first_day, last_day))
+            work_hours = sum(end - start for start, end in filter(None, working_hours))
+            available_hours = max(work_hours - time_off_hours.get(staff_id, 0.0), 0)
+            totals.update({
+                'booked_hours': booked_hours,
+                'time_off_hours': time_off_hours.get(staff_id, 0.0),
+                'available_hours': available_hours,
+                'utilization': booked_hours / available_hours * 100 if available_hours else 0,
+                'revenue_per_hour': totals['revenue'] / booked_hours if booked_hours else 0,
+                'average_ticket': totals['revenue'] / totals['completed'] if totals['completed'] else 0,
+                'no_show_rate': totals['no_shows'] / totals['bookings'] * 100 if totals['bookings'] else 0,
+            })
+
+        return {
+            'period': period,
+            'start_date': boundary_date,
+            'end_date': last_day.strftime('%Y-%m-%d'),
+            'staff': staff_report,
+        }
+
+    def generate_dashboard_report(self, period='week'):
+        """
+        Generate the dashboard's bookings report with its staff and customer reports
+
+        Returns:
+            Bookings report with 'staff_performance' (None if time-offs were
+            unavailable) and 'customers' entries, or None if bookings are unavailable
+        """
+        # The customer report reads the longest history, so it goes first and
+        # the other reports reuse its day rollups
+        customer_report = self.generate_customer_report(period)
+        report = self.generate_bookings_report(period)
+        if report is not None:
+            report['staff_performance'] = self.generate_staff_performance_report(period)
+            report['customers'] = customer_report
+        return report
+
+    def generate_report_bundle(self):
+        """
+        Generate the dashboard reports of every period at once
+
+        The year report (with its comparison year) goes first; the month and
+        week reports reuse its day rollups and time-offs, so the whole bundle
+        costs one bookings fetch and lets the dashboard switch periods
+        without asking the server again.
+
+        Returns:
+            Dictionary mapping 'year', 'month' and 'week' to their dashboard
+            report, or None if bookings are unavailable
         """
-        # This will be implemented with more detailed staff data
-        pass
+        bundle = {}
+        for period in ('year', 'month', 'week'):
+            report = self.generate_dashboard_report(period)
+            if report is None:
+                return None
+            bundle[period] = report
+        return bundle
 
@@ -0,0 +1,217 @@
+"""
+Per-company, per-day booking rollups for the dashboard reports
+A day's rollup holds its booking counts by status, revenue, per-service
+counts and revenue, per-staff counts, revenue and booked minutes, the
+visits and spend of each customer with a completed booking, and the ids of
+its bookings.
+Rollups live in the Django cache, one key per company and day, next to an
+index of the day each booking was on. Days older than
+REPORTS_ROLLUP_FINAL_AFTER_DAYS are final: they are never refetched, so a
+year report only asks the API for the last few days. Booking writes drop
+the days they touch, found by booking id when the write names no day (see
+find_booking_days), and mark them changed, so a report built from bookings
+fetched before the write does not store the day again.
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Bumped whenever the rollup format changes, so older rollups are ignored
+ROLLUP_VERSION = 5
+
+# Longest a report build may take and still be told a day changed under it
+_CHANGED_TTL = 3600
+
+
+def _day_key(company_id, day):
+    return f"reports:rollup:v{ROLLUP_VERSION}:{company_id}:{day}"
+
+
+def _booking_key(company_id, booking_id):
+    """Key of the day ('YYYY-MM-DD') a booking was stored on"""
+    return f"reports:rollup:v{ROLLUP_VERSION}:{company_id}:booking:{booking_id}"
+
+
+def _changed_key(company_id, day):
+    """Key of the time a booking write last dropped the day"""
+    return f"reports:rollup:changed:{company_id}:{day}"
+
+
+def each_day(start_date, end_date):
+    """Yield every date from start_date to end_date, inclusive"""
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def final_before(today):
+    """First day that is not final yet; every earlier day is"""
+    return today - timedelta(days=settings.REPORTS_ROLLUP_FINAL_AFTER_DAYS)
+
+
+def empty_rollup():
+    return {
+        'final': False,
+        'total': 0,
+        'statuses': {},
+        'revenue': 0.0,
+        'staff': {},
+        'services': {},
+        'customers': {},
+        'booking_ids': [],
+    }
+
+
+def _booking_minutes(booking):
+    """Length of a booking in minutes, from its start_at and end_at"""
+    start_at, end_at = booking.get('start_at'), booking.get('end_at')
+    if not start_at or not end_at:
+        return 0
+    try:
+        return (datetime.fromisoformat(end_at) - datetime.fromisoformat(start_at)).total_seconds() / 60
+    except (TypeError, ValueError):
+        return 0
+
+
+def _staff_name(staff):
+    first_name = staff.get('first_name', None)
+    last_name = staff.get('last_name', None)
+    return (f"{first_name} {last_name}".strip()) if first_name or last_name else 'Unassigned'
+
+
+def rollup_bookings(bookings, start_date, end_date, today):
+    """
+    Roll up bookings into one rollup per day of [start_date, end_date]
+
+    Days without bookings get an empty rollup, so they are not fetched again
+    once final. Bookings without a start_at have no day and are skipped.
+
+    Returns:
+        Dictionary mapping 'YYYY-MM-DD' to the day's rollup
+    """
+    first_open_day = final_before(today)
+    rollups = {}
+    for day in each_day(start_date, end_date):
+        rollup = empty_rollup()
+        rollup['final'] = day < first_open_day
+        rollups[day.strftime('%Y-%m-%d')] = rollup
+
+    # Hot loop for year ranges: each booking is walked once, prices are
+    # converted only for completed bookings and staff names built once per staff
+    day_rollup = rollups.get
+    staff_names = {}
+    for booking in bookings:
+        rollup = day_rollup((booking.get('start_at') or '')[:10])
+        if rollup is None:
+            continue
+
+        status = booking.get('status', 'pending').lower()
+        completed = status == 'completed'
+        statuses = rollup['statuses']
+        statuses[status] = statuses.get(status, 0) + 1
+        rollup['total'] += 1
+        if booking.get('id') is not None:
+            rollup['booking_ids'].append(str(booking['id']))
+        if completed:
+            total_price = float(booking.get('total_price', 0) or 0) / 100  # Convert cents to dollars
+            rollup['revenue'] += total_price
+
+            # [visits, spend] per customer, for the customer report
+            customer_id = (booking.get('customer') or {}).get('id')
+            if customer_id is not None:
+                visits = rollup['customers'].get(customer_id)
+                if visits is None:
+                    rollup['customers'][customer_id] = [1, total_price]
+                else:
+                    visits[0] += 1
+                    visits[1] += total_price
+
+        services = booking.get('booking_services', ())
+        # Services without their own duration share the booking's time evenly
+        minutes_per_service = _booking_minutes(booking) / len(services) if services else 0
+        for service in services:
+            staff = service.get('assigned_staff', {})
+            staff_id = staff.get('id', 'Unassigned')
+            staff_rollup = rollup['staff'].get(staff_id)
+            if staff_rollup is None:
+                staff_name = staff_names.get(staff_id)
+                if staff_name is None:
+                    staff_name = staff_names[staff_id] = _staff_name(staff)
+                staff_rollup = rollup['staff'][staff_id] = {
+                    'name': staff_name, 'count': 0, 'revenue': 0.0, 'minutes': 0.0, 'completed': 0, 'no_show': 0,
+                }
+            staff_rollup['count'] += 1
+            staff_rollup['minutes'] += float(service.get('duration') or minutes_per_service)
+            if status == 'no_show':
+                staff_rollup['no_show'] += 1
+
+            service_name = service.get('category_service', {}).get('name', 'Unknown')
+            service_rollup = rollup['services'].get(service_name)
+            if service_rollup is None:
+                service_rollup = rollup['services'][service_name] = {'count': 0, 'revenue': 0.0}
+            service_rollup['count'] += 1
+
+            if completed:
+                staff_rollup['completed'] += 1
+                staff_rollup['revenue'] += total_price
+                service_rollup['revenue'] += float(service.get('price', 0) or 0)
+    return rollups
+
+
+def load(company_id, start_date, end_date):
+    """
+    Return the stored rollups of a company's days in [start_date, end_date]
+
+    Returns:
+        Dictionary mapping 'YYYY-MM-DD' to rollup, for the days that are stored
+    """
+    keys = {_day_key(company_id, day.strftime('%Y-%m-%d')): day.strftime('%Y-%m-%d')
+            for day in each_day(start_date, end_date)}
+    return {keys[key]: rollup for key, rollup in cache.get_many(list(keys)).items()}
+
+
+def _changed_since(company_id, days, since):
+    """Return the days a booking write dropped after the time since"""
+    keys = {_changed_key(company_id, day): day for day in days}
+    return {keys[key] for key, changed in cache.get_many(list(keys)).items() if changed > since}
+
+
+def save(company_id, rollups, fetched_at):
+    """
+    Store day rollups built from bookings fetched at fetched_at (a time.time())
+
+    Days a booking write dropped since then are not stored. They are checked
+    again after writing, so a write that lands in between still wins.
+    """
+    changed = _changed_since(company_id, rollups, fetched_at)
+    rollups = {day: rollup for day, rollup in rollups.items() if day not in changed}
+    values = {_day_key(company_id, day): rollup for day, rollup in rollups.items()}
+    values.update({
+        _booking_key(company_id, booking_id): day
+        for day, rollup in rollups.items() for booking_id in rollup.get('booking_ids', ())
+    })
+    cache.set_many(values, settings.REPORTS_ROLLUP_TTL)
+
+    changed = _changed_since(company_id, rollups, fetched_at)
+    if changed:
+        cache.delete_many([_day_key(company_id, day) for day in changed])
+
+
+def find_booking_days(company_id, booking_ids):
+    """Return the stored days ('YYYY-MM-DD') that hold any of these bookings"""
+    keys = [_booking_key(company_id, str(booking_id)) for booking_id in booking_ids]
+    return set(cache.get_many(keys).values()) if keys else set()
+
+
+def invalidate(company_id, days):
+    """Drop the stored rollups of some days ('YYYY-MM-DD'), so the next report refetches them"""
+    if not days:
+        return
+    # Mark first: a report storing these days afterwards sees the mark and drops them again
+    now = time.time()
+    cache.set_many({_changed_key(company_id, day): now for day in days}, _CHANGED_TTL)
+    cache.delete_many([_day_key(company_id, day) for day in days])
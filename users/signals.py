@@ -0,0 +1,9 @@
+"""
+Signals sent by the users app
+"""
+from django.dispatch import Signal
+
+# Sent after a booking write through the API proxy succeeded, with the
+# writer's company_id, the 'YYYY-MM-DD' days the write named and the
+# booking_ids its path named
+bookings_changed = Signal()
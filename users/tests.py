@@ -1,9 +1,12 @@
-from django.test import TestCase, Client
+import requests
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from .models import OnboardingTourStatus
 
 User = get_user_model()
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 class OnboardingAPITest(TestCase):
     def setUp(self):
@@ -34,3 +37,1197 @@ class OnboardingAPITest(TestCase):
 
         # DB record exists
         self.assertTrue(OnboardingTourStatus.objects.filter(user=self.user, tour_name=tour_name, completed=True).exists())
+
+
+class UpstreamClientTest(TestCase):
+    def test_session_is_reused_per_thread(self):
+        from salona_business_django import upstream
+        self.assertIs(upstream.get_session(), upstream.get_session())
+
+    def test_session_does_not_keep_response_cookies(self):
+        from http.cookiejar import Cookie
+        from requests.cookies import MockRequest
+        from salona_business_django import upstream
+        session = upstream.build_session()
+        prepared = session.prepare_request(requests.Request('GET', 'https://api.salona.me/api/v1/users/me'))
+        cookie = Cookie(0, 'access_token', 'secret', None, False, 'api.salona.me', False, False,
+                        '/', False, True, None, False, None, None, {})
+        session.cookies.set_cookie_if_ok(cookie, MockRequest(prepared))
+        self.assertEqual(len(session.cookies), 0)
+
+    async def test_identical_concurrent_gets_share_one_upstream_call(self):
+        import asyncio
+        import httpx
+        from unittest import mock
+        from salona_business_django import upstream
+
+        calls = []
+
+        async def handler(upstream_request):
+            calls.append(upstream_request.headers['cookie'])
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={'count': 3})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        url = 'https://api.salona.me/api/v1/notifications/unread-count'
+        before = upstream.get_single_flight_stats()['coalesced']
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            first, second, other_user = await asyncio.gather(
+                upstream.arequest('GET', url, cookies={'access_token': 'a'}),
+                upstream.arequest('GET', url, cookies={'access_token': 'a'}),
+                upstream.arequest('GET', url, cookies={'access_token': 'b'}),
+            )
+
+        self.assertEqual(sorted(calls), ['access_token=a', 'access_token=b'])
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(other_user.json(), {'count': 3})
+        self.assertEqual(upstream.get_single_flight_stats()['coalesced'] - before, 1)
+
+    @override_settings(UPSTREAM_SINGLE_FLIGHT_LOG_INTERVAL=60)
+    def test_single_flight_counters_are_logged_periodically(self):
+        from unittest import mock
+        from salona_business_django import upstream
+
+        with mock.patch('salona_business_django.upstream._single_flight_logged_at', 0), \
+                self.assertLogs('salona_business_django.upstream', 'INFO') as logs:
+            upstream._count('coalesced_shared')
+            upstream._count('coalesced_shared')
+
+        self.assertEqual(len(logs.output), 1)
+        stats = upstream.get_single_flight_stats()
+        self.assertIn(f"{stats['coalesced'] + stats['coalesced_shared'] - 1}/", logs.output[0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FetchConcurrentlyTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_fanned_out_fetches_share_one_token_refresh(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from .views import GeneralView
+
+        request = RequestFactory().get('/users/dashboard/')
+        request.COOKIES['refresh_token'] = 'refresh'
+        refresh_response = mock.Mock(status_code=200)
+        refresh_response.cookies = {'access_token': 'new-access', 'refresh_token': 'new-refresh'}
+        view = GeneralView()
+
+        with mock.patch('users.views.upstream.post', return_value=refresh_response) as post:
+            results = view.fetch_concurrently(
+                request,
+                first=view.refresh_access_token,
+                second=view.refresh_access_token
+            )
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(results['first'], (True, 'new-access', 'new-refresh'))
+        self.assertEqual(results['second'], results['first'])
+
+    def test_requests_on_other_workers_reuse_the_refreshed_token_pair(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from .views import GeneralView
+
+        refresh_response = mock.Mock(status_code=200)
+        refresh_response.cookies = {'access_token': 'new-access', 'refresh_token': 'new-refresh'}
+        requests_in_flight = [RequestFactory().get('/users/dashboard/') for _ in range(3)]
+        for request in requests_in_flight:
+            request.COOKIES['refresh_token'] = 'refresh'
+
+        with mock.patch('users.auth.upstream.post', return_value=refresh_response) as post:
+            results = [GeneralView().refresh_access_token(request) for request in requests_in_flight]
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(results, [(True, 'new-access', 'new-refresh')] * 3)
+
+
+class APIProxyViewTest(TestCase):
+    def test_expired_access_token_is_refreshed_and_request_retried(self):
+        import httpx
+        from unittest import mock
+
+        def handler(upstream_request):
+            path = upstream_request.url.path
+            if path.endswith('/auth/refresh-token'):
+                return httpx.Response(200, json={'success': True}, headers=[
+                    ('set-cookie', 'access_token=new-access; Path=/'),
+                    ('set-cookie', 'refresh_token=new-refresh; Path=/'),
+                ])
+            if 'access_token=new-access' in upstream_request.headers.get('cookie', ''):
+                return httpx.Response(200, json={'data': [{'id': 1}]})
+            return httpx.Response(401, json={'detail': 'Access token has expired'})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        self.client.cookies['access_token'] = 'old-access'
+        self.client.cookies['refresh_token'] = 'old-refresh'
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            resp = self.client.get('/users/api/v1/services')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'data': [{'id': 1}]})
+        self.assertEqual(resp.cookies['access_token'].value, 'new-access')
+
+    def test_bad_or_failing_batch_items_fail_on_their_own(self):
+        import httpx
+        from unittest import mock
+
+        def handler(upstream_request):
+            if upstream_request.url.path.endswith('/broken'):
+                raise RuntimeError('unexpected upstream failure')
+            return httpx.Response(200, json={'path': upstream_request.url.path})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        self.client.cookies['access_token'] = 'access'
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client), \
+                self.assertLogs('users.api_proxy', 'ERROR'):
+            resp = self.client.post('/users/api/_batch', {'requests': [
+                {'path': 'v1/users/me', 'query': ['not', 'an', 'object']},
+                {'path': 'v1/users/me', 'query': 'a=1'},
+                {'path': 'v1/users/me', 'method': ['GET']},
+                {'path': 'v1/users/me', 'body': 'text'},
+                {'path': 'v1/broken'},
+                {'path': 'v1/users/me', 'query': {'ids': [1, 2]}},
+            ]}, content_type='application/json')
+
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json()['results']
+        self.assertEqual([result['status'] for result in results], [400, 400, 400, 400, 500, 200])
+        self.assertEqual(results[5]['body'], {'path': '/api/v1/users/me'})
+
+    def test_multipart_upload_is_streamed_upstream_unparsed(self):
+        import httpx
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        received = {}
+
+        def handler(upstream_request):
+            received['content_type'] = upstream_request.headers['content-type']
+            received['body'] = upstream_request.read()
+            return httpx.Response(200, json={'success': True})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        photo = SimpleUploadedFile('photo.png', b'\x89PNG-bytes', content_type='image/png')
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            resp = self.client.post('/users/api/v1/users/me/profile-photo', {'file': photo})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(received['content_type'].startswith('multipart/form-data; boundary='))
+        self.assertIn(b'\x89PNG-bytes', received['body'])
+        self.assertIn(b'filename="photo.png"', received['body'])
+
+    async def test_asgi_uploads_are_replayed_from_the_spooled_request_body(self):
+        import tempfile
+        import httpx
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.handlers.asgi import ASGIRequest
+        from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+        from . import api_proxy
+
+        bodies = []
+        uploads = []
+        StreamedUpload = api_proxy.StreamedUpload
+
+        def handler(upstream_request):
+            if upstream_request.url.path == '/api/v1/users/me':
+                return httpx.Response(200, json={'data': {'company_id': 'company-1'}})
+            bodies.append(upstream_request.read())
+            if len(bodies) == 1:
+                return httpx.Response(401, json={'detail': 'Access token has expired'})
+            return httpx.Response(200, json={'success': True})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        def streamed_upload(request, max_size):
+            uploads.append(StreamedUpload(request, max_size))
+            return uploads[-1]
+
+        # The request as the ASGI handler builds it, over the body it spooled to a temporary file
+        body = encode_multipart(BOUNDARY, {'file': SimpleUploadedFile('photo.png', b'\x89PNG-bytes')})
+        body_file = tempfile.SpooledTemporaryFile()
+        body_file.write(body)
+        body_file.seek(0)
+        request = ASGIRequest({
+            'type': 'http', 'method': 'POST', 'path': '/users/api/v1/users/me/profile-photo', 'query_string': b'',
+            'headers': [
+                (b'content-type', MULTIPART_CONTENT.encode()), (b'content-length', str(len(body)).encode()),
+                (b'cookie', b'access_token=access; refresh_token=refresh'),
+            ],
+        }, body_file)
+
+        refreshed = (True, 'new-access', 'new-refresh')
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client), \
+                mock.patch('users.api_proxy.StreamedUpload', side_effect=streamed_upload), \
+                mock.patch('users.api_proxy.auth.arefresh_tokens', return_value=refreshed):
+            resp = await api_proxy.APIProxyView.as_view()(request, path='v1/users/me/profile-photo')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(bodies, [body, body])
+        # No second copy of the body is spooled
+        self.assertIsNone(uploads[0].spool)
+
+    async def test_asgi_responses_are_streamed_without_reparsing(self):
+        import gzip
+        import httpx
+        from unittest import mock
+        from django.http import StreamingHttpResponse
+        from django.test import AsyncClient
+
+        body = gzip.compress(b'{"data": []}')
+
+        class UpstreamBody(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                yield body
+
+        def handler(upstream_request):
+            return httpx.Response(200, stream=UpstreamBody(), headers={
+                'content-type': 'application/json',
+                'content-encoding': 'gzip',
+            })
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            resp = await AsyncClient().get('/users/api/v1/bookings', headers={'Accept-Encoding': 'gzip'})
+            streamed = b''.join([chunk async for chunk in resp.streaming_content])
+
+        self.assertIsInstance(resp, StreamingHttpResponse)
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(streamed, body)
+
+    @override_settings(DEBUG=True)
+    def test_asgi_middleware_chain_runs_without_thread_adaptation(self):
+        from django.core.handlers.asgi import ASGIHandler
+
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    def test_wsgi_requests_close_their_async_client(self):
+        import httpx
+        from unittest import mock
+
+        clients = []
+
+        def build_client():
+            clients.append(httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, json={}))))
+            return clients[-1]
+
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            self.client.get('/users/api/v1/notifications/unread-count')
+            self.client.get('/users/api/v1/notifications/unread-count')
+            self.client.get('/customers/api/v1/companies/c1/services')
+
+        self.assertEqual(len(clients), 3)
+        self.assertTrue(all(client.is_closed for client in clients))
+
+    @override_settings(CACHES=LOCMEM_CACHES, API_PROXY_GET_CACHE_FRESH_SECONDS=0)
+    def test_cached_reads_are_revalidated_and_invalidated_by_writes(self):
+        import httpx
+        from unittest import mock
+
+        seen = []
+
+        def handler(upstream_request):
+            # Writes look the caller's company up first
+            if upstream_request.url.path == '/api/v1/users/me':
+                return httpx.Response(200, json={'data': {'id': 1, 'company_id': None}})
+            seen.append((upstream_request.method, upstream_request.headers.get('if-none-match')))
+            if upstream_request.method != 'GET':
+                return httpx.Response(201, json={'success': True})
+            if upstream_request.headers.get('if-none-match') == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json={'data': [{'id': 1}]}, headers={'etag': '"v1"'})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        self.client.cookies['access_token'] = 'access'
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            first = self.client.get('/users/api/v1/companies/services')
+            second = self.client.get('/users/api/v1/companies/services', headers={'If-None-Match': first['ETag']})
+            self.client.post('/users/api/v1/services', {'name': 'Cut'}, content_type='application/json')
+            third = self.client.get('/users/api/v1/companies/services')
+
+        self.assertEqual(first.json(), {'data': [{'id': 1}]})
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(third.json(), {'data': [{'id': 1}]})
+        self.assertEqual(seen, [('GET', None), ('GET', '"v1"'), ('POST', None), ('GET', None)])
+
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_batch_runs_subrequests_with_one_shared_refresh(self):
+        import httpx
+        from unittest import mock
+
+        refreshes = []
+
+        def handler(upstream_request):
+            path = upstream_request.url.path
+            if path.endswith('/auth/refresh-token'):
+                refreshes.append(upstream_request)
+                return httpx.Response(200, json={'success': True}, headers=[
+                    ('set-cookie', 'access_token=new-access; Path=/'),
+                ])
+            if 'access_token=new-access' not in upstream_request.headers.get('cookie', ''):
+                return httpx.Response(401, json={'detail': 'Access token has expired'})
+            if path.endswith('/missing'):
+                return httpx.Response(404, json={'detail': 'Not found'})
+            return httpx.Response(200, json={'path': path, 'query': dict(upstream_request.url.params)})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        self.client.cookies['access_token'] = 'old-access'
+        self.client.cookies['refresh_token'] = 'old-refresh-batch'
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            resp = self.client.post('/users/api/_batch', {'requests': [
+                {'path': 'v1/users/me'},
+                {'path': 'v1/users/time-offs', 'query': {'availability_type': 'weekly'}},
+                {'path': 'v1/missing'},
+                {'method': 'POST', 'path': 'v1/users/auth/login'},
+            ]}, content_type='application/json')
+
+        results = resp.json()['results']
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(results[0]['status'], 200)
+        self.assertTrue(results[0]['body']['path'].endswith('/v1/users/me'))
+        self.assertEqual(results[1]['body']['query'], {'availability_type': 'weekly'})
+        self.assertEqual(results[2]['status'], 404)
+        self.assertEqual(results[3]['status'], 400)
+        self.assertEqual(resp.cookies['access_token'].value, 'new-access')
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IdentityCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_current_user_is_cached_until_a_profile_update(self):
+        import httpx
+        from unittest import mock
+        from django.test import RequestFactory
+        from .views import GeneralView
+
+        me = mock.Mock(status_code=200)
+        me.json.return_value = {'data': {'company_id': 'c1', 'status': 'active', 'role': 'owner', 'user': {'id': 'u1'}}}
+        request = RequestFactory().get('/users/dashboard/')
+        request.COOKIES['access_token'] = 'access'
+
+        with mock.patch('users.views.upstream.get', return_value=me) as get:
+            first = GeneralView().get_current_user(request)
+            second = GeneralView().get_current_user(request)
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(first, {'id': 'u1', 'role_status': 'active', 'role': 'owner', 'company_id': 'c1'})
+        self.assertEqual(second, first)
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, json={'success': True})))
+
+        self.client.cookies['access_token'] = 'access'
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            self.client.put('/users/api/v1/users/me', {'first_name': 'A'}, content_type='application/json')
+
+        with mock.patch('users.views.upstream.get', return_value=me) as get:
+            GeneralView().get_current_user(request)
+        self.assertEqual(get.call_count, 1)
+
+    def test_creating_a_company_drops_the_cached_identity(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from . import auth
+        from .views import GeneralView
+
+        def users_me(company_id):
+            me = mock.Mock(status_code=200)
+            me.json.return_value = {'data': {'company_id': company_id, 'status': 'active', 'role': 'owner',
+                                             'user': {'id': 'u1'}}}
+            return me
+
+        request = RequestFactory().get('/users/dashboard/')
+        request.COOKIES['access_token'] = 'access'
+        with mock.patch('users.views.upstream.get', return_value=users_me(None)):
+            self.assertIsNone(GeneralView().get_current_user(request)['company_id'])
+
+        created = mock.Mock(status_code=201)
+        created.json.return_value = {'data': {'id': 'c1'}}
+        self.client.cookies['access_token'] = 'access'
+        with mock.patch('users.views.upstream.post', return_value=created):
+            resp = self.client.post('/users/settings/', {'name': 'Salon'}, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(auth.get_cached_identity('access'))
+
+        with mock.patch('users.views.upstream.get', return_value=users_me('c1')):
+            self.assertEqual(GeneralView().get_current_user(request)['company_id'], 'c1')
+
+    @override_settings(JWT_VERIFICATION_KEY='test-secret')
+    def test_locally_verified_tokens_are_refreshed_before_the_users_me_call(self):
+        import time
+        import jwt
+        from unittest import mock
+        from django.test import RequestFactory
+        from .views import GeneralView
+
+        claims = {'sub': 'u1', 'company_id': 'c1', 'role': 'owner', 'status': 'active'}
+        expired = jwt.encode({**claims, 'exp': int(time.time()) - 10}, 'test-secret', algorithm='HS256')
+        fresh = jwt.encode({**claims, 'exp': int(time.time()) + 600}, 'test-secret', algorithm='HS256')
+        refresh_response = mock.Mock(status_code=200)
+        refresh_response.cookies = {'access_token': fresh, 'refresh_token': 'new-refresh'}
+        me = mock.Mock(status_code=200)
+        me.json.return_value = {'data': {'company_id': 'c1', 'status': 'active', 'role': 'admin', 'user': {
+            'id': 'u1', 'first_name': 'Anna', 'profile_photo_url': 'https://cdn.salona.me/anna.png',
+        }}}
+        request = RequestFactory().get('/users/dashboard/')
+        request.COOKIES.update({'access_token': expired, 'refresh_token': 'refresh'})
+
+        with mock.patch('users.auth.upstream.post', return_value=refresh_response), \
+                mock.patch('users.views.upstream.get', return_value=me) as get:
+            user_data = GeneralView().get_current_user(request)
+            again = GeneralView().get_current_user(request)
+
+        # Only the fresh token is sent, once; the profile fields come from /users/me, the role from the token
+        get.assert_called_once()
+        self.assertEqual(get.call_args.kwargs['cookies'], {'access_token': fresh})
+        self.assertEqual(user_data, {
+            'id': 'u1', 'first_name': 'Anna', 'profile_photo_url': 'https://cdn.salona.me/anna.png',
+            'company_id': 'c1', 'role': 'owner', 'role_status': 'active',
+        })
+        self.assertEqual(again, user_data)
+        self.assertEqual(request.COOKIES['access_token'], fresh)
+
+        request = RequestFactory().get('/users/dashboard/')
+        request.COOKIES['access_token'] = jwt.encode({**claims, 'exp': int(time.time()) + 600}, 'other-secret')
+        with mock.patch('users.views.upstream.get') as get:
+            self.assertIsNone(GeneralView().get_current_user(request))
+        get.assert_not_called()
+
+
+class UTCNormalizationTest(TestCase):
+    def test_offset_datetimes_under_time_keys_are_converted_to_utc(self):
+        from salona_business_django import utc
+
+        payload = {
+            'start_time': '2025-03-01T09:00:00+02:00',
+            'end_time': '2025-03-01T09:45:00Z',
+            'date': '2025-03-01',
+            'notes': '2025-03-01T09:00:00+02:00',
+            'services': [{'scheduled_at': '2025-03-01T09:00:00.250-01:30', 'tags': ['2025-03-01T09:00:00+02:00']}],
+            'dates': ['2025-03-02T00:30:00+01:00'],
+        }
+
+        self.assertIs(utc.ensure_utc(payload), payload)
+        self.assertEqual(payload, {
+            'start_time': '2025-03-01T07:00:00Z',
+            'end_time': '2025-03-01T09:45:00Z',
+            'date': '2025-03-01',
+            'notes': '2025-03-01T09:00:00+02:00',
+            'services': [{'scheduled_at': '2025-03-01T10:30:00.250000Z', 'tags': ['2025-03-01T09:00:00+02:00']}],
+            'dates': ['2025-03-01T23:30:00Z'],
+        })
+
+    def test_json_bodies_are_converted_while_decoded_without_a_walk(self):
+        import json
+        from unittest import mock
+        from salona_business_django import utc
+
+        payload = {
+            'bookings': [
+                {'id': index, 'start_time': '2025-03-01T09:00:00+02:00', 'dates': [['2025-03-02T00:30:00+01:00']],
+                 'customer': {'name': 'Anna', 'tags': ['2025-03-01T09:00:00+02:00'], 'visits': [{'count': 1}]}}
+                for index in range(3)
+            ],
+        }
+        body = json.dumps(payload).encode()
+
+        # Objects are converted as they are decoded: nothing walks the decoded payload
+        with mock.patch('salona_business_django.utc._normalize_dict', side_effect=AssertionError), \
+                mock.patch('salona_business_django.utc._normalize_list', side_effect=AssertionError):
+            decoded = utc.loads(body)
+
+        self.assertEqual(decoded, utc.ensure_utc(payload))
+        self.assertEqual(decoded['bookings'][2]['start_time'], '2025-03-01T07:00:00Z')
+        self.assertEqual(decoded['bookings'][2]['dates'], [['2025-03-01T23:30:00Z']])
+        self.assertEqual(decoded['bookings'][2]['customer']['tags'], ['2025-03-01T09:00:00+02:00'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, BOOKING_CATALOG_FRESH_SECONDS=60)
+class BookingCatalogTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from salona_business_django import catalog
+        cache.clear()
+        catalog._local_slugs.clear()
+
+    @staticmethod
+    def join_refreshes():
+        import time
+        from salona_business_django import catalog
+        deadline = time.time() + 5
+        while catalog._refreshing and time.time() < deadline:
+            time.sleep(0.01)
+
+    @staticmethod
+    def services_response(name):
+        from unittest import mock
+        response = mock.Mock(ok=True, status_code=200)
+        response.json.return_value = {'success': True, 'data': [{'id': 1, 'services': [{'id': 's1', 'name': name}]}]}
+        return response
+
+    def test_stale_parts_are_served_while_refreshed_in_the_background(self):
+        import time
+        from unittest import mock
+        from django.core.cache import cache
+        from customers.views import fetch_services
+        from salona_business_django import catalog
+
+        with mock.patch('salona_business_django.catalog.upstream.get', return_value=self.services_response('Cut')) as get:
+            fetch_services(7)
+            services = fetch_services(7)
+        get.assert_called_once()
+        self.assertEqual(services[0]['services'][0]['name'], 'Cut')
+
+        entry = cache.get(catalog._part_key(7, 'services'))
+        entry['fetched_at'] = time.time() - 61
+        cache.set(catalog._part_key(7, 'services'), entry)
+
+        with mock.patch('salona_business_django.catalog.upstream.get', return_value=self.services_response('Color')) as get:
+            stale = fetch_services(7)
+            self.join_refreshes()
+        get.assert_called_once()
+        self.assertEqual(stale[0]['services'][0]['name'], 'Cut')
+        self.assertEqual(fetch_services(7)[0]['services'][0]['name'], 'Color')
+
+    @override_settings(BOOKING_CATALOG_REFRESH_QUEUE=2)
+    def test_stale_refreshes_run_on_a_bounded_pool(self):
+        import time
+        from unittest import mock
+        from django.core.cache import cache
+        from salona_business_django import catalog
+
+        for company_id in range(1, 5):
+            cache.set(catalog._part_key(company_id, 'company'), {'data': {'id': company_id}, 'fetched_at': time.time() - 61})
+
+        executor = mock.Mock()
+        with mock.patch('salona_business_django.catalog._get_refresh_executor', return_value=executor):
+            for company_id in (1, 1, 2, 3, 4):
+                self.assertEqual(catalog.get(company_id, 'company'), {'id': company_id})
+
+        # One refresh per part, and no more than the queue holds
+        self.assertEqual([call.args[1:] for call in executor.submit.call_args_list], [(1, 'company'), (2, 'company')])
+        catalog._refreshing.clear()
+
+    def test_both_booking_modules_share_the_service_index(self):
+        from unittest import mock
+        from customers import views as customer_views
+        from salona_business_django import views as booking_views
+
+        response = mock.Mock(ok=True, status_code=200)
+        response.json.return_value = {'success': True, 'data': [
+            {'id': 1, 'services': [{'id': 's1', 'name': 'Cut', 'price': 4000, 'duration': 45}]},
+            {'id': 2, 'services': [{'id': 's2', 'name': 'Color', 'price': 9000, 'discount_price': 7500}]},
+        ]}
+
+        with mock.patch('salona_business_django.catalog.upstream.get', return_value=response) as get:
+            services, total_price = booking_views.get_services_details(7, ['s2', 'unknown', 's1'])
+            self.assertEqual(customer_views.get_services_details(7, ['s2', 'unknown', 's1']), (services, total_price))
+
+        get.assert_called_once()
+        self.assertEqual(services, [
+            {'id': 's2', 'name': 'Color', 'price': 75.0, 'duration': 60},
+            {'id': 's1', 'name': 'Cut', 'price': 40.0, 'duration': 45},
+        ])
+        self.assertEqual(total_price, 115.0)
+
+    def test_warmed_professional_names_cost_no_upstream_calls(self):
+        from unittest import mock
+        from customers import views as customer_views
+        from salona_business_django import catalog
+        from salona_business_django import views as booking_views
+
+        response = mock.Mock(ok=True, status_code=200)
+        response.json.return_value = {'success': True, 'data': [
+            {'user': {'id': 3, 'first_name': 'Anna', 'last_name': 'Tamm', 'profile_photo_url': 'https://cdn/anna.png'}},
+            {'user': {'id': 4, 'first_name': '', 'last_name': ''}},
+        ]}
+
+        with mock.patch('salona_business_django.catalog.upstream.get', return_value=response):
+            catalog.warm(7, ('professionals',))
+            self.join_refreshes()
+
+        with mock.patch('salona_business_django.catalog.upstream.get') as get:
+            self.assertEqual(booking_views.get_professional_name(7, '3'), 'Anna Tamm')
+            self.assertEqual(customer_views.get_professional_name(7, '4'), 'Professional')
+            self.assertEqual(customer_views.get_professional_name(7, 'any'), 'Any Professional')
+            self.assertEqual(catalog.get_professional(7, 3)['avatar'], 'https://cdn/anna.png')
+        get.assert_not_called()
+
+    def test_slugs_resolve_from_the_index_and_unknown_slugs_are_remembered(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from salona_business_django import catalog
+        from salona_business_django.views import fetch_company_detail_by_slug
+
+        def get(url, **kwargs):
+            if url.endswith('/slug/anna-salon'):
+                response = mock.Mock(ok=True, status_code=200)
+                response.json.return_value = {'success': True, 'data': {'id': 7, 'name': 'Anna Salon'}}
+            else:
+                response = mock.Mock(ok=False, status_code=404)
+            return response
+
+        with mock.patch('salona_business_django.catalog.upstream.get', side_effect=get) as upstream_get:
+            for _ in range(3):
+                self.assertEqual(fetch_company_detail_by_slug('anna-salon')['id'], 7)
+                self.assertIsNone(fetch_company_detail_by_slug('wp-admin'))
+            catalog._local_slugs.clear()
+            self.assertIsNone(catalog.resolve_slug('wp-admin'))
+            self.assertEqual(catalog.get(7, 'company')['name'], 'Anna Salon')
+
+        self.assertEqual(upstream_get.call_count, 2)
+
+        catalog.invalidate(7, ['company'])
+        self.assertIsNone(cache.get(catalog._slug_key('anna-salon')))
+        self.assertIsNotNone(cache.get(catalog._slug_key('wp-admin')))
+
+    def test_service_write_through_proxy_invalidates_the_catalog(self):
+        import httpx
+        from unittest import mock
+        from salona_business_django import catalog
+        from . import auth
+
+        auth.cache_identity('access', {'id': 1, 'company_id': 7, 'role': 'owner', 'role_status': 'active'})
+        with mock.patch('salona_business_django.catalog.upstream.get', return_value=self.services_response('Cut')):
+            catalog.get(7, 'services')
+            catalog.get(7, 'company')
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(lambda upstream_request: httpx.Response(200, json={})))
+
+        self.client.cookies['access_token'] = 'access'
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+            self.client.put('/users/api/v1/services/s1', {'price': 4000}, content_type='application/json')
+
+        with mock.patch('salona_business_django.catalog.upstream.get', return_value=self.services_response('Cut')) as get:
+            catalog.get(7, 'services')
+            catalog.get(7, 'company')
+        # Only the changed part is fetched again
+        get.assert_called_once()
+        self.assertTrue(get.call_args.args[0].endswith('/services/companies/7/services'))
+
+    def test_company_write_through_proxy_invalidates_the_catalog(self):
+        import httpx
+        from unittest import mock
+        from django.core.cache import cache
+        from salona_business_django import catalog
+        from . import auth
+
+        company = mock.Mock(ok=True, status_code=200)
+        company.json.return_value = {'success': True, 'data': {'id': 7, 'name': 'Anna Salon'}}
+        auth.cache_identity('access', {'id': 1, 'company_id': 7, 'role': 'owner', 'role_status': 'active'})
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(lambda upstream_request: httpx.Response(200, json={})))
+
+        self.client.cookies['access_token'] = 'access'
+        for _ in range(2):
+            with mock.patch('salona_business_django.catalog.upstream.get', return_value=company):
+                catalog.get(7, 'company')
+            with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+                resp = self.client.put('/users/api/v1/companies', {'name': 'Anna Studio'}, content_type='application/json')
+            self.assertEqual(resp.status_code, 200)
+            self.assertIsNone(cache.get(catalog._part_key(7, 'company')))
+            # The identity cache runs out long before the token; the company is still known
+            auth.cache_identity('access', {'id': 1, 'company_id': 7, 'role': 'owner', 'role_status': 'active'})
+            cache.delete(auth._identity_key('access'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BookingAvailabilityTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    @staticmethod
+    def join_prefetches():
+        import time
+        from salona_business_django import availability
+        deadline = time.time() + 5
+        while availability._prefetching and time.time() < deadline:
+            time.sleep(0.01)
+
+    @staticmethod
+    def catalog_get(url, params=None, **kwargs):
+        """Answer the catalog's company, professional and service lookups of company 7"""
+        from unittest import mock
+        data = {
+            'companies/7': {'id': 7, 'name': 'Anna Salon'},
+            'services/companies/7/users': [{'user': {'id': 3, 'first_name': 'Anna'}}],
+            'services/companies/7/services': [{'id': 1, 'services': [{'id': 's1', 'name': 'Cut'}, {'id': 's2', 'name': 'Dye'}]}],
+        }.get(url.split('/api/v1/')[1])
+        response = mock.Mock(ok=data is not None, status_code=200 if data is not None else 404)
+        response.json.return_value = {'success': True, 'data': data}
+        return response
+
+    def test_months_are_cached_and_the_next_month_is_prefetched(self):
+        from unittest import mock
+
+        availability_calls = []
+
+        def get(url, params=None, **kwargs):
+            if 'availabilit' not in url:
+                return self.catalog_get(url, params)
+            availability_calls.append((url.split('/api/v1/')[1], params))
+            response = mock.Mock(ok=True, status_code=200)
+            response.json.return_value = {'success': True, 'data': [{'date': params['date_from'], 'time_slots': ['10:00']}]}
+            return response
+
+        query = {'date_from': '2025-12-01', 'staff': '3', 'service_ids': ['s2', 's1']}
+        with mock.patch('salona_business_django.availability.upstream.get', side_effect=get):
+            first = self.client.get('/api/availability/7/', query)
+            self.join_prefetches()
+            again = self.client.get('/api/availability/7/', {**query, 'service_ids': ['s1', 's2']})
+            following = self.client.get('/api/availability/7/', {**query, 'date_from': '2026-01-01'})
+            self.join_prefetches()
+
+        self.assertEqual(first.json(), {'success': True, 'data': [{'date': '2025-12-01', 'time_slots': ['10:00']}]})
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(following.json()['data'][0]['date'], '2026-01-01')
+        self.assertEqual(
+            [(endpoint, params['date_from']) for endpoint, params in availability_calls],
+            [('companies/7/users/3/availability', '2025-12-01'), ('companies/7/users/3/availability', '2026-01-01'),
+             ('companies/7/users/3/availability', '2026-02-01')],
+        )
+        self.assertEqual(availability_calls[0][1]['service_ids'], ['s1', 's2'])
+        self.assertEqual(self.client.get('/api/availability/7/', {**query, 'staff': '../../users/me'}).status_code, 400)
+
+    def test_unknown_companies_staff_and_services_are_rejected(self):
+        from unittest import mock
+
+        query = {'date_from': '2025-12-01', 'staff': '3', 'service_ids': ['s1']}
+        with mock.patch('salona_business_django.availability.upstream.get', side_effect=self.catalog_get) as get:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/availability/99/', query).status_code, 404)
+                self.assertEqual(self.client.get('/api/availability/7/', {**query, 'staff': '4'}).status_code, 400)
+                self.assertEqual(self.client.get('/api/availability/7/', {**query, 'service_ids': ['s1', 'x']}).status_code, 400)
+
+        # Unknown companies are remembered, and no availability is asked for
+        self.assertEqual(
+            sorted(call.args[0].split('/api/v1/')[1] for call in get.call_args_list),
+            ['companies/7', 'companies/99', 'services/companies/7/services', 'services/companies/7/users'],
+        )
+
+    def test_prefetches_run_on_a_bounded_pool_once_per_month(self):
+        import threading
+        from datetime import date
+        from unittest import mock
+        from salona_business_django import availability
+
+        release = threading.Event()
+
+        def fetch(*args):
+            release.wait(5)
+            return []
+
+        with mock.patch('salona_business_django.availability.fetch', side_effect=fetch) as upstream_fetch, \
+                self.settings(BOOKING_AVAILABILITY_PREFETCH_QUEUE=2):
+            for staff_id in ('3', '3', '4', '5'):
+                availability.prefetch(7, staff_id, [], date(2026, 1, 1))
+            release.set()
+            self.join_prefetches()
+
+        # The repeated month is loaded once, and the month past the queue bound not at all
+        self.assertEqual(sorted(call.args[1] for call in upstream_fetch.call_args_list), ['3', '4'])
+
+    def test_public_booking_invalidates_availability(self):
+        from datetime import date
+        from unittest import mock
+        from salona_business_django import availability
+
+        created = mock.Mock(ok=True, status_code=201, content=b'{"success": true, "data": {"id": "b1"}}')
+        created.headers = {'Content-Type': 'application/json'}
+        with mock.patch('salona_business_django.availability.prefetch'), \
+                mock.patch('salona_business_django.availability.upstream.get', side_effect=self.catalog_get):
+            with mock.patch('salona_business_django.availability.fetch', return_value=[]) as fetch:
+                availability.get_month(7, 'any', [], date(2025, 12, 1))
+
+            with mock.patch('salona_business_django.views.upstream.post', return_value=created) as post:
+                wrong = self.client.post('/api/bookings/7/', {'company_id': 8}, content_type='application/json')
+                resp = self.client.post('/api/bookings/7/', {'company_id': 7, 'start_time': '2025-12-10T10:00:00Z'},
+                                        content_type='application/json')
+
+            with mock.patch('salona_business_django.availability.fetch', return_value=[]) as fetch:
+                availability.get_month(7, 'any', [], date(2025, 12, 1))
+
+        self.assertEqual(wrong.status_code, 400)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['data']['id'], 'b1')
+        post.assert_called_once()
+        self.assertTrue(post.call_args.args[0].endswith('/api/v1/bookings'))
+        fetch.assert_called_once()
+
+    def test_time_off_write_through_proxy_invalidates_availability(self):
+        import httpx
+        from datetime import date
+        from unittest import mock
+        from salona_business_django import availability
+        from . import auth
+
+        auth.cache_identity('access', {'id': 1, 'company_id': 7, 'role': 'owner', 'role_status': 'active'})
+        with mock.patch('salona_business_django.availability.prefetch'):
+            with mock.patch('salona_business_django.availability.fetch', return_value=[]) as fetch:
+                availability.get_month(7, 'any', [], date(2025, 12, 1))
+                availability.get_month(7, 'any', [], date(2025, 12, 1))
+            fetch.assert_called_once()
+
+            def build_client():
+                return httpx.AsyncClient(transport=httpx.MockTransport(lambda upstream_request: httpx.Response(201, json={})))
+
+            self.client.cookies['access_token'] = 'access'
+            with mock.patch('salona_business_django.upstream.build_async_client', build_client):
+                self.client.post('/users/api/v1/users/time-offs', {'start_date': '2025-12-10'}, content_type='application/json')
+
+            with mock.patch('salona_business_django.availability.fetch', return_value=[]) as fetch:
+                availability.get_month(7, 'any', [], date(2025, 12, 1))
+            fetch.assert_called_once()
+
+
+class ReportsManagerTest(TestCase):
+    @staticmethod
+    def bookings_response(bookings):
+        """A streamed /bookings response, delivered in small chunks that split bookings apart"""
+        import json
+        from unittest import mock
+        body = json.dumps({'data': bookings, 'total': len(bookings)}).encode()
+        response = mock.Mock(status_code=200)
+        response.iter_content.side_effect = lambda size: (body[i:i + 7] for i in range(0, len(body), 7))
+        return response
+
+    def test_current_and_previous_periods_come_from_one_fetch(self):
+        from datetime import datetime, timedelta
+        from unittest import mock
+        from .reports import ReportsManager
+
+        def day(days_ago):
+            return (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%dT10:00:00Z')
+
+        bookings = self.bookings_response([
+            {'id': 1, 'status': 'completed', 'total_price': 5000, 'start_at': day(2), 'booking_services': []},
+            {'id': 2, 'status': 'confirmed', 'total_price': 3000, 'start_at': day(3), 'booking_services': []},
+            {'id': 3, 'status': 'completed', 'total_price': 2500, 'start_at': day(10), 'booking_services': []},
+        ])
+
+        with mock.patch('users.reports.upstream.get', return_value=bookings) as get:
+            report = ReportsManager('access').generate_bookings_report('week')
+
+        get.assert_called_once()
+        self.assertTrue(get.call_args.kwargs['stream'])
+        bookings.close.assert_called_once()
+        self.assertEqual(get.call_args.kwargs['params']['start_date'], (datetime.now() - timedelta(days=14)).strftime('%Y-%m-%d'))
+        self.assertEqual(report['total_bookings'], 2)
+        self.assertEqual(report['total_revenue'], 50.0)
+        self.assertEqual(report['comparison']['bookings_change'], 100.0)
+        self.assertEqual(report['comparison']['revenue_change'], 100.0)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_final_days_are_served_from_the_rollup_store(self):
+        from datetime import datetime, timedelta
+        from unittest import mock
+        from django.core.cache import cache
+        from .reports import ReportsManager
+        cache.clear()
+
+        def day(days_ago):
+            return (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%dT10:00:00Z')
+
+        recent_booking = {'id': 1, 'status': 'completed', 'total_price': 5000, 'start_at': day(1), 'booking_services': []}
+        bookings = self.bookings_response([
+            recent_booking,
+            {'id': 2, 'status': 'completed', 'total_price': 2500, 'start_at': day(5), 'booking_services': []},
+        ])
+
+        with mock.patch('users.reports.upstream.get', return_value=bookings):
+            first = ReportsManager('access', company_id=7).generate_bookings_report('week')
+
+        recent = self.bookings_response([recent_booking])
+        with mock.patch('users.reports.upstream.get', return_value=recent) as get:
+            second = ReportsManager('access', company_id=7).generate_bookings_report('week')
+
+        # Only the days that are not final yet are fetched again
+        get.assert_called_once()
+        self.assertEqual(get.call_args.kwargs['params']['start_date'], (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d'))
+        self.assertEqual(second, first)
+        self.assertEqual(second['total_revenue'], 75.0)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_days_dropped_during_a_report_build_are_not_stored(self):
+        import time
+        from datetime import date
+        from unittest import mock
+        from django.core.cache import cache
+        from . import rollups
+
+        cache.clear()
+        day_rollups = rollups.rollup_bookings(
+            [{'id': 5, 'status': 'pending', 'start_at': '2025-03-02T09:00:00'},
+             {'id': 6, 'status': 'pending', 'start_at': '2025-03-03T09:00:00'}],
+            date(2025, 3, 1), date(2025, 3, 3), date(2025, 6, 1),
+        )
+        fetched_at = time.time() - 1
+
+        # A booking write before the build stores its days
+        rollups.invalidate(7, {'2025-03-01'})
+        # ... and one while it stores them
+        set_many = cache.set_many
+        writes = []
+
+        def set_many_during_a_write(values, timeout):
+            set_many(values, timeout)
+            if not writes:
+                writes.append(values)
+                rollups.invalidate(7, rollups.find_booking_days(7, [6]))
+
+        with mock.patch('users.rollups.cache', wraps=cache) as cached:
+            cached.set_many.side_effect = set_many_during_a_write
+            rollups.save(7, day_rollups, fetched_at)
+
+        self.assertEqual(sorted(rollups.load(7, date(2025, 3, 1), date(2025, 3, 3))), ['2025-03-02'])
+        self.assertEqual(rollups.find_booking_days(7, [5, 6]), {'2025-03-02', '2025-03-03'})
+
+    @override_settings(REPORTS_MAX_FETCH_DAYS=3)
+    def test_bookings_returned_by_two_windows_are_yielded_once(self):
+        from datetime import date
+        from unittest import mock
+        from .reports import ReportsManager
+
+        overnight = {'id': 1, 'start_at': '2025-03-03T23:00:00', 'end_at': '2025-03-04T01:00:00'}
+        windows = {
+            ('2025-03-01', '2025-03-03'): [{'id': 2, 'start_at': '2025-03-01T10:00:00'}, overnight],
+            ('2025-03-04', '2025-03-06'): [overnight, {'id': 3, 'start_at': '2025-03-06T10:00:00'}],
+            ('2025-03-07', '2025-03-07'): [{'id': 3, 'start_at': '2025-03-06T23:00:00'}],
+        }
+
+        with mock.patch.object(ReportsManager, 'fetch_bookings', side_effect=lambda start, end: iter(windows[start, end])):
+            bookings = list(ReportsManager('access').iter_bookings_range(date(2025, 3, 1), date(2025, 3, 7)))
+
+        self.assertEqual([booking['id'] for booking in bookings], [2, 1, 3])
+
+    def test_failed_fetch_returns_no_report(self):
+        from unittest import mock
+        from .reports import ReportsManager
+
+        truncated = mock.Mock(status_code=200)
+        truncated.iter_content.return_value = iter([b'{"data": [{"id": 1, "status": '])
+
+        with mock.patch('users.reports.upstream.get', return_value=truncated):
+            self.assertIsNone(ReportsManager('access').generate_bookings_report('week'))
+        truncated.close.assert_called_once()
+
+
+    @override_settings(REPORTS_STAFF_HOURS_PER_DAY=8, REPORTS_STAFF_WORK_DAYS=(0, 1, 2, 3, 4, 5, 6))
+    def test_staff_performance_shares_the_bookings_fetch(self):
+        from datetime import datetime, timedelta
+        from unittest import mock
+        from .reports import ReportsManager
+
+        two_days_ago = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
+        anna = {'id': 3, 'first_name': 'Anna', 'last_name': 'Tamm'}
+        mark = {'id': 4, 'first_name': 'Mark', 'last_name': 'Kask'}
+        bookings = self.bookings_response([
+            {'id': 1, 'status': 'completed', 'total_price': 6000, 'start_at': f'{two_days_ago}T10:00:00',
+             'end_at': f'{two_days_ago}T12:00:00', 'booking_services': [{'price': 60, 'assigned_staff': anna}]},
+            {'id': 2, 'status': 'no_show', 'total_price': 3000, 'start_at': f'{two_days_ago}T13:00:00',
+             'end_at': f'{two_days_ago}T14:00:00', 'booking_services': [{'price': 30, 'assigned_staff': anna}]},
+            {'id': 3, 'status': 'completed', 'total_price': 2000, 'start_at': f'{two_days_ago}T10:00:00',
+             'end_at': f'{two_days_ago}T11:00:00', 'booking_services': [{'price': 20, 'assigned_staff': mark}]},
+        ])
+        time_offs = mock.Mock(status_code=200)
+        time_offs.json.return_value = {'data': [
+            {'id': 9, 'start_date': two_days_ago, 'end_date': two_days_ago, 'user': anna},
+        ]}
+        # Anna works 10:00-16:00 every day; Mark set no availability
+        staff = mock.Mock(status_code=200)
+        staff.json.return_value = {'data': [
+            {'role': 'staff', 'user': {**anna, 'availabilities': [
+                {'day_of_week': day, 'start_time': '10:00', 'end_time': '16:00:00', 'is_available': True}
+                for day in range(7)
+            ]}},
+            {'role': 'owner', 'user': {**mark, 'availabilities': []}},
+        ]}
+
+        def get(url, **kwargs):
+            return {'time-offs': time_offs, 'users': staff}.get(url.rsplit('/', 1)[1], bookings)
+
+        with mock.patch('users.reports.upstream.get', side_effect=get) as upstream_get:
+            report = ReportsManager('access').generate_dashboard_report('week')
+
+        self.assertEqual(
+            sorted(call.args[0].rsplit('/', 1)[1] for call in upstream_get.call_args_list), ['bookings', 'time-offs', 'users']
+        )
+        anna_report = report['staff_performance']['staff'][3]
+        self.assertEqual(anna_report['booked_hours'], 3)
+        self.assertEqual(anna_report['time_off_hours'], 6)
+        self.assertEqual(anna_report['available_hours'], 8 * 6 - 6)
+        self.assertEqual(anna_report['revenue_per_hour'], 20.0)
+        self.assertEqual(anna_report['average_ticket'], 60.0)
+        self.assertEqual(anna_report['no_show_rate'], 50.0)
+        # Without a schedule the default working hours apply
+        self.assertEqual(report['staff_performance']['staff'][4]['available_hours'], 8 * 8)
+
+    @override_settings(REPORTS_CUSTOMER_HISTORY_DAYS=90)
+    def test_customer_report_splits_new_and_returning_customers(self):
+        from datetime import datetime, timedelta
+        from unittest import mock
+        from .reports import ReportsManager
+
+        def visit(booking_id, customer_id, days_ago, status='completed'):
+            start_at = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%dT10:00:00')
+            return {'id': booking_id, 'status': status, 'total_price': 4000, 'start_at': start_at,
+                    'customer': {'id': customer_id}, 'booking_services': []}
+
+        bookings = self.bookings_response([
+            visit(1, 'returning', 60), visit(2, 'returning', 3),
+            visit(3, 'new', 5), visit(4, 'new', 2),
+            visit(5, 'once', 1),
+            visit(6, 'cancelled', 1, status='cancelled'),
+        ])
+
+        with mock.patch('users.reports.upstream.get', return_value=bookings) as get:
+            report = ReportsManager('access').generate_customer_report('week')
+
+        get.assert_called_once()
+        self.assertEqual(report['total_customers'], 3)
+        self.assertEqual(report['new_customers'], 2)
+        self.assertEqual(report['returning_customers'], 1)
+        self.assertAlmostEqual(report['repeat_visit_rate'], 100 / 3)
+        self.assertEqual(report['customer_lifetime_value'], 200 / 3)
+        first_cohort = report['cohorts'][(datetime.now() - timedelta(days=60)).strftime('%Y-%m')]
+        self.assertEqual(first_cohort['customers'], 1)
+        self.assertEqual(first_cohort['retention'][-1], 100.0)
+
+    def test_report_bundle_builds_every_period_from_one_fetch(self):
+        from datetime import datetime, timedelta
+        from unittest import mock
+        from .reports import ReportsManager
+
+        def visit(booking_id, days_ago):
+            start_at = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%dT10:00:00')
+            return {'id': booking_id, 'status': 'completed', 'total_price': 4000, 'start_at': start_at,
+                    'customer': {'id': booking_id}, 'booking_services': []}
+
+        bookings = self.bookings_response([visit(1, 2), visit(2, 20), visit(3, 200)])
+        empty = mock.Mock(status_code=200)
+        empty.json.return_value = {'data': []}
+
+        def get(url, **kwargs):
+            return empty if url.endswith(('/time-offs', '/users')) else bookings
+
+        with mock.patch('users.reports.upstream.get', side_effect=get) as upstream_get:
+            bundle = ReportsManager('access').generate_report_bundle()
+
+        self.assertEqual(
+            sorted(call.args[0].rsplit('/', 1)[1] for call in upstream_get.call_args_list), ['bookings', 'time-offs', 'users']
+        )
+        self.assertEqual(sorted(bundle), ['month', 'week', 'year'])
+        self.assertEqual(bundle['week']['total_bookings'], 1)
+        self.assertEqual(bundle['year']['total_bookings'], 3)
+        self.assertEqual(bundle['year']['customers']['total_customers'], 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReportCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_dashboard_serves_the_precomputed_report(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from . import report_cache
+        from .views import DashboardView
+
+        report_cache.store_bundle(7, {'month': {'period': 'month', 'total_bookings': 12}})
+        request = RequestFactory().get('/users/dashboard/')
+        request.COOKIES['access_token'] = 'access'
+        executor = mock.Mock()
+
+        with mock.patch('users.reports.upstream.get') as get, \
+                mock.patch('users.report_cache._get_refresh_executor', return_value=executor):
+            bundle = DashboardView.get_reports_bundle(request, company_id=7)
+
+        get.assert_not_called()
+        executor.submit.assert_not_called()
+        self.assertEqual(bundle['month']['total_bookings'], 12)
+
+    @override_settings(REPORTS_REFRESH_AFTER=-1)
+    def test_old_reports_are_refreshed_once_with_the_visitors_token(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from . import report_cache
+        from .views import DashboardView
+
+        report_cache.store_bundle(7, {'month': {'period': 'month', 'total_bookings': 12}})
+        request = RequestFactory().get('/users/dashboard/')
+        request.COOKIES['access_token'] = 'access'
+        queued = []
+        executor = mock.Mock(submit=lambda fn, *args: queued.append((fn, args)))
+
+        with mock.patch('users.report_cache._get_refresh_executor', return_value=executor), \
+                mock.patch('users.report_cache.precompute', return_value=3) as precompute:
+            first = DashboardView.get_reports_bundle(request, company_id=7)
+            # A refresh of the company is already queued
+            DashboardView.get_reports_bundle(request, company_id=7)
+            self.assertEqual(len(queued), 1)
+            fn, args = queued[0]
+            fn(*args)
+            DashboardView.get_reports_bundle(request, company_id=7)
+
+        self.assertEqual(first['month']['total_bookings'], 12)
+        self.assertEqual(len(queued), 2)
+        precompute.assert_called_once_with(7, 'access')
+
+    def test_booking_write_through_proxy_drops_the_company_reports(self):
+        import httpx
+        import time
+        from datetime import date
+        from unittest import mock
+        from . import auth, report_cache, rollups
+
+        auth.cache_identity('staff-access', {'id': 2, 'company_id': 7, 'role': 'staff', 'role_status': 'active'})
+        report_cache.store_bundle(7, {'week': {'period': 'week'}})
+        day_rollups = rollups.rollup_bookings(
+            [{'id': 5, 'status': 'pending', 'start_at': '2025-03-03T09:00:00'}],
+            date(2025, 3, 1), date(2025, 3, 4), date(2025, 6, 1),
+        )
+        rollups.save(7, day_rollups, time.time())
+
+        def build_client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(lambda upstream_request: httpx.Response(200, json={})))
+
+        self.client.cookies['access_token'] = 'staff-access'
+        with mock.patch('salona_business_django.upstream.build_async_client', build_client), \
+                mock.patch('users.report_cache.precompute') as precompute:
+            moved = self.client.put(
+                '/users/api/v1/bookings/6', {'start_time': '2025-03-01T09:00:00Z'}, content_type='application/json'
+            )
+            # A status change names no day; the booking's day is found by its id
+            confirmed = self.client.put('/users/api/v1/bookings/5/confirm')
+
+        self.assertEqual((moved.status_code, confirmed.status_code), (200, 200))
+        precompute.assert_not_called()
+        self.assertEqual(report_cache.get_bundle(7), (None, False))
+        self.assertEqual(sorted(rollups.load(7, date(2025, 3, 1), date(2025, 3, 4))), ['2025-03-02', '2025-03-04'])
@@ -34,6 +34,9 @@ urlpatterns = [
     path('api/onboarding/status/<str:tour_name>/', views_onboarding.onboarding_status, name='onboarding_status'),
     path('api/onboarding/complete/<str:tour_name>/', views_onboarding.onboarding_mark_complete, name='onboarding_complete'),
 
+    # Several proxied API calls in one round trip (placed before the generic API proxy)
+    path('api/_batch', views.APIBatchView.as_view(), name='api_batch'),
+
     # Keep API proxy only for authenticated API calls (like /users/me)
     path('api/<path:path>', views.APIProxyView.as_view(), name='api_proxy'),
 ]
@@ -1,12 +1,16 @@
 import datetime
 import json
 import logging
+import threading
+from functools import partial
 from django.shortcuts import render, redirect
 from django.views import View
 from django.http import JsonResponse
 import requests
 from django.conf import settings
-from .api_proxy import APIProxyView
+from salona_business_django import upstream
+from . import auth, report_cache
+from .api_proxy import APIProxyView, APIBatchView
 from django.shortcuts import redirect
 
 logger = logging.getLogger(__name__)
@@ -27,27 +31,34 @@ class GeneralView(View):
         Returns tuple: (access_token, refresh_token)
         """
         # Check if tokens were refreshed during this request
-        if hasattr(request, '_refreshed_access_token'):
-            return request._refreshed_access_token, request._refreshed_refresh_token
+        refreshed = getattr(request, '_refreshed_tokens', None)
+        if refreshed is not None:
+            return refreshed
         
         # Otherwise get from cookies
         return request.COOKIES.get('access_token'), request.COOKIES.get('refresh_token')
 
     def set_refreshed_tokens(self, request, access_token, refresh_token):
         """Store refreshed tokens in request object for reuse during this request"""
-        request._refreshed_access_token = access_token
-        request._refreshed_refresh_token = refresh_token
-        request._token_was_refreshed = True
+        # One assignment, so fetches fanned out by fetch_concurrently never see half a pair
+        request._refreshed_tokens = (access_token, refresh_token)
 
     def refresh_access_token(self, request):
         """
         Attempt to refresh the access token using the refresh token
         Returns tuple: (success: bool, new_access_token: str or None, new_refresh_token: str or None)
         """
+        # Fetches fanned out by fetch_concurrently share this request, so only
+        # one of them may refresh; the others wait and reuse its result
+        with request.__dict__.setdefault('_token_refresh_lock', threading.Lock()):
+            return self._refresh_access_token_once(request)
+
+    def _refresh_access_token_once(self, request):
         # Check if we already refreshed the token during this request
         if hasattr(request, '_token_refresh_attempted'):
-            if hasattr(request, '_refreshed_access_token'):
-                return True, request._refreshed_access_token, request._refreshed_refresh_token
+            refreshed = getattr(request, '_refreshed_tokens', None)
+            if refreshed is not None:
+                return True, *refreshed
             else:
                 return False, None, None
         
@@ -59,31 +70,13 @@ class GeneralView(View):
         if not refresh_token:
             return False, None, None
 
-        try:
-            api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/users/auth/refresh-token"
-            cookies = {'refresh_token': refresh_token}
-
-            response = requests.post(
-                api_url,
-                headers=self.get_header(),
-                cookies=cookies,
-                timeout=10
-            )
-
-            if response.status_code == 200:
-                # Extract tokens from response cookies, not from response body
-                new_access_token = response.cookies.get('access_token')
-                new_refresh_token = response.cookies.get('refresh_token')
-
-                if new_access_token:
-                    # Store refreshed tokens in request for reuse
-                    self.set_refreshed_tokens(request, new_access_token, new_refresh_token)
-                    return True, new_access_token, new_refresh_token
-
-            return False, None, None
-
-        except requests.exceptions.RequestException:
-            return False, None, None
+        # Parallel requests on other workers may be refreshing the same token;
+        # auth.refresh_tokens makes sure only one of them calls the API
+        success, new_access_token, new_refresh_token = auth.refresh_tokens(refresh_token)
+        if success:
+            # Store refreshed tokens in request for reuse
+            self.set_refreshed_tokens(request, new_access_token, new_refresh_token)
+        return success, new_access_token, new_refresh_token
 
     def make_authenticated_request(self, request, url, method='GET', data=None, retry_count=0):
         """
@@ -100,11 +93,11 @@ class GeneralView(View):
             cookies = {'access_token': access_token}
 
             if method.upper() == 'GET':
-                response = requests.get(url, headers=self.get_header(), cookies=cookies, timeout=10)
+                response = upstream.get(url, headers=self.get_header(), cookies=cookies)
             elif method.upper() == 'POST':
-                response = requests.post(url, headers=self.get_header(), json=data, cookies=cookies, timeout=10)
+                response = upstream.post(url, headers=self.get_header(), json=data, cookies=cookies)
             elif method.upper() == 'PUT':
-                response = requests.put(url, headers=self.get_header(), json=data, cookies=cookies, timeout=10)
+                response = upstream.put(url, headers=self.get_header(), json=data, cookies=cookies)
             else:
                 return False, None, None
 
@@ -124,11 +117,11 @@ class GeneralView(View):
                             cookies = {'access_token': new_access_token}
 
                             if method.upper() == 'GET':
-                                response = requests.get(url, headers=self.get_header(), cookies=cookies, timeout=10)
+                                response = upstream.get(url, headers=self.get_header(), cookies=cookies)
                             elif method.upper() == 'POST':
-                                response = requests.post(url, headers=self.get_header(), json=data, cookies=cookies, timeout=10)
+                                response = upstream.post(url, headers=self.get_header(), json=data, cookies=cookies)
                             elif method.upper() == 'PUT':
-                                response = requests.put(url, headers=self.get_header(), json=data, cookies=cookies, timeout=10)
+                                response = upstream.put(url, headers=self.get_header(), json=data, cookies=cookies)
 
                             if response.status_code == 200:
                                 # Return success with new cookies
@@ -145,10 +138,11 @@ class GeneralView(View):
             # Normal response handling
             if response.status_code == 200:
                 # Check if token was refreshed during this request
-                if hasattr(request, '_token_was_refreshed'):
+                refreshed = getattr(request, '_refreshed_tokens', None)
+                if refreshed is not None:
                     return True, response.json(), {
-                        'access_token': request._refreshed_access_token,
-                        'refresh_token': request._refreshed_refresh_token
+                        'access_token': refreshed[0],
+                        'refresh_token': refreshed[1]
                     }
                 return True, response.json(), None
 
@@ -157,6 +151,20 @@ class GeneralView(View):
         except requests.exceptions.RequestException:
             return False, None, None
 
+    def fetch_concurrently(self, request, **fetches):
+        """
+        Run independent upstream fetches for this request concurrently
+
+        Only call once the user is authenticated. Each keyword maps a result
+        name to a callable taking the request, e.g. staff_data=self.get_staff;
+        bind extra arguments with functools.partial. Token refreshes triggered
+        by any of the fetches are shared through refresh_access_token.
+
+        Returns:
+            Dictionary with the same keys holding each fetch's result
+        """
+        return upstream.fan_out({name: partial(fetch, request) for name, fetch in fetches.items()})
+
     def get_unread_notifications_count(self, request):
         """Get unread notifications count from external API"""
         api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/notifications/unread-count"
@@ -168,32 +176,61 @@ class GeneralView(View):
         return 0
 
     def get_current_user(self, request):
-        """Get current user data from external API"""
-        api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/users/me"
+        """
+        Get current user data from external API
 
-        success, response_data, updated_cookies = self.make_authenticated_request(request, api_url)
+        With local token verification the token is checked (and refreshed when
+        expired) first and its identity claims take precedence, but the profile
+        fields the pages display still come from /users/me.
+        """
+        try:
+            token_data = self.get_identity_from_token(request)
+        except auth.InvalidAccessToken:
+            return None
+
+        # Page loads and their AJAX calls all ask who the user is; reuse the answer for a short while
+        user_data = auth.get_cached_identity(self.get_tokens_from_request(request)[0])
+        if user_data is None:
+            user_data = self.fetch_current_user(request)
+        if user_data is not None and token_data:
+            user_data = {**user_data, **token_data}
+        return user_data
+
+    def fetch_current_user(self, request):
+        """Get current user data from /users/me and cache it for the access token"""
+        success, response_data, updated_cookies = self.make_authenticated_request(request, auth.get_users_me_url())
 
         if success and response_data:
-            data = response_data
-            if not data.get('data')['company_id']:
-                result = data.get('data')
-            else:
-                result = data.get('data').get('user', {})
-            result['role_status'] = data.get('data').get('status', 'inactive')
-            if result['role_status'] != 'active':
-                result['company_id'] = None
-            else:
-                result['role'] = data.get('data').get('role', 'owner')
-                result['company_id'] = data.get('data').get('company_id', None)
+            result = auth.normalize_identity(response_data.get('data'))
             # Update cookies in request if they were refreshed
             if updated_cookies:
                 request.COOKIES['access_token'] = updated_cookies['access_token']
                 if updated_cookies.get('refresh_token'):
                     request.COOKIES['refresh_token'] = updated_cookies['refresh_token']
 
+            auth.cache_identity(self.get_tokens_from_request(request)[0], result)
             return result
         return None
 
+    def get_identity_from_token(self, request):
+        """
+        Get the identity claims (id, company, role) of the access token, verified locally
+        Returns None when local verification is not configured or inconclusive
+        Raises auth.InvalidAccessToken for tokens that are invalid or cannot be refreshed
+        """
+        access_token, _ = self.get_tokens_from_request(request)
+        try:
+            return auth.verify_identity(access_token)
+        except auth.AccessTokenExpired:
+            # Expired tokens never reach the API: refresh first, then read the new token
+            success, new_access_token, new_refresh_token = self.refresh_access_token(request)
+            if not success:
+                raise
+            request.COOKIES['access_token'] = new_access_token
+            if new_refresh_token:
+                request.COOKIES['refresh_token'] = new_refresh_token
+            return auth.verify_identity(new_access_token)
+
     def user_has_company(self, user_data):
         """Check if user has a company"""
         if not user_data:
@@ -213,6 +250,8 @@ class GeneralView(View):
 
 class LogoutView(View):
     def get(self, request):
+        auth.invalidate_identity(request.COOKIES.get('access_token'))
+
         # Create redirect response to login page
         redirect_response = redirect('users:login')
 
@@ -268,11 +307,11 @@ class LoginView(GeneralView):
                 'Accept': 'application/json'
             }
 
-            response = requests.post(
+            response = upstream.post(
                 api_url,
                 headers=headers,
                 json=login_data,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code == 200:
@@ -385,12 +424,12 @@ class GoogleAuthCallbackView(GeneralView):
             # Call external API callback endpoint
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/users/auth/google/callback"
 
-            response = requests.get(
+            response = upstream.get(
                 api_url,
                 params=query_params,
                 headers=self.get_header(),
                 cookies=request.COOKIES,
-                timeout=30,
+                timeout='long',
                 allow_redirects=False
             )
 
@@ -510,7 +549,7 @@ class CalendarView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/users/time-offs"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -539,7 +578,7 @@ class CalendarView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/bookings"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -567,9 +606,15 @@ class CalendarView(GeneralView):
             # User has no company - redirect to settings
             return redirect('users:profile')
 
-        staff_data = self.get_staff(request)
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        user_time_offs = self.get_user_time_offs(request)
+        page_data = self.fetch_concurrently(
+            request,
+            staff_data=self.get_staff,
+            unread_notifications_count=self.get_unread_notifications_count,
+            user_time_offs=self.get_user_time_offs
+        )
+        staff_data = page_data['staff_data']
+        unread_notifications_count = page_data['unread_notifications_count']
+        user_time_offs = page_data['user_time_offs']
 
         # Check if this is an AJAX request
         if request.headers.get('Accept') == 'application/json':
@@ -621,7 +666,7 @@ class DashboardView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/users/time-offs"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -650,7 +695,7 @@ class DashboardView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/bookings"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, params=query_params, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -661,22 +706,34 @@ class DashboardView(GeneralView):
             return None
 
     @staticmethod
-    def get_reports_data(request, period='week'):
-        """Get reports and analytics data"""
+    def get_reports_bundle(request, company_id=None):
+        """Get the week, month and year reports, precomputed or built here from one bookings fetch"""
         access_token = request.COOKIES.get('access_token')
 
         if not access_token:
             return None
 
+        # Serve the precomputed bundle; compute it here only on a miss
+        if company_id:
+            bundle, refresh_due = report_cache.get_bundle(company_id)
+            if bundle is not None:
+                if refresh_due:
+                    report_cache.schedule_refresh(company_id, access_token)
+                return bundle
+
         from .reports import ReportsManager
-        reports_manager = ReportsManager(access_token)
+        reports_manager = ReportsManager(access_token, company_id=company_id)
 
         try:
-            return reports_manager.generate_bookings_report(period)
+            bundle = reports_manager.generate_report_bundle()
         except Exception as e:
             logger.error(f"Error generating reports: {str(e)}")
             return None
 
+        if company_id:
+            report_cache.store_bundle(company_id, bundle)
+        return bundle
+
     def get(self, request):
         # Get current user data
         user_data = self.get_current_user(request)
@@ -701,12 +758,22 @@ class DashboardView(GeneralView):
             # Non-admin/owner users should use calendar view
             return redirect('users:calendar')
 
-        staff_data = self.get_staff(request)
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        
         # Get period from query params (default to 'week')
         period = request.GET.get('period', 'week')
-        reports_data = self.get_reports_data(request, period)
+        if period not in report_cache.PERIODS:
+            period = 'week'
+
+        page_data = self.fetch_concurrently(
+            request,
+            staff_data=self.get_staff,
+            unread_notifications_count=self.get_unread_notifications_count,
+            reports_bundle=partial(self.get_reports_bundle, company_id=user_data.get('company_id'))
+        )
+        staff_data = page_data['staff_data']
+        unread_notifications_count = page_data['unread_notifications_count']
+        # Every period's report comes with the page, so switching periods needs no request
+        reports_bundle = page_data['reports_bundle']
+        reports_data = reports_bundle.get(period) if reports_bundle else None
 
         # Check if this is an AJAX request
         if request.headers.get('Accept') == 'application/json':
@@ -715,7 +782,8 @@ class DashboardView(GeneralView):
                 'staff_data': staff_data,
                 'unread_notifications_count': unread_notifications_count,
                 'company_id': user_data.get('company_id', ''),
-                'reports_data': reports_data
+                'reports_data': reports_data,
+                'reports_bundle': reports_bundle
             })
 
         # Token and user data are valid, serve dashboard with user context (for admin/owner only)
@@ -729,6 +797,7 @@ class DashboardView(GeneralView):
             'company_id': user_data.get('company_id', ''),
             'reports_data': reports_data,
             'reports_data_json': json.dumps(reports_data) if reports_data else json.dumps({}),
+            'reports_bundle_json': json.dumps(reports_bundle) if reports_bundle else json.dumps({}),
             'selected_period': period
         })
 
@@ -746,7 +815,7 @@ class SettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -767,7 +836,7 @@ class SettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/emails"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -788,7 +857,7 @@ class SettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/phones"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -833,10 +902,17 @@ class SettingsView(GeneralView):
                 'API_BASE_URL': getattr(settings, 'API_BASE_URL', 'https://api.salona.me/api')
             })
 
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        company_info = self.get_company_info(request)
-        company_emails = self.get_company_emails(request)
-        company_phones = self.get_company_phones(request)
+        page_data = self.fetch_concurrently(
+            request,
+            unread_notifications_count=self.get_unread_notifications_count,
+            company_info=self.get_company_info,
+            company_emails=self.get_company_emails,
+            company_phones=self.get_company_phones
+        )
+        unread_notifications_count = page_data['unread_notifications_count']
+        company_info = page_data['company_info']
+        company_emails = page_data['company_emails']
+        company_phones = page_data['company_phones']
         # Check if this is an AJAX request
         if request.headers.get('Accept') == 'application/json':
             return JsonResponse({
@@ -898,15 +974,17 @@ class SettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies"
             cookies = {'access_token': access_token}
 
-            response = requests.post(
+            response = upstream.post(
                 api_url,
                 headers=self.get_header(),
                 cookies=cookies,
                 json=company_data,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code in [200, 201]:
+                # The cached identity (and company) of this token still say it has no company
+                auth.invalidate_identity(access_token)
                 data = response.json()
                 return JsonResponse({
                     'success': True,
@@ -969,7 +1047,7 @@ class CompanySettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -990,7 +1068,7 @@ class CompanySettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/all/emails"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1011,7 +1089,7 @@ class CompanySettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/all/phones"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1021,7 +1099,7 @@ class CompanySettingsView(GeneralView):
         except requests.exceptions.RequestException:
             return None
 
-    def get_company_address(self, request):
+    def get_company_address(self, request, company_id=None):
         """Get company address from external API"""
         access_token = request.COOKIES.get('access_token')
 
@@ -1029,8 +1107,9 @@ class CompanySettingsView(GeneralView):
             return None
 
         try:
-            user_data = self.get_current_user(request)
-            company_id = user_data.get('company_id') if user_data else None
+            if company_id is None:
+                user_data = self.get_current_user(request)
+                company_id = user_data.get('company_id') if user_data else None
 
             if not company_id:
                 return None
@@ -1038,7 +1117,7 @@ class CompanySettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/{company_id}/address"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1084,11 +1163,19 @@ class CompanySettingsView(GeneralView):
                 'API_BASE_URL': getattr(settings, 'API_BASE_URL', 'https://api.salona.me')
             })
 
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        company_info = self.get_company_info(request)
-        company_emails = self.get_company_emails(request)
-        company_phones = self.get_company_phones(request)
-        company_address = self.get_company_address(request)
+        page_data = self.fetch_concurrently(
+            request,
+            unread_notifications_count=self.get_unread_notifications_count,
+            company_info=self.get_company_info,
+            company_emails=self.get_company_emails,
+            company_phones=self.get_company_phones,
+            company_address=partial(self.get_company_address, company_id=user_data.get('company_id'))
+        )
+        unread_notifications_count = page_data['unread_notifications_count']
+        company_info = page_data['company_info']
+        company_emails = page_data['company_emails']
+        company_phones = page_data['company_phones']
+        company_address = page_data['company_address']
 
         # Token and user data are valid, serve company settings page
         return render(request, 'users/company_settings.html', {
@@ -1142,15 +1229,17 @@ class CompanySettingsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies"
             cookies = {'access_token': access_token}
 
-            response = requests.post(
+            response = upstream.post(
                 api_url,
                 headers=self.get_header(),
                 cookies=cookies,
                 json=company_data,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code in [200, 201]:
+                # The cached identity (and company) of this token still say it has no company
+                auth.invalidate_identity(access_token)
                 data = response.json()
                 return JsonResponse({
                     'success': True,
@@ -1304,8 +1393,13 @@ class StaffView(GeneralView):
             return redirect_response
 
         # Get staff data
-        staff_data = self.get_staff(request)
-        unread_notifications_count = self.get_unread_notifications_count(request)
+        page_data = self.fetch_concurrently(
+            request,
+            staff_data=self.get_staff,
+            unread_notifications_count=self.get_unread_notifications_count
+        )
+        staff_data = page_data['staff_data']
+        unread_notifications_count = page_data['unread_notifications_count']
 
         # Check if this is an AJAX request
         if request.headers.get('Accept') == 'application/json':
@@ -1351,12 +1445,12 @@ class StaffView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/users"
             cookies = {'access_token': access_token}
 
-            response = requests.post(
+            response = upstream.post(
                 api_url,
                 headers=self.get_header(),
                 cookies=cookies,
                 json=staff_data,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code in [200, 201]:
@@ -1403,12 +1497,12 @@ class StaffView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/users/{staff_id}"
             cookies = {'access_token': access_token}
 
-            response = requests.put(
+            response = upstream.put(
                 api_url,
                 headers=self.get_header(),
                 cookies=cookies,
                 json=update_data,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code == 200:
@@ -1445,11 +1539,11 @@ class StaffView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/users/{staff_id}"
             cookies = {'access_token': access_token}
 
-            response = requests.delete(
+            response = upstream.delete(
                 api_url,
                 headers=self.get_header(),
                 cookies=cookies,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code in [200, 204]:
@@ -1479,7 +1573,7 @@ class CompanyCustomers(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies/customers"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1506,8 +1600,13 @@ class CompanyCustomers(GeneralView):
             redirect_response.delete_cookie('refresh_token')
             return redirect_response
 
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        customers_data = self.get_company_customers(request)
+        page_data = self.fetch_concurrently(
+            request,
+            unread_notifications_count=self.get_unread_notifications_count,
+            customers_data=self.get_company_customers
+        )
+        unread_notifications_count = page_data['unread_notifications_count']
+        customers_data = page_data['customers_data']
         # Check if this is an AJAX request
         if request.headers.get('Accept') == 'application/json':
             return JsonResponse({
@@ -1543,7 +1642,7 @@ class MembershipPlansView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/memberships/plans"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1564,7 +1663,7 @@ class MembershipPlansView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/memberships/active-plan"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1585,13 +1684,16 @@ class MembershipPlansView(GeneralView):
             redirect_response.delete_cookie('refresh_token')
             return redirect_response
 
-        unread_notifications_count = self.get_unread_notifications_count(request)
-
-        # Check for active plan first
-        active_plan = self.get_active_plan(request)
-
-        # Get all available plans
-        membership_plans = self.get_membership_plans(request)
+        # Active plan and all available plans
+        page_data = self.fetch_concurrently(
+            request,
+            unread_notifications_count=self.get_unread_notifications_count,
+            active_plan=self.get_active_plan,
+            membership_plans=self.get_membership_plans
+        )
+        unread_notifications_count = page_data['unread_notifications_count']
+        active_plan = page_data['active_plan']
+        membership_plans = page_data['membership_plans']
 
         # Token and user data are valid, serve membership plans page
         return render(request, 'users/membership_plans.html', {
@@ -1628,11 +1730,11 @@ class MembershipPlansView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/memberships/create-checkout-session/{plan_id}"
             cookies = {'access_token': access_token}
 
-            response = requests.post(
+            response = upstream.post(
                 api_url,
                 headers=self.get_header(),
                 cookies=cookies,
-                timeout=30
+                timeout='long'
             )
 
             if response.status_code == 200:
@@ -1666,7 +1768,7 @@ class IntegrationsView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1691,8 +1793,13 @@ class IntegrationsView(GeneralView):
         if not user_data.get('company_id'):
             return redirect('users:profile')
 
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        company_info = self.get_company_info(request)
+        page_data = self.fetch_concurrently(
+            request,
+            unread_notifications_count=self.get_unread_notifications_count,
+            company_info=self.get_company_info
+        )
+        unread_notifications_count = page_data['unread_notifications_count']
+        company_info = page_data['company_info']
 
         # Get company ID
         company_id = user_data.get('company_id', '')
@@ -1730,7 +1837,7 @@ class OnlineBookingView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1755,8 +1862,13 @@ class OnlineBookingView(GeneralView):
         if not user_data.get('company_id'):
             return redirect('users:profile')
 
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        company_info = self.get_company_info(request)
+        page_data = self.fetch_concurrently(
+            request,
+            unread_notifications_count=self.get_unread_notifications_count,
+            company_info=self.get_company_info
+        )
+        unread_notifications_count = page_data['unread_notifications_count']
+        company_info = page_data['company_info']
 
         # Get company ID
         company_id = user_data.get('company_id', '')
@@ -1793,7 +1905,7 @@ class TelegramBotView(GeneralView):
             api_url = f"{getattr(settings, 'API_BASE_URL', 'https://api.salona.me')}/api/v1/companies"
             cookies = {'access_token': access_token}
 
-            response = requests.get(api_url, headers=self.get_header(), cookies=cookies, timeout=10)
+            response = upstream.get(api_url, headers=self.get_header(), cookies=cookies)
 
             if response.status_code == 200:
                 data = response.json()
@@ -1818,8 +1930,13 @@ class TelegramBotView(GeneralView):
         if not user_data.get('company_id'):
             return redirect('users:profile')
 
-        unread_notifications_count = self.get_unread_notifications_count(request)
-        company_info = self.get_company_info(request)
+        page_data = self.fetch_concurrently(
+            request,
+            unread_notifications_count=self.get_unread_notifications_count,
+            company_info=self.get_company_info
+        )
+        unread_notifications_count = page_data['unread_notifications_count']
+        company_info = page_data['company_info']
 
         # Get company ID
         company_id = user_data.get('company_id', '')